@@ -114,7 +114,7 @@ class WalletAdmin(admin.ModelAdmin):
         """
         for wallet in queryset:
             wallet.is_verified = True
-            wallet.save()
+            wallet.save(update_fields=["is_verified", "updated_at"])
 
 
 class PaymentAdmin(admin.ModelAdmin):
@@ -199,17 +199,18 @@ class PaymentAdmin(admin.ModelAdmin):
 
     def check_final_status(self, request, queryset):
         """Admin action to check status of selected payments."""
-        from apps.payments.helpers import check_final_status
-        for payment in queryset:
-            try:
-                status = check_final_status(payment)
-                self.message_user(request, f"Payment {payment.reference} status: {status}")
-            except Exception as e:
-                self.message_user(
-                    request,
-                    f"Failed to check status for {payment.reference}: {str(e)}",
-                    level="error",
-                )
+        from apps.payments.helpers import check_final_statuses
+        payments = list(queryset)
+        try:
+            statuses = check_final_statuses(payments)
+        except Exception as e:
+            self.message_user(
+                request, f"Failed to check statuses: {str(e)}", level="error")
+            return
+        for payment in payments:
+            self.message_user(
+                request,
+                f"Payment {payment.reference} status: {statuses[payment.pk]}")
 
     def capture_payments(self, request, queryset):
         for payment in queryset:
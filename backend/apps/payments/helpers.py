@@ -1,10 +1,11 @@
+from apps.payments.models import FINAL_PAYMENT_STATUSES
 from apps.payments.models import PaymentWebhookLog as WebHook
-from utils.external_requests import resend_callback
+from apps.payments.services.deposit_reconciler import DepositReconciler
+from utils.external_requests import fetch_deposit_statuses, resend_callback
 
 def check_final_status(payment):
     """Checks if the payment is in a final state and logs the webhook call."""
-    final_statuses = ["failed", "completed", "reversed"]
-    if payment.status in final_statuses:
+    if payment.status in FINAL_PAYMENT_STATUSES:
         # If webhook log already exists for this payment, skip logging
         if not WebHook.objects.filter(external_id=payment.reference).exists():
             WebHook.objects.create(
@@ -22,4 +23,31 @@ def check_final_status(payment):
             return data['status']
         else:
             return payment.status
-        
\ No newline at end of file
+        
+
+
+def check_final_statuses(payments):
+    """
+    Batch version of check_final_status. Payments that are not final are
+    looked up at PawaPay concurrently and final results are applied
+    (crediting completed deposits) instead of resending one callback each.
+    Returns:
+        dict: payment id -> status
+    """
+    results, pending = {}, []
+    for payment in payments:
+        if payment.status in FINAL_PAYMENT_STATUSES:
+            results[payment.pk] = check_final_status(payment)
+        else:
+            pending.append(payment)
+
+    responses = fetch_deposit_statuses([payment.id for payment in pending])
+    statuses = {}
+    for payment in pending:
+        new_status = DepositReconciler.parse_status(*responses[str(payment.id)])
+        results[payment.pk] = new_status or payment.status
+        if new_status in FINAL_PAYMENT_STATUSES:
+            statuses[payment.pk] = new_status
+    if statuses:
+        DepositReconciler.apply(statuses)
+    return results
@@ -0,0 +1,22 @@
+# Generated by Django 6.0.1 on 2026-10-17 18:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentwebhooklog',
+            name='deposit_id',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='paymentwebhooklog',
+            index=models.Index(fields=['deposit_id', 'status', 'created_at'], name='payments_pa_deposit_907580_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-17 18:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_payment_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='next_status_check_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='status_check_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
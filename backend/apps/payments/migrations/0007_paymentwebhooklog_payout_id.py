@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_payment_status_initiating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentwebhooklog',
+            name='payout_id',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='paymentwebhooklog',
+            name='event_type',
+            field=models.CharField(choices=[('deposit.initiated', 'Deposit Initiated'), ('deposit.accepted', 'Deposit Accepted'), ('deposit.completed', 'Deposit Completed'), ('deposit.failed', 'Deposit Failed'), ('deposit.callback_received', 'Deposit Callback Received'), ('payout.callback_received', 'Payout Callback Received'), ('payout.completed', 'Payout Completed'), ('payout.failed', 'Payout Failed'), ('refund.callback_received', 'Refund Callback Received'), ('refund.completed', 'Refund Completed'), ('refund.failed', 'Refund Failed')], db_index=True, default='deposit.accepted', max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='paymentwebhooklog',
+            index=models.Index(fields=['payout_id', 'status', 'created_at'], name='payments_pa_payout__c330ac_idx'),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Sum
 from django.utils import timezone
 from datetime import timedelta
@@ -16,6 +16,7 @@ User = get_user_model()
 class PaymentStatus(models.TextChoices):
     """Payment status enumeration"""
 
+    INITIATING = "initiating", _("Initiating")
     ACCEPTED = "accepted", _("Accepted")
     PENDING = "pending", _("Pending")
     PROCESSING = "processing", _("Processing")
@@ -36,6 +37,99 @@ class PaymentStatus(models.TextChoices):
     REJECTED = "rejected", _("Rejected")
 
 
+# Statuses a payment may still leave on its own (provider side in flight)
+PENDING_PAYMENT_STATUSES = [
+    PaymentStatus.PENDING,
+    PaymentStatus.ACCEPTED,
+    PaymentStatus.SUBMITTED,
+    PaymentStatus.PROCESSING,
+    PaymentStatus.IN_RECONCILIATION,
+    PaymentStatus.REQUIRES_ACTION,
+    PaymentStatus.REQUIRES_CONFIRMATION,
+]
+
+# Outcome of a deposit as reported by the provider
+FINAL_PAYMENT_STATUSES = [
+    PaymentStatus.COMPLETED,
+    PaymentStatus.CAPTURED,
+    PaymentStatus.PAID,
+    PaymentStatus.FAILED,
+    PaymentStatus.REJECTED,
+    PaymentStatus.CANCELLED,
+    PaymentStatus.EXPIRED,
+]
+
+_DEPOSIT_OUTCOMES = [
+    PaymentStatus.COMPLETED,
+    PaymentStatus.FAILED,
+    PaymentStatus.REJECTED,
+    PaymentStatus.CANCELLED,
+    PaymentStatus.EXPIRED,
+]
+_AFTER_SUCCESS = [
+    PaymentStatus.REFUNDED,
+    PaymentStatus.PARTIALLY_REFUNDED,
+    PaymentStatus.DISPUTED,
+]
+
+# Allowed status changes: current status -> statuses it may move to.
+# Anything not listed (e.g. accepted -> pending, completed -> failed) is
+# rejected, so late or reordered callbacks can never regress a payment.
+PAYMENT_STATUS_TRANSITIONS = {
+    # Stored but not yet submitted to the provider
+    PaymentStatus.INITIATING: [
+        PaymentStatus.ACCEPTED,
+        PaymentStatus.SUBMITTED,
+        PaymentStatus.PROCESSING,
+        *_DEPOSIT_OUTCOMES,
+    ],
+    PaymentStatus.PENDING: [
+        PaymentStatus.ACCEPTED,
+        PaymentStatus.SUBMITTED,
+        PaymentStatus.PROCESSING,
+        PaymentStatus.IN_RECONCILIATION,
+        PaymentStatus.REQUIRES_ACTION,
+        PaymentStatus.REQUIRES_CONFIRMATION,
+        *_DEPOSIT_OUTCOMES,
+    ],
+    PaymentStatus.REQUIRES_ACTION: [
+        PaymentStatus.ACCEPTED,
+        PaymentStatus.SUBMITTED,
+        PaymentStatus.PROCESSING,
+        *_DEPOSIT_OUTCOMES,
+    ],
+    PaymentStatus.REQUIRES_CONFIRMATION: [
+        PaymentStatus.ACCEPTED,
+        PaymentStatus.SUBMITTED,
+        PaymentStatus.PROCESSING,
+        *_DEPOSIT_OUTCOMES,
+    ],
+    PaymentStatus.ACCEPTED: [
+        PaymentStatus.SUBMITTED,
+        PaymentStatus.PROCESSING,
+        PaymentStatus.IN_RECONCILIATION,
+        *_DEPOSIT_OUTCOMES,
+    ],
+    PaymentStatus.SUBMITTED: [
+        PaymentStatus.PROCESSING,
+        PaymentStatus.IN_RECONCILIATION,
+        *_DEPOSIT_OUTCOMES,
+    ],
+    PaymentStatus.PROCESSING: [
+        PaymentStatus.IN_RECONCILIATION,
+        *_DEPOSIT_OUTCOMES,
+    ],
+    PaymentStatus.IN_RECONCILIATION: _DEPOSIT_OUTCOMES,
+    PaymentStatus.COMPLETED: [PaymentStatus.CAPTURED, *_AFTER_SUCCESS],
+    PaymentStatus.PARTIALLY_CAPTURED: [PaymentStatus.CAPTURED, *_AFTER_SUCCESS],
+    PaymentStatus.CAPTURED: _AFTER_SUCCESS,
+    PaymentStatus.PAID: _AFTER_SUCCESS,
+    PaymentStatus.PARTIALLY_REFUNDED: [
+        PaymentStatus.REFUNDED, PaymentStatus.DISPUTED],
+    PaymentStatus.DISPUTED: [PaymentStatus.REFUNDED, PaymentStatus.COMPLETED],
+}
+
+
 class PaymentMethod(models.TextChoices):
     """Payment method types"""
 
@@ -142,6 +236,29 @@ class PaymentManager(models.Manager):
         """Get payment by provider and external ID"""
         return self.get(provider=provider, external_id=external_id)
 
+    def update_status(self, payment, new_status, **fields):
+        """
+        Move one payment to a new status, writing only the status columns
+        and `fields`. See PaymentStatusService.transition.
+        Returns:
+            bool: True if the status changed
+        """
+        from apps.payments.services.payment_status_service import (
+            PaymentStatusService)
+        return PaymentStatusService.transition(payment, new_status, **fields)
+
+    def bulk_update_status(self, statuses):
+        """
+        Move many payments to new statuses in chunked UPDATEs
+        Args:
+            statuses (dict): payment id -> new status
+        Returns:
+            dict: new status -> ids of the payments that moved
+        """
+        from apps.payments.services.payment_status_service import (
+            PaymentStatusService)
+        return PaymentStatusService.bulk_transition(statuses)
+
     def get_successful_payments(self, start_date=None, end_date=None):
         """
         Get all successful payments within optional date range
@@ -324,6 +441,11 @@ class Payment(UUIDModel, TimeStampedModel, SoftDeleteModel):
 
     # Timing Information
     completed_at = models.DateTimeField(null=True, blank=True)
+    # Bumped by every status transition (optimistic concurrency)
+    version = models.PositiveIntegerField(default=0)
+    # Status polling backoff for deposits that stay pending
+    status_check_attempts = models.PositiveSmallIntegerField(default=0)
+    next_status_check_at = models.DateTimeField(null=True, blank=True)
 
     # Fee and Settlement Information
     provider_fee = models.DecimalField(
@@ -408,7 +530,15 @@ class Payment(UUIDModel, TimeStampedModel, SoftDeleteModel):
         # Check if name is empty or None and set it to Anonymus
         if not self.patron_name:
             self.patron_name = "Anonymous"
-        super().save(*args, **kwargs)
+        if not self._state.adding:
+            super().save(*args, **kwargs)
+            return
+
+        from apps.payments.services.platform_stats import PlatformStatsService
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            PlatformStatsService.record_payments(
+                [(self.created_at, self.amount, None, self.status)])
 
     @property
     def amount_remaining(self) -> Decimal:
@@ -423,45 +553,30 @@ class Payment(UUIDModel, TimeStampedModel, SoftDeleteModel):
             
 
     def update_status(self, new_status: str, metadata: Optional[Dict] = None):
-        """Safely update payment status with validation"""
-        old_status = self.status
-        self.status = new_status
-
-        # Update timestamps based on status changes
-        now = timezone.now()
-
-        if (
-            new_status == PaymentStatus.COMPLETED
-            and old_status != PaymentStatus.ACCEPTED
-        ):
-            self.completed_at = now
-            self.status = PaymentStatus.COMPLETED
-        elif (
-            new_status == PaymentStatus.CAPTURED
-            and old_status != PaymentStatus.CAPTURED
-        ):
-            self.captured_at = now
-            self.status = PaymentStatus.CAPTURED
-        elif (
-            new_status == PaymentStatus.CANCELLED
-            and old_status != PaymentStatus.CANCELLED
-        ):
-            self.cancelled_at = now
-            self.status = PaymentStatus.CANCELLED
+        """
+        Safely update payment status with validation against
+        PAYMENT_STATUS_TRANSITIONS.
+        Returns:
+            bool: True if the status changed.
+        """
+        from apps.payments.services.payment_status_service import (
+            PaymentStatusService)
 
+        old_status = self.status
+        fields = {}
         # Update metadata if provided
         if metadata:
-            if "metadata" not in self.metadata:
-                self.metadata["status_changes"] = []
-            self.metadata["status_changes"].append(
+            payment_metadata = dict(self.metadata or {})
+            payment_metadata.setdefault("status_changes", []).append(
                 {
                     "from": old_status,
                     "to": new_status,
-                    "at": now.isoformat(),
+                    "at": timezone.now().isoformat(),
                     "metadata": metadata,
                 }
             )
-        self.save()
+            fields["metadata"] = payment_metadata
+        return PaymentStatusService.transition(self, new_status, **fields)
 
     @classmethod
     def generate_reference(cls, prefix: str = "PAY") -> str:
@@ -480,6 +595,12 @@ class WebhookEventType(models.TextChoices):
     DEPOSIT_COMPLETED = "deposit.completed"
     DEPOSIT_FAILED = "deposit.failed"
     DEPOSIT_CALLBACK_RECEIVED = "deposit.callback_received"
+    PAYOUT_CALLBACK_RECEIVED = "payout.callback_received"
+    PAYOUT_COMPLETED = "payout.completed"
+    PAYOUT_FAILED = "payout.failed"
+    REFUND_CALLBACK_RECEIVED = "refund.callback_received"
+    REFUND_COMPLETED = "refund.completed"
+    REFUND_FAILED = "refund.failed"
 
 
 class PaymentWebhookLog(UUIDModel, TimeStampedModel):
@@ -488,6 +609,9 @@ class PaymentWebhookLog(UUIDModel, TimeStampedModel):
     event_type = models.CharField(max_length=200, db_index=True,
                                   choices=WebhookEventType, default=WebhookEventType.DEPOSIT_ACCEPTED)
     external_id = models.CharField(max_length=255, db_index=True, blank=True)
+    # Partition key of the callback queue, set before the payment is resolved
+    deposit_id = models.CharField(max_length=64, blank=True)
+    payout_id = models.CharField(max_length=64, blank=True)
 
     # Payload
     raw_payload = models.TextField(help_text=_("Raw webhook payload"))
@@ -531,6 +655,8 @@ class PaymentWebhookLog(UUIDModel, TimeStampedModel):
             models.Index(fields=['provider', 'event_type']),
             models.Index(fields=['created_at', 'status']),
             models.Index(fields=['payment', 'created_at']),
+            models.Index(fields=['deposit_id', 'status', 'created_at']),
+            models.Index(fields=['payout_id', 'status', 'created_at']),
         ]
 
     def __str__(self):
@@ -0,0 +1,52 @@
+"""
+Shared record of recently seen provider transaction ids. Provider resend
+storms are mostly duplicates, so callbacks are claimed in the cache and a
+repeat is rejected without a database query.
+"""
+import logging
+from django.core.cache import cache
+from apps.payments.models import PaymentWebhookLog
+
+logger = logging.getLogger(__name__)
+
+# Providers resend callbacks for at most a day
+CALLBACK_SEEN_TTL = 24 * 60 * 60
+CALLBACK_SEEN_KEY = "payments:callback-seen:{}:{}"
+
+
+class CallbackDedupeService:
+    """Detect repeated provider callbacks."""
+
+    @staticmethod
+    def claim(external_id: str, kind: str = "deposit") -> bool:
+        """
+        Marks a provider transaction id as seen.
+        Args:
+            external_id (str): The providerTransactionId of the callback.
+            kind (str): Callback family, so deposit and payout ids never
+                collide.
+        Returns:
+            bool: True the first time the id is seen, False for a repeat.
+        """
+        key = CALLBACK_SEEN_KEY.format(kind, external_id)
+        try:
+            return cache.add(key, 1, timeout=CALLBACK_SEEN_TTL)
+        except Exception:
+            # Cache unavailable, fall back to the webhook log. Event types
+            # are prefixed with the callback family ("payout.completed").
+            logger.warning("Callback dedupe cache unavailable")
+            return not PaymentWebhookLog.objects.filter(
+                external_id=external_id,
+                event_type__startswith=f"{kind}.",
+            ).exists()
+
+    @staticmethod
+    def release(external_id: str, kind: str = "deposit"):
+        """
+        Forgets a claimed id, e.g. when storing its callback failed, so the
+        provider's retry is not rejected as a duplicate.
+        """
+        try:
+            cache.delete(CALLBACK_SEEN_KEY.format(kind, external_id))
+        except Exception:
+            logger.warning("Callback dedupe cache unavailable")
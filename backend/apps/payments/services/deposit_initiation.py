@@ -0,0 +1,77 @@
+"""
+Submission of deposits to PawaPay. Used inline by DepositAPIView and by
+the initiate_deposit worker when deposits are initiated asynchronously:
+the view then only stores the payment as "initiating" and answers 202,
+and the worker submits it, retrying while PawaPay is unavailable.
+"""
+from django.conf import settings
+from apps.payments.models import PaymentStatus
+from apps.payments.services.payment_status_service import PaymentStatusService
+
+# PawaPay answers a resubmitted depositId with this status; the first
+# submission was accepted
+DUPLICATE_IGNORED = "DUPLICATE_IGNORED"
+
+
+class DepositInitiationService:
+    """Build and apply PawaPay deposit requests."""
+
+    @staticmethod
+    def is_async(request) -> bool:
+        """
+        Whether a deposit request should be initiated asynchronously:
+        always when PAWAPAY_ASYNC_DEPOSITS is on, otherwise when the
+        client asks for it with `Prefer: respond-async`.
+        """
+        if getattr(settings, "PAWAPAY_ASYNC_DEPOSITS", False):
+            return True
+        prefer = request.headers.get("Prefer", "")
+        return "respond-async" in [p.strip().lower() for p in prefer.split(",")]
+
+    @staticmethod
+    def payload(payment) -> dict:
+        """
+        Returns:
+            dict: The POST /v2/deposits request body of a payment.
+        """
+        return {
+            "amount": str(int(payment.amount)),
+            "currency": "ZMW",
+            "depositId": str(payment.id),
+            "payer": {
+                "type": "MMO",
+                "accountDetails": {
+                    "provider": str(payment.provider),
+                    "phoneNumber": '26' + str(payment.patron_phone),
+                },
+            },
+            "customerMessage": "Tipping at TipZed",
+            "clientReferenceId": payment.reference,
+            "metadata": [
+                {
+                    "paymentId": str(payment.id),
+                    "walletId": str(payment.wallet_id)
+                }
+            ],
+        }
+
+    @staticmethod
+    def apply_response(payment, data: dict) -> bool:
+        """
+        Applies PawaPay's answer to a deposit request.
+        Args:
+            payment (Payment): The submitted payment.
+            data (dict): Body of the 200 response.
+        Returns:
+            bool: True if the payment status changed. When it did not
+            (e.g. a callback already finalized it) only the response is
+            stored.
+        """
+        new_status = data.get("status", "")
+        if new_status == DUPLICATE_IGNORED:
+            new_status = PaymentStatus.ACCEPTED
+        if PaymentStatusService.transition(payment, new_status, metadata=data):
+            return True
+        payment.metadata = data
+        payment.save(update_fields=["metadata", "updated_at"])
+        return False
@@ -0,0 +1,262 @@
+"""
+Bounded reconciliation of deposits stuck in a pending status. Pending
+payments are walked in age buckets, youngest first, with every status
+check drawn from a shared PawaPay rate budget. Payments that are still
+pending back off exponentially, so a large backlog after an outage
+drains at a steady rate instead of flooding the broker and PawaPay.
+Expired "initiating" deposits are looked up the same way.
+"""
+import logging
+import random
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from apps.payments.models import (
+    FINAL_PAYMENT_STATUSES,
+    PENDING_PAYMENT_STATUSES,
+    Payment,
+    PaymentStatus,
+)
+from apps.wallets.services.wallet_services import WalletTransactionService
+from apps.payments.services.provider_health import ProviderHealthService
+from utils.external_requests import fetch_deposit_statuses
+from utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# (youngest, oldest) age of the payments in each bucket. Deposits older
+# than the last bucket are left for manual follow-up.
+PENDING_AGE_BUCKETS = [
+    (timedelta(0), timedelta(minutes=15)),
+    (timedelta(minutes=15), timedelta(hours=2)),
+    (timedelta(hours=2), timedelta(days=1)),
+    (timedelta(days=1), timedelta(days=7)),
+]
+
+STATUS_CHECK_BACKOFF_BASE = timedelta(minutes=1)
+STATUS_CHECK_BACKOFF_MAX = timedelta(hours=6)
+
+
+class DepositReconciler:
+    """Poll PawaPay for pending deposits and apply the final statuses."""
+
+    CHUNK_SIZE = 100
+    BUCKET_LIMIT = 500
+    # Stay well inside the five minute schedule
+    RUN_TIME_LIMIT = 4 * 60
+
+    @staticmethod
+    def backoff(attempts: int) -> timedelta:
+        """Delay before the next check of a payment, with jitter."""
+        delay = min(
+            STATUS_CHECK_BACKOFF_BASE * (2 ** attempts),
+            STATUS_CHECK_BACKOFF_MAX,
+        )
+        return delay * random.uniform(0.75, 1.0)
+
+    @staticmethod
+    def due_payments(youngest: timedelta, oldest: timedelta, now=None):
+        """
+        Pending payments created within the age bucket whose backoff has
+        expired, oldest first.
+        """
+        now = now or timezone.now()
+        return Payment.objects.filter(
+            status__in=PENDING_PAYMENT_STATUSES,
+            created_at__lte=now - youngest,
+            created_at__gt=now - oldest,
+        ).filter(
+            Q(next_status_check_at__isnull=True)
+            | Q(next_status_check_at__lte=now)
+        ).order_by("created_at")
+
+    @staticmethod
+    def parse_status(data, code):
+        """
+        Returns:
+            str: The deposit status in a PawaPay status response
+            (lowercase), or None when it is unavailable.
+        """
+        if code != 200 or not isinstance(data, dict) or "data" not in data:
+            return None
+        return data["data"].get("status", "").lower() or None
+
+    @staticmethod
+    def apply(statuses: dict) -> dict:
+        """
+        Applies final statuses in bulk and credits the deposits that this
+        call moved to completed, in one transaction.
+        Args:
+            statuses (dict): payment id -> final status.
+        Returns:
+            dict: new status -> ids of the payments that moved.
+        """
+        with transaction.atomic():
+            moved = Payment.objects.bulk_update_status(statuses)
+            completed = Payment.objects.filter(
+                pk__in=moved.get(PaymentStatus.COMPLETED, []),
+                wallet__isnull=False,
+            ).select_related("wallet")
+            entries = [
+                {
+                    "wallet": payment.wallet,
+                    "amount": payment.amount,
+                    "payment": payment,
+                    "reference": payment.reference,
+                }
+                for payment in completed
+            ]
+            if entries:
+                WalletTransactionService.cash_in_many(entries)
+        return moved
+
+    @staticmethod
+    def defer(payments, now=None):
+        """Schedules the next status check of payments still pending."""
+        now = now or timezone.now()
+        for payment in payments:
+            payment.status_check_attempts += 1
+            payment.next_status_check_at = now + DepositReconciler.backoff(
+                payment.status_check_attempts)
+        Payment.objects.bulk_update(
+            payments, ["status_check_attempts", "next_status_check_at"])
+
+    @staticmethod
+    def final_status(data, code):
+        """
+        Returns:
+            str: The final status in a PawaPay status response, or None
+            while the deposit is still pending or the lookup failed.
+        """
+        new_status = DepositReconciler.parse_status(data, code)
+        return new_status if new_status in FINAL_PAYMENT_STATUSES else None
+
+    @staticmethod
+    def initiation_status(data, code):
+        """
+        Returns:
+            str: The status an expired "initiating" deposit takes from a
+            PawaPay status response: the reported one if PawaPay knows the
+            deposit (its submission reply was lost), failed if it does not,
+            None if the lookup failed.
+        """
+        if code == 404 or (
+                code == 200 and isinstance(data, dict)
+                and data.get("status") == "NOT_FOUND"):
+            # Never reached PawaPay, nothing can be collected any more
+            return PaymentStatus.FAILED
+        return DepositReconciler.parse_status(data, code)
+
+    @staticmethod
+    def _check(payments, budget, result, decide) -> bool:
+        """
+        Looks up payments in chunks within the budget of the run, applies
+        the statuses `decide` picks from the responses and backs off the
+        rest.
+        Args:
+            payments (list): Payments to look up, in order.
+            budget (tuple): (rate limiter, circuit breaker, deadline).
+            result (dict): Counters of the run, updated in place.
+            decide (callable): (data, code) -> status to apply or None.
+        Returns:
+            bool: False if the run must stop (circuit open, rate budget or
+            time limit exhausted).
+        """
+        limiter, breaker, deadline = budget
+        for start in range(0, len(payments), DepositReconciler.CHUNK_SIZE):
+            chunk = payments[start:start + DepositReconciler.CHUNK_SIZE]
+            if not breaker.allow():
+                result["stopped"] = True
+                logger.info("Deposit reconciliation paused: PawaPay circuit open")
+                return False
+            granted = []
+            for payment in chunk:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not limiter.acquire(timeout=remaining):
+                    result["stopped"] = True
+                    break
+                granted.append(payment)
+
+            # Check the whole chunk concurrently
+            responses = fetch_deposit_statuses(
+                [payment.id for payment in granted])
+            if responses:
+                # A chunk where every lookup failed counts as one failure
+                breaker.record(min(code for _, code in responses.values()))
+            statuses = {}
+            for payment in granted:
+                new_status = decide(*responses[str(payment.id)])
+                result["checked"] += 1
+                if new_status is not None:
+                    statuses[payment.pk] = new_status
+
+            moved = DepositReconciler.apply(statuses) if statuses else {}
+            result["finalized"] += sum(len(ids) for ids in moved.values())
+            # Still pending, or not moved (transition not allowed, or moved
+            # by a concurrent updater): back off
+            moved_ids = {pk for ids in moved.values() for pk in ids}
+            pending = [p for p in granted if p.pk not in moved_ids]
+            if pending:
+                DepositReconciler.defer(pending)
+                result["deferred"] += len(pending)
+            if result["stopped"]:
+                logger.info(f"Deposit reconciliation stopped early: {result}")
+                return False
+        return True
+
+    @staticmethod
+    def _budget(time_limit: float) -> tuple:
+        limiter = TokenBucket(
+            "pawapay-status",
+            getattr(settings, "PAWAPAY_STATUS_CHECKS_PER_SECOND", 50),
+        )
+        breaker = ProviderHealthService.breaker("deposit-status")
+        return limiter, breaker, time.monotonic() + time_limit
+
+    @staticmethod
+    def run(time_limit: float = RUN_TIME_LIMIT) -> dict:
+        """
+        Checks the due pending payments of every age bucket until the
+        buckets are drained or the time limit is reached.
+        Returns:
+            dict: Counters of checked, finalized and deferred payments and
+            whether the run stopped early.
+        """
+        budget = DepositReconciler._budget(time_limit)
+        result = {"checked": 0, "finalized": 0, "deferred": 0, "stopped": False}
+
+        for youngest, oldest in PENDING_AGE_BUCKETS:
+            payments = list(DepositReconciler.due_payments(
+                youngest, oldest)[:DepositReconciler.BUCKET_LIMIT])
+            if not DepositReconciler._check(
+                    payments, budget, result, DepositReconciler.final_status):
+                break
+        return result
+
+    @staticmethod
+    def expire_initiations(before, time_limit: float = RUN_TIME_LIMIT) -> dict:
+        """
+        Looks up "initiating" deposits created before `before` whose
+        backoff has expired, within the same rate budget and limits as
+        run(): known deposits take the reported status (crediting the
+        completed ones), unknown ones are failed and the rest back off.
+        Returns:
+            dict: Counters of the run, as returned by run().
+        """
+        now = timezone.now()
+        payments = list(
+            Payment.objects.filter(
+                status=PaymentStatus.INITIATING, created_at__lt=before,
+            ).filter(
+                Q(next_status_check_at__isnull=True)
+                | Q(next_status_check_at__lte=now)
+            ).order_by("created_at")[:DepositReconciler.BUCKET_LIMIT]
+        )
+        result = {"checked": 0, "finalized": 0, "deferred": 0, "stopped": False}
+        DepositReconciler._check(
+            payments, DepositReconciler._budget(time_limit), result,
+            DepositReconciler.initiation_status)
+        return result
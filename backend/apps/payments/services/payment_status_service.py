@@ -0,0 +1,176 @@
+"""
+Payment status transitions. Every change is a single conditional UPDATE
+that only matches while the payment is in a status the transition table
+allows moving from, so concurrent updaters need no row lock: exactly one
+of them wins and the rest see that nothing was updated. The UPDATE also
+matches the status it moves from, so the daily platform totals can move
+the payment out of exactly that bucket.
+"""
+from django.db import connections, transaction
+from django.utils import timezone
+from apps.payments.models import (
+    PAYMENT_STATUS_TRANSITIONS,
+    Payment,
+    PaymentStatus,
+)
+from apps.payments.services.platform_stats import PlatformStatsService
+
+
+def _allowed_from():
+    allowed = {}
+    for old_status, new_statuses in PAYMENT_STATUS_TRANSITIONS.items():
+        for new_status in new_statuses:
+            allowed.setdefault(new_status, []).append(old_status)
+    return allowed
+
+
+# Target status -> statuses it may be reached from
+ALLOWED_FROM = _allowed_from()
+
+
+class PaymentStatusService:
+    """Apply payment status transitions."""
+
+    BULK_CHUNK_SIZE = 1000
+
+    @staticmethod
+    def can_transition(old_status: str, new_status: str) -> bool:
+        """Whether the transition table allows old_status -> new_status."""
+        return old_status in ALLOWED_FROM.get(new_status, [])
+
+    @staticmethod
+    def transition(payment, new_status: str, *, version: int = None, **fields) -> bool:
+        """
+        Moves a payment to `new_status` if the transition table allows it
+        from the status currently stored.
+        Args:
+            payment (Payment): The payment; updated in memory on success.
+            new_status (str): The target status (case-insensitive).
+            version (int): Only apply if the stored version still matches,
+                for callers that decided on a previously read state.
+            **fields: Extra columns written together with the status.
+        Returns:
+            bool: True if this call changed the status, False if the
+            transition was not allowed or lost to a concurrent update.
+        """
+        new_status = (new_status or "").lower()
+        allowed_from = ALLOWED_FROM.get(new_status)
+        if not allowed_from:
+            return False
+
+        changes = {
+            **PaymentStatusService._changes(new_status, timezone.now()),
+            **fields,
+        }
+
+        queryset = Payment.objects.filter(pk=payment.pk, status__in=allowed_from)
+        if version is not None:
+            queryset = queryset.filter(version=version)
+
+        # Try the status and version held in memory first; if they are
+        # stale, retry from the stored ones while the transition is still
+        # allowed. Matching the version too tells the exact version written.
+        old_status = payment.status
+        old_version = version if version is not None else payment.version
+        while True:
+            if old_status in allowed_from:
+                with transaction.atomic():
+                    if queryset.filter(status=old_status, version=old_version).update(
+                            version=old_version + 1, **changes):
+                        PlatformStatsService.record_payments([(
+                            payment.created_at, payment.amount,
+                            old_status, new_status)])
+                        break
+            stored = queryset.values_list("status", "version").first()
+            if stored is None or stored == (old_status, old_version):
+                return False
+            old_status, old_version = stored
+
+        for field, value in changes.items():
+            setattr(payment, field, value)
+        payment.version = old_version + 1
+        return True
+
+    @staticmethod
+    def _changes(new_status: str, now) -> dict:
+        changes = {"status": new_status, "updated_at": now}
+        if new_status == PaymentStatus.COMPLETED:
+            changes["completed_at"] = now
+        return changes
+
+    @staticmethod
+    def _update_returning(payment_ids: list, old_status: str, changes: dict) -> list:
+        """
+        UPDATE ... SET version = version + 1, <changes> WHERE id IN (...)
+        AND status = old_status RETURNING id. The ORM cannot return the
+        updated rows, and they are needed to tell exactly which payments
+        this call moved.
+        Returns:
+            list: Ids of the payments moved.
+        """
+        connection = connections[Payment.objects.db]
+        meta = Payment._meta
+        quote = connection.ops.quote_name
+        version = quote(meta.get_field("version").column)
+        assignments = [f"{version} = {version} + 1"]
+        params = []
+        for name, value in changes.items():
+            field = meta.get_field(name)
+            assignments.append(f"{quote(field.column)} = %s")
+            params.append(field.get_db_prep_save(value, connection))
+        params += [meta.pk.get_db_prep_value(pk, connection) for pk in payment_ids]
+        params.append(old_status)
+        sql = (
+            f"UPDATE {quote(meta.db_table)} SET {', '.join(assignments)} "
+            f"WHERE {quote(meta.pk.column)} IN ({', '.join(['%s'] * len(payment_ids))}) "
+            f"AND {quote(meta.get_field('status').column)} = %s "
+            f"RETURNING {quote(meta.pk.column)}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [meta.pk.to_python(row[0]) for row in cursor.fetchall()]
+
+    @staticmethod
+    def bulk_transition(statuses: dict, chunk_size: int = BULK_CHUNK_SIZE) -> dict:
+        """
+        Applies many status changes without row locks, writing only the
+        status columns. Per chunk, payments are grouped by the status they
+        were read in and moved with one conditional UPDATE per group, so a
+        payment another updater moved first is simply not matched.
+        Args:
+            statuses (dict): payment id -> new status.
+            chunk_size (int): Payments updated per statement.
+        Returns:
+            dict: new status -> ids of the payments that moved to it.
+            Payments whose transition is not allowed, or that another
+            updater moved first, are left out and can be retried later.
+        """
+        targets = {}
+        for payment_id, new_status in statuses.items():
+            new_status = (new_status or "").lower()
+            if new_status in ALLOWED_FROM:
+                targets.setdefault(new_status, []).append(payment_id)
+
+        moved = {}
+        for new_status, payment_ids in targets.items():
+            for start in range(0, len(payment_ids), chunk_size):
+                chunk = payment_ids[start:start + chunk_size]
+                rows = (
+                    Payment.objects
+                    .filter(pk__in=chunk, status__in=ALLOWED_FROM[new_status])
+                    .values_list("pk", "created_at", "amount", "status")
+                )
+                by_status = {}
+                for pk, created_at, amount, old_status in rows:
+                    by_status.setdefault(old_status, {})[pk] = (created_at, amount)
+
+                for old_status, payments in by_status.items():
+                    with transaction.atomic():
+                        ids = PaymentStatusService._update_returning(
+                            list(payments), old_status,
+                            PaymentStatusService._changes(new_status, timezone.now()))
+                        PlatformStatsService.record_payments(
+                            (*payments[pk], old_status, new_status) for pk in ids)
+                    if ids:
+                        moved.setdefault(new_status, []).extend(ids)
+        return moved
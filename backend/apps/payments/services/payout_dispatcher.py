@@ -0,0 +1,258 @@
+"""
+Submission of pending payouts to PawaPay's bulk payout API. Pending PAYOUT
+transactions of wallets with a verified payout account are claimed,
+submitted in batches and settled with finalize_payout once PawaPay reports
+their outcome, so payouts no longer wait for an admin to finalise them.
+"""
+import logging
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from apps.payouts.models import ProviderPayout
+from apps.wallets.models import WalletTransaction
+from apps.wallets.services.wallet_services import WalletTransactionService
+from apps.payments.services.provider_health import ProviderHealthService
+from utils.external_requests import pawapay_request
+
+logger = logging.getLogger(__name__)
+
+# PawaPay accepts at most 20 payouts per bulk request
+BULK_PAYOUT_SIZE = 20
+# Submissions without an answer for this long are sent again; PawaPay
+# ignores a payoutId it already knows
+RESUBMIT_AFTER = timedelta(minutes=10)
+# Accepted payouts without a callback for this long are polled
+SETTLE_POLL_AFTER = timedelta(minutes=30)
+
+ACCEPTED_STATUSES = ["ACCEPTED", "DUPLICATE_IGNORED"]
+FINAL_PROVIDER_STATUSES = ["completed", "failed", "rejected"]
+
+
+class PayoutDispatcher:
+    """Submit pending payouts to PawaPay and settle their outcome."""
+
+    RUN_LIMIT = 1000
+    POLL_LIMIT = 100
+
+    @staticmethod
+    def claim(limit: int = RUN_LIMIT) -> list:
+        """
+        Claims the payouts to submit: pending payouts never submitted, and
+        submissions whose outcome is still unknown after RESUBMIT_AFTER.
+        Rows locked by a concurrent dispatcher are skipped.
+        Returns:
+            list: ProviderPayout rows, with their payout transaction.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            new = list(
+                WalletTransaction.objects.select_for_update(
+                    skip_locked=True, of=("self",))
+                .filter(
+                    transaction_type="PAYOUT",
+                    status="PENDING",
+                    provider_payout__isnull=True,
+                    wallet__payout_account__verified=True,
+                )
+                .select_related("wallet__payout_account")
+                .order_by("created_at")[:limit]
+            )
+            ProviderPayout.objects.bulk_create([
+                ProviderPayout(
+                    payout_tx=payout_tx,
+                    provider=payout_tx.wallet.payout_account.provider,
+                    phone_number=payout_tx.wallet.payout_account.phone_number,
+                )
+                for payout_tx in new
+            ])
+
+            stale = list(
+                ProviderPayout.objects.select_for_update(skip_locked=True)
+                .filter(
+                    status="submitting",
+                    updated_at__lt=now - RESUBMIT_AFTER,
+                    payout_tx__status="PENDING",
+                )
+                .values_list("pk", flat=True)[:max(limit - len(new), 0)]
+            )
+            ProviderPayout.objects.filter(pk__in=stale).update(updated_at=now)
+
+        return list(
+            ProviderPayout.objects.filter(
+                Q(payout_tx__in=[payout_tx.pk for payout_tx in new])
+                | Q(pk__in=stale)
+            )
+            .select_related("payout_tx__wallet")
+            .order_by("created_at")
+        )
+
+    @staticmethod
+    def payload(provider_payout) -> dict:
+        """
+        Returns:
+            dict: The PawaPay payout request of a claimed payout.
+        """
+        payout_tx = provider_payout.payout_tx
+        return {
+            "payoutId": str(payout_tx.id),
+            "amount": format(abs(payout_tx.amount), "f"),
+            "currency": payout_tx.wallet.currency,
+            "recipient": {
+                "type": "MMO",
+                "accountDetails": {
+                    "phoneNumber": provider_payout.phone_number,
+                    "provider": provider_payout.provider,
+                },
+            },
+            "customerMessage": "TipZed payout",
+            "metadata": [
+                {"walletId": str(payout_tx.wallet_id)},
+                {"reference": payout_tx.reference},
+            ],
+        }
+
+    @staticmethod
+    def submit(batch: list) -> dict:
+        """
+        Sends one bulk payout request and records the result of every
+        item. Rejected payouts are finalized as failed at once, and so is
+        the whole batch when PawaPay refuses the request itself (4xx other
+        than 429): it will never be accepted as sent.
+        Args:
+            batch (list): Up to BULK_PAYOUT_SIZE claimed payouts.
+        Returns:
+            dict: Counters of accepted, rejected and unanswered payouts.
+        """
+        result = {"accepted": 0, "rejected": 0, "unanswered": 0}
+        ProviderPayout.objects.filter(pk__in=[p.pk for p in batch]).update(
+            attempts=F("attempts") + 1)
+
+        data, code = pawapay_request(
+            "POST", "/v2/payouts/bulk",
+            payload=[PayoutDispatcher.payload(p) for p in batch])
+        ProviderHealthService.breaker("payouts").record(code)
+        items = {}
+        if code == 200 and isinstance(data, list):
+            items = {item.get("payoutId"): item for item in data}
+        elif 400 <= code < 500 and code != 429:
+            refusal = data if isinstance(data, dict) else {}
+            items = {
+                str(p.payout_tx_id): {**refusal, "status": "REJECTED"}
+                for p in batch
+            }
+
+        for provider_payout in batch:
+            item = items.get(str(provider_payout.payout_tx_id))
+            if item is None:
+                # Outcome unknown, resubmitted after RESUBMIT_AFTER
+                result["unanswered"] += 1
+                continue
+            if item.get("status") in ACCEPTED_STATUSES:
+                ProviderPayout.objects.filter(
+                    pk=provider_payout.pk, status="submitting",
+                ).update(status="accepted", response=item, updated_at=timezone.now())
+                result["accepted"] += 1
+            else:
+                PayoutDispatcher.settle(
+                    provider_payout.payout_tx_id, "REJECTED", item)
+                result["rejected"] += 1
+        return result
+
+    @staticmethod
+    def run(limit: int = RUN_LIMIT) -> dict:
+        """
+        Claims pending payouts and submits them in bulk batches, until the
+        claimed payouts are sent or the PawaPay circuit opens.
+        Returns:
+            dict: Counters of the run.
+        """
+        breaker = ProviderHealthService.breaker("payouts")
+        result = {"claimed": 0, "accepted": 0, "rejected": 0,
+                  "unanswered": 0, "stopped": False}
+        if not breaker.allow():
+            result["stopped"] = True
+            return result
+
+        claimed = PayoutDispatcher.claim(limit)
+        result["claimed"] = len(claimed)
+        for start in range(0, len(claimed), BULK_PAYOUT_SIZE):
+            if start and not breaker.allow():
+                # The rest stays "submitting" and is resent later
+                result["stopped"] = True
+                break
+            batch = PayoutDispatcher.submit(claimed[start:start + BULK_PAYOUT_SIZE])
+            for key, value in batch.items():
+                result[key] += value
+        return result
+
+    @staticmethod
+    def settle(payout_id, provider_status: str, data: dict = None) -> bool:
+        """
+        Applies the final status PawaPay reported for a payout, from a
+        callback, a status check or a rejected submission.
+        Args:
+            payout_id: The PawaPay payoutId (the payout transaction id).
+            provider_status (str): COMPLETED, FAILED or REJECTED.
+            data (dict): The provider's payload, kept for audit.
+        Returns:
+            bool: True if this call finalized the payout, False if it is
+            unknown, the status is not final or it was already settled.
+        """
+        provider_status = (provider_status or "").lower()
+        if provider_status not in FINAL_PROVIDER_STATUSES:
+            return False
+        data = data or {}
+        success = provider_status == "completed"
+
+        with transaction.atomic():
+            provider_payout = (
+                ProviderPayout.objects.select_for_update()
+                .select_related("payout_tx__wallet")
+                .filter(payout_tx_id=payout_id)
+                .first()
+            )
+            if provider_payout is None \
+                    or provider_payout.status in FINAL_PROVIDER_STATUSES:
+                return False
+
+            WalletTransactionService.finalize_payout(
+                payout_tx=provider_payout.payout_tx, success=success)
+            failure = data.get("failureReason") or {}
+            provider_payout.status = provider_status
+            provider_payout.failure_reason = str(
+                failure.get("failureCode", ""))[:255]
+            provider_payout.response = data
+            provider_payout.finalized_at = timezone.now()
+            provider_payout.save(update_fields=[
+                "status", "failure_reason", "response",
+                "finalized_at", "updated_at"])
+
+        logger.info(f"Payout {payout_id} settled as {provider_status}")
+        return True
+
+    @staticmethod
+    def poll_accepted(limit: int = POLL_LIMIT) -> int:
+        """
+        Checks the status of accepted payouts whose callback has not
+        arrived after SETTLE_POLL_AFTER and settles the final ones.
+        Returns:
+            int: Number of payouts settled.
+        """
+        breaker = ProviderHealthService.breaker("payout-status")
+        settled = 0
+        payout_ids = ProviderPayout.objects.filter(
+            status="accepted",
+            updated_at__lt=timezone.now() - SETTLE_POLL_AFTER,
+        ).order_by("updated_at").values_list("payout_tx_id", flat=True)[:limit]
+        for payout_id in payout_ids:
+            if not breaker.allow():
+                break
+            data, code = pawapay_request("GET", f"/v2/payouts/{payout_id}")
+            breaker.record(code)
+            if code != 200 or not isinstance(data, dict) or "data" not in data:
+                continue
+            if PayoutDispatcher.settle(
+                    payout_id, data["data"].get("status", ""), data["data"]):
+                settled += 1
+        return settled
@@ -4,7 +4,6 @@ from django.db import transaction
 from django.core.exceptions import PermissionDenied
 from apps.wallets.services.wallet_services import WalletTransactionService
 from apps.payments.services.fee_service import FeeService
-from apps.wallets.services.wallet_services import WalletService
 from utils.exceptions import InsufficientBalance, InvalidTransaction, PayoutNotFound
 from apps.wallets.models import WalletTransaction
 
@@ -33,7 +32,8 @@ class PayoutOrchestrator:
         if not initiated_by.is_staff:
             raise PermissionDenied("Only staff can payout")
 
-        WalletService.recalculate_wallet_balance(wallet)
+        # Balance is maintained incrementally on every ledger write
+        wallet.refresh_from_db(fields=["balance"])
 
         if wallet.balance <= 0:
             raise InsufficientBalance("No balance to payout")
@@ -0,0 +1,269 @@
+"""
+Daily platform totals for the admin dashboards. Ledger and payment writes
+add their deltas to DailyPlatformStats in their own transaction, and a
+nightly compaction rebuilds the recent days from the source tables, so the
+admin pages sum a few small rows per day instead of aggregating the
+ledger and payments tables on every load.
+"""
+import random
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Abs, TruncDate
+from django.utils import timezone
+from apps.payments.models import Payment
+from apps.payouts.models import DailyPlatformStats
+from apps.wallets.models import WalletTransaction
+
+# Writers spread their deltas over shards 1..STATS_SHARDS of a day;
+# shard 0 holds the rebuilt totals and is only written by the compaction
+STATS_SHARDS = 8
+# Days rebuilt from the source tables every night, catching writes that
+# bypass the services (admin edits, bulk imports)
+REBUILD_DAYS = 7
+
+# Status -> counter prefix of the status buckets shown on the dashboards
+PAYOUT_BUCKETS = {
+    "PENDING": "payout_pending",
+    "COMPLETED": "payout_completed",
+    "FAILED": "payout_failed",
+}
+PAYMENT_BUCKETS = {
+    "pending": "payment_pending",
+    "completed": "payment_completed",
+    "failed": "payment_failed",
+}
+
+COUNTERS = [
+    field.name for field in DailyPlatformStats._meta.concrete_fields
+    if field.name not in ("id", "date", "shard")
+]
+
+# Conditional aggregates rebuilding a day from the source tables. Every
+# key is a DailyPlatformStats field.
+LEDGER_STATS = {
+    "cash_in_count": Count("id", filter=Q(transaction_type="CASH_IN")),
+    # Net of the credits reversed by refunds
+    "cash_in_amount": Sum(
+        "amount", filter=Q(transaction_type="CASH_IN")
+        | Q(transaction_type="REVERSAL", status="COMPLETED")),
+    "fee_amount": Sum(Abs("amount"), filter=Q(transaction_type="FEE")),
+    "payout_count": Count("id", filter=Q(transaction_type="PAYOUT")),
+    "payout_amount": Sum("amount", filter=Q(transaction_type="PAYOUT")),
+}
+PAYMENT_STATS = {"payment_count": Count("id")}
+for status, prefix in PAYOUT_BUCKETS.items():
+    bucket = Q(transaction_type="PAYOUT", status=status)
+    LEDGER_STATS[f"{prefix}_count"] = Count("id", filter=bucket)
+    LEDGER_STATS[f"{prefix}_amount"] = Sum("amount", filter=bucket)
+for status, prefix in PAYMENT_BUCKETS.items():
+    PAYMENT_STATS[f"{prefix}_count"] = Count("id", filter=Q(status=status))
+    PAYMENT_STATS[f"{prefix}_amount"] = Sum("amount", filter=Q(status=status))
+
+
+def _move(deltas, buckets, old_status, new_status, amount):
+    """Moves one row from the bucket of old_status to that of new_status."""
+    if old_status in buckets:
+        deltas[f"{buckets[old_status]}_count"] -= 1
+        deltas[f"{buckets[old_status]}_amount"] -= amount
+    if new_status in buckets:
+        deltas[f"{buckets[new_status]}_count"] += 1
+        deltas[f"{buckets[new_status]}_amount"] += amount
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class PlatformStatsService:
+    """Maintain and read the daily platform totals."""
+
+    @staticmethod
+    def add(day, deltas: dict):
+        """
+        Adds deltas to a random shard row of a day, creating it if needed.
+        Must run inside the transaction that writes the source rows, so
+        the totals move together with them.
+        Args:
+            day (date): The day the source rows count on.
+            deltas (dict): DailyPlatformStats field -> signed delta.
+        """
+        deltas = {name: value for name, value in deltas.items() if value}
+        if not deltas:
+            return
+        shard = random.randint(1, STATS_SHARDS)
+        rows = DailyPlatformStats.objects.filter(date=day, shard=shard)
+        changes = {name: F(name) + value for name, value in deltas.items()}
+        if rows.update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                DailyPlatformStats.objects.create(date=day, shard=shard, **deltas)
+        except IntegrityError:
+            rows.update(**changes)  # created by a concurrent writer
+
+    @staticmethod
+    def _add_days(days: dict):
+        # Fixed order so concurrent writers lock the rows in the same order
+        for day in sorted(days):
+            PlatformStatsService.add(day, days[day])
+
+    @staticmethod
+    def record_transactions(transactions):
+        """
+        Counts new ledger rows on the day they were written.
+        Args:
+            transactions: Iterable of created WalletTransaction rows.
+        """
+        days = defaultdict(lambda: defaultdict(int))
+        for txn in transactions:
+            deltas = days[timezone.localdate(txn.created_at)]
+            if txn.transaction_type == "CASH_IN":
+                deltas["cash_in_count"] += 1
+                deltas["cash_in_amount"] += txn.amount
+            elif txn.transaction_type == "REVERSAL":
+                deltas["cash_in_amount"] += txn.amount
+            elif txn.transaction_type == "FEE":
+                deltas["fee_amount"] += abs(txn.amount)
+            elif txn.transaction_type == "PAYOUT":
+                deltas["payout_count"] += 1
+                deltas["payout_amount"] += txn.amount
+                _move(deltas, PAYOUT_BUCKETS, None, txn.status, txn.amount)
+        PlatformStatsService._add_days(days)
+
+    @staticmethod
+    def record_payout_status(payout_tx, old_status: str, new_status: str):
+        """Moves a payout between status buckets of the day it was created."""
+        deltas = defaultdict(int)
+        _move(deltas, PAYOUT_BUCKETS, old_status, new_status, payout_tx.amount)
+        PlatformStatsService.add(timezone.localdate(payout_tx.created_at), deltas)
+
+    @staticmethod
+    def record_payments(changes):
+        """
+        Counts new payments and status changes on the day each payment
+        was created.
+        Args:
+            changes: Iterable of (created_at, amount, old_status,
+                new_status); old_status is None for a new payment.
+        """
+        days = defaultdict(lambda: defaultdict(int))
+        for created_at, amount, old_status, new_status in changes:
+            deltas = days[timezone.localdate(created_at)]
+            if old_status is None:
+                deltas["payment_count"] += 1
+            _move(deltas, PAYMENT_BUCKETS, old_status, new_status, amount)
+        PlatformStatsService._add_days(days)
+
+    @staticmethod
+    def totals(since=None) -> dict:
+        """
+        Sums the daily totals.
+        Args:
+            since (date): First day included; all days if omitted.
+        Returns:
+            dict: DailyPlatformStats counter -> total.
+        """
+        rows = DailyPlatformStats.objects.all()
+        if since is not None:
+            rows = rows.filter(date__gte=since)
+        totals = rows.aggregate(**{name: Sum(name) for name in COUNTERS})
+        return {name: value or 0 for name, value in totals.items()}
+
+    @staticmethod
+    def rebuild(start, end) -> int:
+        """
+        Recomputes the days from start to end (inclusive) from the ledger
+        and payments tables and replaces their rows with one shard 0 row
+        per day.
+        Returns:
+            int: Number of days written.
+        """
+        created = {
+            "created_at__gte": _day_start(start),
+            "created_at__lt": _day_start(end + timedelta(days=1)),
+        }
+        days = defaultdict(dict)
+        with transaction.atomic():
+            # Every shard row of these days exists and is locked before the
+            # source tables are read, so a writer cannot slip in a new
+            # shard row: it waits and adds its delta after the rebuilt rows
+            # are in, and its source rows are not counted by this rebuild
+            DailyPlatformStats.objects.bulk_create(
+                [
+                    DailyPlatformStats(date=start + timedelta(days=offset), shard=shard)
+                    for offset in range((end - start).days + 1)
+                    for shard in range(STATS_SHARDS + 1)
+                ],
+                ignore_conflicts=True,
+            )
+            replaced = list(
+                DailyPlatformStats.objects.select_for_update()
+                .filter(date__range=(start, end))
+                .values_list("pk", flat=True)
+            )
+            for source, stats in (
+                (WalletTransaction.objects, LEDGER_STATS),
+                (Payment.objects, PAYMENT_STATS),
+            ):
+                rows = (
+                    source.filter(**created)
+                    .annotate(day=TruncDate("created_at"))
+                    .order_by()
+                    .values("day")
+                    .annotate(**stats)
+                )
+                for row in rows:
+                    day = row.pop("day")
+                    days[day].update(
+                        {name: value or 0 for name, value in row.items()})
+
+            DailyPlatformStats.objects.filter(pk__in=replaced).delete()
+            DailyPlatformStats.objects.bulk_create([
+                DailyPlatformStats(date=day, shard=0, **totals)
+                for day, totals in days.items()
+            ])
+        return len(days)
+
+    @staticmethod
+    def fold(before) -> int:
+        """
+        Folds the shard rows of the days before `before` into their shard
+        0 row, for late status changes of old payments and payouts.
+        Returns:
+            int: Number of shard rows folded.
+        """
+        with transaction.atomic():
+            shards = list(
+                DailyPlatformStats.objects.select_for_update()
+                .filter(date__lt=before, shard__gt=0)
+            )
+            days = defaultdict(lambda: defaultdict(int))
+            for row in shards:
+                for name in COUNTERS:
+                    days[row.date][name] += getattr(row, name)
+
+            for day in sorted(days):
+                deltas = {name: value for name, value in days[day].items() if value}
+                total, _ = DailyPlatformStats.objects.get_or_create(date=day, shard=0)
+                if deltas:
+                    DailyPlatformStats.objects.filter(pk=total.pk).update(
+                        **{name: F(name) + value for name, value in deltas.items()})
+            DailyPlatformStats.objects.filter(pk__in=[row.pk for row in shards]).delete()
+        return len(shards)
+
+    @staticmethod
+    def compact(days: int = REBUILD_DAYS, today=None) -> dict:
+        """
+        Nightly maintenance: rebuilds the last `days` closed days from
+        the source tables and folds the shards of older days.
+        Returns:
+            dict: Number of days rebuilt and shard rows folded.
+        """
+        today = today or timezone.localdate()
+        start = today - timedelta(days=days)
+        return {
+            "rebuilt": PlatformStatsService.rebuild(start, today - timedelta(days=1)),
+            "folded": PlatformStatsService.fold(start),
+        }
@@ -0,0 +1,62 @@
+"""
+Health of the PawaPay integration per mobile money operator. Combines a
+circuit breaker per endpoint and operator with PawaPay's availability
+map, which a background task keeps in the cache.
+"""
+import logging
+from django.core.cache import cache
+from utils.circuit_breaker import CircuitBreaker
+from utils.external_requests import pawapay_request
+
+logger = logging.getLogger(__name__)
+
+AVAILABILITY_KEY = "payments:provider-availability"
+# Outlives a few missed refreshes; a stale map is better than none
+AVAILABILITY_TTL = 10 * 60
+UNAVAILABLE_STATUSES = ["CLOSED"]
+
+
+class ProviderHealthService:
+    """Decide whether an operator can take requests right now."""
+
+    @staticmethod
+    def breaker(endpoint: str, provider: str = "") -> CircuitBreaker:
+        """The shared circuit breaker of an endpoint and operator."""
+        return CircuitBreaker(f"pawapay:{endpoint}:{provider}")
+
+    @staticmethod
+    def refresh_availability(country: str = "ZMB"):
+        """
+        Fetches the operator availability map from PawaPay and caches it.
+        Returns:
+            dict: provider -> deposit status (e.g. OPERATIONAL, DELAYED,
+            CLOSED), or None if PawaPay could not be reached.
+        """
+        data, code = pawapay_request(
+            "GET", f"/v2/availability?country={country}&operationType=DEPOSIT")
+        if code != 200 or not isinstance(data, list):
+            logger.warning(f"Provider availability unavailable: {code}")
+            return None
+
+        availability = {}
+        for entry in data:
+            for provider in entry.get("providers", []):
+                for operation in provider.get("operationTypes", []):
+                    if operation.get("operationType") == "DEPOSIT":
+                        availability[provider.get("provider")] = operation.get("status")
+        cache.set(AVAILABILITY_KEY, availability, timeout=AVAILABILITY_TTL)
+        return availability
+
+    @staticmethod
+    def availability() -> dict:
+        """The cached availability map (empty if it was never fetched)."""
+        return cache.get(AVAILABILITY_KEY) or {}
+
+    @staticmethod
+    def is_available(provider: str) -> bool:
+        """
+        Whether deposits to the operator should be attempted. Operators
+        missing from the map are assumed available.
+        """
+        status = ProviderHealthService.availability().get(provider)
+        return status not in UNAVAILABLE_STATUSES
@@ -1,32 +1,486 @@
+import logging
+import time
+import zlib
+from datetime import timedelta
 from celery import shared_task
-from apps.payments.models import Payment
-from utils.external_requests import resend_callback
+from celery.schedules import crontab
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+from config.celery import app
+from apps.payments.models import PENDING_PAYMENT_STATUSES, Payment, PaymentStatus
+from apps.payments.models import PaymentWebhookLog as WebHook
+from apps.payments.models import WebhookEventType
+from apps.payments.services.deposit_initiation import DepositInitiationService
+from apps.payments.services.deposit_reconciler import DepositReconciler
+from apps.payments.services.payout_dispatcher import PayoutDispatcher
+from apps.payments.services.payment_status_service import PaymentStatusService
+from apps.payments.services.provider_health import ProviderHealthService
+from apps.wallets.services.wallet_services import WalletTransactionService
+from utils.exceptions import DuplicateTransaction
+from utils.external_requests import pawapay_request
 
+logger = logging.getLogger(__name__)
 
-@shared_task(bind=True, max_retries=5, default_retry_delay=300)
-def resend_deposit_callback(self, payment_id):
+# Deposit statuses that are not final yet and may still change at PawaPay
+PENDING_DEPOSIT_STATUSES = PENDING_PAYMENT_STATUSES
+
+# A payment is polled at most once per window, however often it is requested
+RECONCILE_LOCK_TTL = 5 * 60
+RECONCILE_LOCK_KEY = "payments:reconcile-deposit:{}"
+
+# Only one bulk deposit reconciliation runs at a time
+DEPOSIT_RECONCILER_LOCK_KEY = "payments:deposit-reconciler"
+DEPOSIT_RECONCILER_LOCK_TTL = 5 * 60
+
+# Callbacks still "received" after this long missed their queue message
+STALE_CALLBACK_AGE = timedelta(minutes=2)
+
+# Deposits still "initiating" after this long lost their submission task
+# (longer than the whole retry schedule of initiate_deposit)
+STALE_INITIATION_AGE = timedelta(minutes=10)
+# Deposits that could not be submitted within this window are failed
+INITIATION_EXPIRY = timedelta(hours=1)
+INITIATE_DEPOSIT_RETRY_DELAY = 10
+
+
+@shared_task
+def resend_pending_deposits():
+    """
+    Polls PawaPay for deposits stuck in a pending status and applies the
+    final ones, within the shared status-check rate budget. Runs never
+    overlap.
+
+    Returns:
+        dict: Counters of the run, or a status message if skipped.
+    """
+    if not cache.add(DEPOSIT_RECONCILER_LOCK_KEY, 1,
+                     timeout=DEPOSIT_RECONCILER_LOCK_TTL):
+        return "Reconciliation already running"
+    try:
+        return DepositReconciler.run()
+    finally:
+        cache.delete(DEPOSIT_RECONCILER_LOCK_KEY)
+
+
+def schedule_deposit_reconciliation(payment_ids):
+    """
+    Queues a status check for every payment that is not already being
+    reconciled. The per-payment cache lock makes repeated dashboard loads
+    collapse into a single provider call per RECONCILE_LOCK_TTL.
+    Args:
+        payment_ids (Iterable): Ids of non-final payments.
+    Returns:
+        int: Number of reconciliation tasks queued.
+    """
+    queued = 0
+    for payment_id in payment_ids:
+        key = RECONCILE_LOCK_KEY.format(payment_id)
+        if not cache.add(key, 1, timeout=RECONCILE_LOCK_TTL):
+            continue
+        try:
+            reconcile_deposit_status.delay(str(payment_id))
+            queued += 1
+        except OperationalError:
+            # Broker unavailable, let the next request try again
+            cache.delete(key)
+            logger.warning(f"Could not queue reconciliation for payment {payment_id}")
+    return queued
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def reconcile_deposit_status(self, payment_id):
+    """
+    Fetches the deposit status from PawaPay and applies it locally,
+    crediting the wallet when the deposit has completed.
+
+    Returns:
+        str: Status message
+    """
+    payment = Payment.objects.filter(id=payment_id).first()
+    if not payment:
+        return "No Payment Found"
+    if payment.status not in PENDING_DEPOSIT_STATUSES:
+        return "Payment already final"
+
+    breaker = ProviderHealthService.breaker("deposit-status")
+    if not breaker.allow():
+        return "Status unavailable"
+    data, code = pawapay_request("GET", f"/v2/deposits/{payment.id}")
+    breaker.record(code)
+    if code != 200 or "data" not in data:
+        return "Status unavailable"
+
+    new_status = data["data"]["status"].lower()
+    if new_status in PENDING_DEPOSIT_STATUSES:
+        return "Payment still pending"
+
+    with transaction.atomic():
+        # A callback may have finalized the payment while we were polling;
+        # only the updater that wins the transition credits the wallet
+        if not PaymentStatusService.transition(payment, new_status):
+            return "Payment already final"
+
+        if new_status == PaymentStatus.COMPLETED and payment.wallet is not None:
+            try:
+                WalletTransactionService.cash_in(
+                    wallet=payment.wallet,
+                    amount=payment.amount,
+                    payment=payment,
+                    reference=payment.reference,
+                )
+            except DuplicateTransaction:
+                pass
+
+    logger.info(f"Reconciled payment {payment_id} to {new_status}")
+    return f"Payment {new_status}"
+
+
+def callback_queue(deposit_id):
+    """
+    Queue that handles the callbacks of a deposit (or payout). Every
+    callback of one operation hashes to the same partition, so a single
+    consumer applies them in arrival order.
+    Returns:
+        str: Queue name, or None for the default queue.
+    """
+    partitions = getattr(settings, "PAYMENT_WEBHOOK_PARTITIONS", 1)
+    if partitions <= 1:
+        return None
+    return f"payment-webhooks-{zlib.crc32(deposit_id.encode()) % partitions}"
+
+
+def enqueue_deposit_callbacks(deposit_id):
+    """
+    Queues processing of the stored callbacks of a deposit. If the broker
+    is unavailable the callbacks stay "received" and are picked up by
+    requeue_stale_callbacks.
+    """
+    try:
+        process_deposit_callbacks.apply_async(
+            args=[deposit_id], queue=callback_queue(deposit_id))
+    except OperationalError:
+        logger.warning(f"Could not queue callbacks for deposit {deposit_id}")
+
+
+def enqueue_payout_callbacks(payout_id):
+    """
+    Queues processing of the stored callbacks of a payout. If the broker
+    is unavailable the callbacks stay "received" and are picked up by
+    requeue_stale_callbacks.
+    """
     try:
-        payment = Payment.objects.filter(id=payment_id).first()
+        process_payout_callbacks.apply_async(
+            args=[payout_id], queue=callback_queue(payout_id))
+    except OperationalError:
+        logger.warning(f"Could not queue callbacks for payout {payout_id}")
 
-        if not payment:
-            return "No Payment Found"
 
-        data, code = resend_callback(str(payment.id))
+def _apply_refund_callback(payment, log):
+    """
+    Applies a refund callback to its (locked) payment. The payment that
+    moves to refunded has the credit of its wallet reversed in the same
+    transaction.
+    """
+    refunded = log.parsed_payload["status"].upper() == "COMPLETED"
+    if refunded:
+        if PaymentStatusService.transition(payment, PaymentStatus.REFUNDED):
+            try:
+                WalletTransactionService.reverse_cash_in(payment=payment)
+            except DuplicateTransaction:
+                pass
+        else:
+            payment.refresh_from_db(fields=["status", "version"])
 
-        if code != 200:
-            raise Exception("Retry")
+    log.event_type = (
+        WebhookEventType.REFUND_COMPLETED if refunded
+        else WebhookEventType.REFUND_FAILED
+    )
+    log.payment = payment
+    log.provider = payment.provider
+
+
+def _apply_deposit_callback(payment, log):
+    """Applies one stored callback to its (locked) payment."""
+    res_status = log.parsed_payload["status"]
+    # Callbacks the transition table rejects (e.g. a late PENDING after
+    # ACCEPTED) leave the payment as it is
+    changed = PaymentStatusService.transition(payment, res_status)
+    if not changed:
+        payment.refresh_from_db(fields=["status", "version"])
 
-        return "Callback resent"
+    log.event_type = f"deposit.{payment.status}"
+    log.payment = payment
+    log.provider = payment.provider
+    if changed and payment.status == PaymentStatus.COMPLETED \
+            and payment.wallet is not None:
+        try:
+            WalletTransactionService.cash_in(
+                wallet=payment.wallet,
+                amount=payment.amount,
+                payment=payment,
+                reference=log.external_id or payment.reference,
+            )
+        except DuplicateTransaction:
+            pass
 
-    except Exception as exc:
-        raise self.retry(exc=exc)
+
+def _consume_callbacks(logs, apply, on_error=None):
+    """
+    Applies stored callbacks in the order they arrived. Each callback is
+    locked, applied and marked in one transaction: a redelivered message
+    skips callbacks another consumer holds or already handled, and a
+    worker dying midway leaves the callback "received" for
+    requeue_stale_callbacks.
+    Args:
+        logs: Queryset of the "received" callbacks of one operation.
+        apply: Called with the log; returns True if it was applied, False
+            to mark it ignored. Runs in a savepoint, an exception marks
+            the callback failed.
+        on_error: Called after a failed apply was rolled back.
+    Returns:
+        int: Number of callbacks applied.
+    """
+    processed = 0
+    for log_id in logs.order_by("created_at", "id").values_list("pk", flat=True):
+        with transaction.atomic():
+            log = WebHook.objects.select_for_update(skip_locked=True).filter(
+                pk=log_id, status="received").first()
+            if log is None:
+                continue
+            started = time.monotonic()
+            # Event types are prefixed with the callback family
+            kind = log.event_type.split(".")[0]
+            duplicate = log.external_id and WebHook.objects.filter(
+                external_id=log.external_id,
+                event_type__startswith=f"{kind}.",
+                status="processed",
+            ).exists()
+            if duplicate:
+                log.status = "ignored"
+                log.error_message = "Duplicate callback"
+            else:
+                try:
+                    with transaction.atomic():
+                        applied = apply(log)
+                    if applied:
+                        log.status = "processed"
+                        processed += 1
+                    else:
+                        log.status = "ignored"
+                except Exception as exc:
+                    logger.exception(f"Failed to apply callback {log.id}")
+                    if on_error is not None:
+                        on_error()
+                    log.status = "failed"
+                    log.error_message = str(exc)
+            log.processed_at = timezone.now()
+            log.processing_time_ms = (time.monotonic() - started) * 1000
+            log.save()
+    return processed
 
 
 @shared_task
-def resend_pending_deposits():
-    pending = Payment.objects.filter(
-        status__in=["pending", "accepted", "submitted", "processing", "in_reconciliation"]
+def process_deposit_callbacks(deposit_id):
+    """
+    Applies the stored callbacks of a deposit in the order they arrived.
+    See _consume_callbacks for how a callback is claimed.
+
+    Returns:
+        str: Status message
+    """
+    payment = Payment.objects.filter(id=deposit_id).first()
+    logs = WebHook.objects.filter(deposit_id=deposit_id, status="received")
+
+    if payment is None:
+        ignored = logs.update(
+            status="ignored", error_message="Payment not found",
+            processed_at=timezone.now())
+        return f"Ignored {ignored} callbacks"
+
+    def apply(log):
+        if log.event_type == WebhookEventType.REFUND_CALLBACK_RECEIVED:
+            _apply_refund_callback(payment, log)
+        else:
+            _apply_deposit_callback(payment, log)
+        return True
+
+    processed = _consume_callbacks(logs, apply, on_error=payment.refresh_from_db)
+    return f"Processed {processed} callbacks"
+
+
+@shared_task
+def process_payout_callbacks(payout_id):
+    """
+    Applies the stored callbacks of a payout in the order they arrived,
+    finalizing the payout transaction through PayoutDispatcher.settle.
+    Callbacks are claimed like deposit callbacks.
+
+    Returns:
+        str: Status message
+    """
+    logs = WebHook.objects.filter(payout_id=payout_id, status="received")
+
+    def apply(log):
+        res_status = log.parsed_payload["status"].lower()
+        settled = PayoutDispatcher.settle(payout_id, res_status, log.parsed_payload)
+        if res_status in ("completed", "failed"):
+            log.event_type = f"payout.{res_status}"
+        if not settled:
+            log.error_message = "Payout not found or already settled"
+        return settled
+
+    processed = _consume_callbacks(logs, apply)
+    return f"Processed {processed} callbacks"
+
+
+@shared_task
+def requeue_stale_callbacks():
+    """
+    Re-queues deposits and payouts whose callbacks were stored but never
+    consumed, e.g. because the broker was down when they arrived.
+    """
+    stale = WebHook.objects.filter(
+        status="received",
+        created_at__lt=timezone.now() - STALE_CALLBACK_AGE,
     )
+    queued = 0
+    for deposit_id in stale.exclude(deposit_id="").values_list(
+            "deposit_id", flat=True).distinct():
+        enqueue_deposit_callbacks(deposit_id)
+        queued += 1
+    for payout_id in stale.exclude(payout_id="").values_list(
+            "payout_id", flat=True).distinct():
+        enqueue_payout_callbacks(payout_id)
+        queued += 1
+    return queued
+
+
+def enqueue_deposit_initiation(payment_id):
+    """
+    Queues the submission of an "initiating" deposit. If the broker is
+    unavailable the payment stays "initiating" and is picked up by
+    requeue_stale_initiations.
+    """
+    try:
+        initiate_deposit.delay(str(payment_id))
+    except OperationalError:
+        logger.warning(f"Could not queue initiation of payment {payment_id}")
+
+
+@shared_task(bind=True, max_retries=5)
+def initiate_deposit(self, payment_id):
+    """
+    Submits an "initiating" deposit to PawaPay. Unavailable or failing
+    provider calls are retried with exponential backoff; resubmitting is
+    safe because PawaPay ignores a depositId it has already accepted.
+
+    Returns:
+        str: Status message
+    """
+    payment = Payment.objects.filter(
+        id=payment_id, status=PaymentStatus.INITIATING).first()
+    if not payment:
+        return "Payment already submitted"
+
+    countdown = INITIATE_DEPOSIT_RETRY_DELAY * (2 ** self.request.retries)
+    breaker = ProviderHealthService.breaker("deposits", payment.provider)
+    if not breaker.allow():
+        countdown = max(countdown, breaker.cooldown)
+    else:
+        data, code = pawapay_request(
+            "POST", "/v2/deposits/",
+            payload=DepositInitiationService.payload(payment))
+        breaker.record(code)
+        if code == 200:
+            DepositInitiationService.apply_response(payment, data)
+            return f"Payment {payment.status}"
+        if code < 500 and code != 429:
+            # PawaPay refused the request, it will never be collected
+            PaymentStatusService.transition(
+                payment, PaymentStatus.FAILED, metadata=data)
+            return "Payment failed"
+
+    if self.request.retries >= self.max_retries:
+        # The outcome of the last attempt is unknown; leave the payment
+        # to requeue_stale_initiations rather than failing it
+        return "Submission deferred"
+    raise self.retry(countdown=countdown)
+
 
-    for payment in pending:
-        resend_deposit_callback.delay(payment.id)
+@shared_task
+def requeue_stale_initiations():
+    """
+    Re-queues deposits stuck in "initiating", e.g. because the broker was
+    down or the retries ran out. Deposits older than INITIATION_EXPIRY are
+    looked up at PawaPay first, within the status-check rate budget: a
+    submission whose reply was lost may still have been accepted, so only
+    deposits PawaPay does not know are failed.
+    """
+    now = timezone.now()
+    stale = Payment.objects.filter(status=PaymentStatus.INITIATING)
+    DepositReconciler.expire_initiations(now - INITIATION_EXPIRY)
+
+    queued = 0
+    for payment_id in stale.filter(
+            created_at__lt=now - STALE_INITIATION_AGE,
+            created_at__gte=now - INITIATION_EXPIRY,
+    ).values_list("pk", flat=True):
+        enqueue_deposit_initiation(payment_id)
+        queued += 1
+    return queued
+
+
+# Sweep for stuck deposit initiations every five minutes
+@app.on_after_finalize.connect
+def setup_requeue_stale_initiations_task(sender, **kwargs):
+    """Schedule the stale initiation sweep to run every five minutes."""
+    sender.add_periodic_task(
+        crontab(minute="*/5"),
+        requeue_stale_initiations.s(),
+        name='Requeue unsubmitted deposits every five minutes',
+    )
+
+
+# Sweep for unconsumed callbacks every five minutes
+@app.on_after_finalize.connect
+def setup_requeue_stale_callbacks_task(sender, **kwargs):
+    """Schedule the stale callback sweep to run every five minutes."""
+    sender.add_periodic_task(
+        crontab(minute="*/5"),
+        requeue_stale_callbacks.s(),
+        name='Requeue unprocessed deposit callbacks every five minutes',
+    )
+
+
+# Poll pending deposits every five minutes
+@app.on_after_finalize.connect
+def setup_resend_pending_deposits_task(sender, **kwargs):
+    """Schedule the pending deposit reconciliation to run every five minutes."""
+    sender.add_periodic_task(
+        crontab(minute="*/5"),
+        resend_pending_deposits.s(),
+        name='Reconcile pending deposits every five minutes',
+    )
+
+
+@shared_task
+def refresh_provider_availability():
+    """Refreshes the cached PawaPay operator availability map."""
+    availability = ProviderHealthService.refresh_availability()
+    if availability is None:
+        return "Availability unavailable"
+    return availability
+
+
+# Keep the availability map fresh
+@app.on_after_finalize.connect
+def setup_refresh_provider_availability_task(sender, **kwargs):
+    """Schedule the provider availability refresh to run every minute."""
+    sender.add_periodic_task(
+        crontab(minute="*"),
+        refresh_provider_availability.s(),
+        name='Refresh PawaPay provider availability every minute',
+    )
@@ -1,12 +1,32 @@
 from django.urls import path
-from apps.payments.views import DepositAPIView
-from apps.payments.webhooks import WebhookAPIView, PaymentStatusAPIView
+from apps.payments.views import DepositAPIView, ProviderAvailabilityAPIView
+from apps.payments.webhooks import (
+    PaymentStatusAPIView,
+    PayoutWebhookAPIView,
+    RefundWebhookAPIView,
+    WebhookAPIView,
+)
 
 app_name = "payments"
 
 urlpatterns = [
     path("deposits/<uuid:wallet_id>/", DepositAPIView.as_view(), name="deposit"),
     path("webhook/", WebhookAPIView.as_view(), name="webhook"),
+    path(
+        "webhook/payouts/",
+        PayoutWebhookAPIView.as_view(),
+        name="payout_webhook",
+    ),
+    path(
+        "webhook/refunds/",
+        RefundWebhookAPIView.as_view(),
+        name="refund_webhook",
+    ),
+    path(
+        "availability/",
+        ProviderAvailabilityAPIView.as_view(),
+        name="availability",
+    ),
     path(
         "status/<uuid:payment_id>/",
         PaymentStatusAPIView.as_view(),
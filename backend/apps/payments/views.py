@@ -4,17 +4,78 @@ from django.contrib.auth import get_user_model
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from apps.payments.models import Payment, PaymentStatus
 from apps.payments.serializers import PaymentSerializer
+from apps.payments.services.deposit_initiation import DepositInitiationService
+from apps.payments.services.provider_health import ProviderHealthService
+from apps.payments.tasks import enqueue_deposit_initiation
 from apps.wallets.models import Wallet
 from rest_framework.permissions import AllowAny
 from utils.authentication import RequireAPIKey
 from utils.external_requests import pawapay_request
-from drf_spectacular.utils import extend_schema
+from utils.idempotency import (
+    IDEMPOTENCY_HEADER,
+    bind_idempotency_key,
+    idempotent,
+)
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 from utils import serializers as helpers
 
 User = get_user_model()
 
 
+def _initiating_response(payment):
+    return Response(
+        {"status": PaymentStatus.INITIATING,
+         "data": {"depositId": str(payment.id),
+                  **PaymentSerializer(payment).data},
+         },
+        status=status.HTTP_202_ACCEPTED
+    )
+
+
+def _submit_deposit(payment, breaker):
+    """Submits a stored deposit to PawaPay and answers with the outcome"""
+    data, code = pawapay_request(
+        "POST", "/v2/deposits/",
+        payload=DepositInitiationService.payload(payment))
+    breaker.record(code)
+    if code == 200:
+        DepositInitiationService.apply_response(payment, data)
+        serializer = PaymentSerializer(payment)
+        return Response(
+            {"status": "accepted",
+             "data": serializer.data
+             },
+            status=status.HTTP_201_CREATED
+        )
+    return Response({"status": data['status']}, status=code)
+
+
+def _replay_deposit(payment_id):
+    """
+    Answers a retried deposit request whose first attempt stored the
+    payment but never answered: the payment is reported as it stands, and
+    one still pending is resubmitted (PawaPay ignores a depositId it has
+    already accepted).
+    """
+    payment = Payment.objects.filter(id=payment_id).first()
+    if payment is None:
+        return Response(
+            {"status": "failed", "error": "not_found"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    if payment.status == PaymentStatus.INITIATING:
+        return _initiating_response(payment)
+    if payment.status == PaymentStatus.PENDING:
+        return _submit_deposit(
+            payment, ProviderHealthService.breaker("deposits", payment.provider))
+    return Response(
+        {"status": "accepted", "data": PaymentSerializer(payment).data},
+        status=status.HTTP_201_CREATED
+    )
+
+
 class DepositAPIView(APIView):
     permission_classes = [AllowAny, RequireAPIKey]
     serializer_class = PaymentSerializer
@@ -22,17 +83,28 @@ class DepositAPIView(APIView):
     @extend_schema(
         operation_id="send_tip",
         summary="Send Tip",
+        parameters=[
+            OpenApiParameter(
+                IDEMPOTENCY_HEADER, str, OpenApiParameter.HEADER,
+                description="Client generated key; retries with the same "
+                            "key replay the first response",
+            ),
+        ],
         responses={
             201: helpers.CreatedResponseSerializer,
+            202: helpers.CreatedResponseSerializer,
             400: helpers.ValidationErrorSerializer,
             401: helpers.UnauthorizedErrorSerializer,
             403: helpers.ForbiddenErrorSerializer,
             404: helpers.NotFoundErrorSerializer,
             409: helpers.ConflictErrorSerializer,
+            422: helpers.ErrorSerializer,
             429: helpers.RateLimitErrorSerializer,
             500: helpers.ServerErrorSerializer,
+            503: helpers.ServiceUnavailableErrorSerializer,
         }
     )
+    @idempotent("deposits", replay=_replay_deposit)
     def post(self, request, wallet_id):
         """
         Creates a tip intent and initiates a Mobile Money payment request. This
@@ -45,6 +117,20 @@ class DepositAPIView(APIView):
         Optional:Authenticated patron(future).
 
         If guest is supported, return a receipt without attaching a user identity.
+
+        Retries
+        -------
+        Send an `Idempotency-Key` header; a retry with the same key and
+        body gets the original response back without a second payment. If
+        the first attempt stored the payment but failed before answering,
+        the retry reports (or resubmits) that payment.
+
+        Asynchronous initiation
+        -----------------------
+        With `Prefer: respond-async` (or PAWAPAY_ASYNC_DEPOSITS on) the
+        payment is stored as "initiating" and 202 is returned with its
+        depositId at once; a worker submits it to PawaPay. Poll the
+        payment status endpoint with the depositId for the outcome.
         """
         serializer = PaymentSerializer(data=request.data)
         if serializer.is_valid():
@@ -60,46 +146,37 @@ class DepositAPIView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             wallet = get_object_or_404(Wallet, id=wallet_id)
-            
-            with transaction.atomic():
-                payment = serializer.save(wallet=wallet)
 
-            payload = {
-                "amount": str(int(payment.amount)),
-                "currency": "ZMW",
-                "depositId": str(payment.id),
-                "payer": {
-                    "type": "MMO",
-                    "accountDetails": {
-                        "provider": str(payment.provider),
-                        "phoneNumber": '26' + str(payment.patron_phone),
-                    },
-                },
-                "customerMessage": "Tipping at TipZed",
-                "clientReferenceId": payment.reference,
-                "metadata": [
-                    {
-                        "paymentId": str(payment.id),
-                        "walletId": str(wallet.id)
-                    }
-                ],
-            }
-
-            data, code = pawapay_request(
-                "POST", "/v2/deposits/", payload=payload)
-            if code == 200:
-                status_lower = data.get("status", "").lower()
-                payment.status = status_lower
-                payment.metadata = data
-                payment.save()
-                serializer = PaymentSerializer(payment)
+            # Fail fast while the operator is down instead of waiting for
+            # PawaPay to time out
+            provider = serializer.validated_data.get("provider")
+            breaker = ProviderHealthService.breaker("deposits", provider)
+            if not ProviderHealthService.is_available(provider) \
+                    or not breaker.allow():
                 return Response(
-                    {"status": "accepted",
-                     "data": serializer.data
-                     },
-                    status=status.HTTP_201_CREATED
+                    {
+                        "status": "failed",
+                        "error": "provider_unavailable",
+                        "message": "Payment provider unavailable, retry later",
+                        "retryAfter": breaker.cooldown,
+                    },
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={"Retry-After": str(breaker.cooldown)},
                 )
-            return Response({"status": data['status']}, status=code)
+
+            if DepositInitiationService.is_async(request):
+                with transaction.atomic():
+                    payment = serializer.save(
+                        wallet=wallet, status=PaymentStatus.INITIATING)
+                    transaction.on_commit(
+                        lambda: enqueue_deposit_initiation(payment.id))
+                bind_idempotency_key(request, payment.id)
+                return _initiating_response(payment)
+
+            with transaction.atomic():
+                payment = serializer.save(wallet=wallet)
+            bind_idempotency_key(request, payment.id)
+            return _submit_deposit(payment, breaker)
 
         return Response(
             {
@@ -108,3 +185,24 @@ class DepositAPIView(APIView):
             },
             status=status.HTTP_400_BAD_REQUEST
         )
+
+
+class ProviderAvailabilityAPIView(APIView):
+    """Cached PawaPay availability of each mobile money operator"""
+    permission_classes = [AllowAny, RequireAPIKey]
+
+    @extend_schema(
+        operation_id="provider_availability",
+        summary="Provider Availability",
+        responses={200: helpers.SuccessResponseSerializer},
+    )
+    def get(self, request):
+        """
+        Returns the deposit status of each operator (OPERATIONAL, DELAYED
+        or CLOSED) as last reported by PawaPay, so clients can steer
+        patrons away from operators that are down.
+        """
+        return Response(
+            {"status": "success", "data": ProviderHealthService.availability()},
+            status=status.HTTP_200_OK,
+        )
@@ -1,27 +1,45 @@
 import json
-from django.db import transaction
+import uuid
 from django.contrib.auth import get_user_model
 from rest_framework.response import Response
 from rest_framework import status
 from drf_spectacular.utils import extend_schema
 from rest_framework.permissions import AllowAny
 from rest_framework.views import APIView
-from apps.payments.models import Payment
+from apps.payments.models import FINAL_PAYMENT_STATUSES, Payment, PaymentStatus
 from apps.payments.models import PaymentWebhookLog as WebHook
-from apps.wallets.services.wallet_services import WalletTransactionService
+from apps.payments.models import WebhookEventType
+from apps.payments.services.callback_dedupe import CallbackDedupeService
+from apps.payments.tasks import enqueue_deposit_callbacks, enqueue_payout_callbacks
 from utils.authentication import RequireAPIKey
-from utils.exceptions import DuplicateTransaction
 from utils.external_requests import resend_callback
 
 User = get_user_model()
 
 
-class WebhookAPIView(APIView):
-    """Handles pawapay deposit Callback requests"""
+class CallbackAPIView(APIView):
+    """
+    Base of the PawaPay callback endpoints. A callback is validated, checked
+    against recently seen provider transaction ids, stored and acknowledged
+    right away; a queued consumer applies it afterwards.
+    """
 
     authentication_classes = []
     permission_classes = []
 
+    # Payload field identifying the operation, which is also the key the
+    # consumer processes callbacks by
+    id_field = None
+    # Callback family for the duplicate check
+    kind = None
+    event_type = None
+    # PaymentWebhookLog column holding the operation id
+    log_field = None
+    # Payload field with the mobile money account details
+    account_field = None
+    # Queues the consumer of the stored callbacks of an operation id
+    enqueue = None
+
     @extend_schema(exclude=True)
     def post(self, request):
         try:
@@ -31,67 +49,85 @@ class WebhookAPIView(APIView):
                 {"error": "Invalid JSON"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        deposit_id = payload.get("depositId")
-        res_status = payload.get("status").lower()
+        operation_id = payload.get(self.id_field)
+        res_status = payload.get("status")
         external_id = payload.get("providerTransactionId")
 
-        if not all([deposit_id, res_status]):
+        if not all([operation_id, isinstance(res_status, str)]):
             return Response(
                 {"error": "Invalid payload"}, status=status.HTTP_400_BAD_REQUEST
             )
-
-        res_status = res_status.lower()
-
-        # IDEMPOTENCY CHECK (fast path) - check for duplicate based on external_id
-        if external_id and WebHook.objects.filter(external_id=external_id).exists():
-            return Response(
-                {"message": "Duplicate callback ignored"}, status=status.HTTP_200_OK
-            )
         try:
-            with transaction.atomic():
-                payment = Payment.objects.select_for_update().get(id=deposit_id)
-                # Dont update status if pending/submitted/accepted to
-                # avoid overwriting final state
-                skip_statuses = [
-                    "pending",
-                    "submitted",
-                    "accepted",
-                    "processing",
-                    "in_reconciliation",
-                ]
-                if res_status in skip_statuses:
-                    res_status = payment.status
-                payment.status = res_status
-                payment.save()
-
-                # Create webhook log ONCE
-                WebHook.objects.create(
-                    parsed_payload=payload,
-                    event_type=f"deposit.{res_status}",
-                    payment=payment,
-                    provider=payment.provider,
-                    external_id=external_id,
-                )
-                if res_status == "completed" and payment.wallet is not None:
-                    try:
-                        WalletTransactionService.cash_in(
-                            wallet=payment.wallet,
-                            amount=payment.amount,
-                            payment=payment,
-                            reference=external_id,
-                        )
-                    except DuplicateTransaction:
-                        pass
-
-        except Payment.DoesNotExist:
+            operation_id = str(uuid.UUID(str(operation_id)))
+        except ValueError:
             return Response({"status": "NOT_FOUND"}, status=status.HTTP_404_NOT_FOUND)
 
-        except Exception:
-            # If unique constraint triggered by race condition
+        # IDEMPOTENCY CHECK (fast path) - repeats of a provider transaction
+        # id are rejected from the cache; the consumer re-checks the log
+        if external_id and not CallbackDedupeService.claim(
+                external_id, kind=self.kind):
             return Response(
                 {"message": "Duplicate callback ignored"}, status=status.HTTP_200_OK
             )
-        return Response({"message": "Callback processed"}, status=status.HTTP_200_OK)
+
+        account = (payload.get(self.account_field) or {}).get("accountDetails") or {}
+        try:
+            WebHook.objects.create(
+                raw_payload=request.body.decode("utf-8", errors="replace"),
+                parsed_payload=payload,
+                event_type=self.event_type,
+                provider=account.get("provider", ""),
+                external_id=external_id or "",
+                **{self.log_field: operation_id},
+            )
+        except Exception:
+            if external_id:
+                CallbackDedupeService.release(external_id, kind=self.kind)
+            raise
+        self.enqueue(operation_id)
+        return Response({"message": "Callback received"}, status=status.HTTP_200_OK)
+
+
+class WebhookAPIView(CallbackAPIView):
+    """
+    Handles pawapay deposit Callback requests. process_deposit_callbacks
+    applies them to the payment from the queue.
+    """
+
+    id_field = "depositId"
+    kind = "deposit"
+    event_type = WebhookEventType.DEPOSIT_CALLBACK_RECEIVED
+    log_field = "deposit_id"
+    account_field = "payer"
+    enqueue = staticmethod(enqueue_deposit_callbacks)
+
+
+class PayoutWebhookAPIView(CallbackAPIView):
+    """
+    Handles pawapay payout Callback requests. process_payout_callbacks
+    finalizes the payout transaction from the queue.
+    """
+
+    id_field = "payoutId"
+    kind = "payout"
+    event_type = WebhookEventType.PAYOUT_CALLBACK_RECEIVED
+    log_field = "payout_id"
+    account_field = "recipient"
+    enqueue = staticmethod(enqueue_payout_callbacks)
+
+
+class RefundWebhookAPIView(CallbackAPIView):
+    """
+    Handles pawapay refund Callback requests. Refunds are queued with the
+    other callbacks of the refunded deposit, so they apply in order.
+    """
+
+    id_field = "depositId"
+    kind = "refund"
+    event_type = WebhookEventType.REFUND_CALLBACK_RECEIVED
+    log_field = "deposit_id"
+    account_field = "recipient"
+    enqueue = staticmethod(enqueue_deposit_callbacks)
 
 
 class PaymentStatusAPIView(APIView):
@@ -120,8 +156,9 @@ class PaymentStatusAPIView(APIView):
     def get(self, request, payment_id):
         try:
             payment = Payment.objects.get(id=str(payment_id))
-            final_statuses = ["completed", "failed", "rejected"]
-            if payment.status in final_statuses:
+            # Initiating payments are not known to PawaPay yet
+            if payment.status in FINAL_PAYMENT_STATUSES \
+                    or payment.status == PaymentStatus.INITIATING:
                 return Response({"status": payment.status}, status=status.HTTP_200_OK)
             # Check if payment has received a callback before returning status
             if not WebHook.objects.filter(
@@ -0,0 +1,53 @@
+"""
+Management command to rebuild the daily platform stats shown on the admin
+dashboards from the ledger and payments tables, e.g. after deploying the
+rollup or repairing data outside the services.
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from django.utils import timezone
+from apps.payments.models import Payment
+from apps.payments.services.platform_stats import PlatformStatsService
+from apps.wallets.models import WalletTransaction
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily platform stats from the ledger and payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Only rebuild this many days back (default: all history)'
+        )
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=31,
+            help='Number of days rebuilt per transaction'
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options['days'] is not None:
+            start = today - timedelta(days=options['days'])
+        else:
+            firsts = [
+                WalletTransaction.objects.aggregate(first=Min('created_at'))['first'],
+                Payment.objects.aggregate(first=Min('created_at'))['first'],
+            ]
+            firsts = [timezone.localdate(first) for first in firsts if first]
+            if not firsts:
+                self.stdout.write(self.style.SUCCESS('Nothing to rebuild'))
+                return
+            start = min(firsts)
+
+        rebuilt = 0
+        while start <= today:
+            end = min(start + timedelta(days=options['window'] - 1), today)
+            rebuilt += PlatformStatsService.rebuild(start, end)
+            start = end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} days'))
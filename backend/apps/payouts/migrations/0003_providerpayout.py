@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payouts', '0002_payoutrun'),
+        ('wallets', '0008_wallet_next_payout_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderPayout',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('submitting', 'Submitting'), ('accepted', 'Accepted'), ('rejected', 'Rejected'), ('completed', 'Completed'), ('failed', 'Failed')], db_index=True, default='submitting', max_length=20)),
+                ('provider', models.CharField(max_length=50)),
+                ('phone_number', models.CharField(max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('failure_reason', models.CharField(blank=True, default='', max_length=255)),
+                ('response', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finalized_at', models.DateTimeField(blank=True, null=True)),
+                ('payout_tx', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='provider_payout', to='wallets.wallettransaction')),
+            ],
+        ),
+    ]
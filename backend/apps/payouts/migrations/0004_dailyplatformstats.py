@@ -0,0 +1,44 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payouts', '0003_providerpayout'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPlatformStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('shard', models.PositiveSmallIntegerField(default=0)),
+                ('cash_in_count', models.IntegerField(default=0)),
+                ('cash_in_amount', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('fee_amount', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('payout_count', models.IntegerField(default=0)),
+                ('payout_amount', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('payout_pending_count', models.IntegerField(default=0)),
+                ('payout_pending_amount', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('payout_completed_count', models.IntegerField(default=0)),
+                ('payout_completed_amount', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('payout_failed_count', models.IntegerField(default=0)),
+                ('payout_failed_amount', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('payment_count', models.IntegerField(default=0)),
+                ('payment_pending_count', models.IntegerField(default=0)),
+                ('payment_pending_amount', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('payment_completed_count', models.IntegerField(default=0)),
+                ('payment_completed_amount', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('payment_failed_count', models.IntegerField(default=0)),
+                ('payment_failed_amount', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+            ],
+            options={
+                'verbose_name_plural': 'daily platform stats',
+                'ordering': ['-date', 'shard'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'shard'), name='daily_platform_stats_shard_uniq')],
+            },
+        ),
+    ]
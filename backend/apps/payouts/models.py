@@ -60,4 +60,115 @@ class PayoutSchedule(models.Model):
             self.next_payout_date = now.replace(year=year, month=next_month, day=1)
 
         self.save()
-      
\ No newline at end of file
+
+
+class PayoutRun(models.Model):
+    """
+    One run of the automatic payout engine. The eligible wallets are split
+    into chunks processed in parallel; each chunk adds its outcome to the
+    counters, so progress can be followed while the run is going.
+    """
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default='running', db_index=True)
+    total_wallets = models.PositiveIntegerField(default=0)
+    total_chunks = models.PositiveIntegerField(default=0)
+    chunks_done = models.PositiveIntegerField(default=0)
+    succeeded = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Payout run {self.pk} ({self.status})"
+
+
+class ProviderPayout(models.Model):
+    """
+    Submission of a PAYOUT wallet transaction to PawaPay. The payout
+    transaction id is sent as the PawaPay payoutId, so a resubmission is
+    ignored by the provider instead of paying twice.
+    """
+    STATUS_CHOICES = [
+        ('submitting', 'Submitting'),
+        ('accepted', 'Accepted'),
+        ('rejected', 'Rejected'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    payout_tx = models.OneToOneField(
+        'wallets.WalletTransaction', on_delete=models.CASCADE,
+        related_name='provider_payout')
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default='submitting', db_index=True)
+    provider = models.CharField(max_length=50)
+    phone_number = models.CharField(max_length=20)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    failure_reason = models.CharField(max_length=255, blank=True, default="")
+    response = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finalized_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Provider payout {self.payout_tx_id} ({self.status})"
+
+
+class DailyPlatformStats(models.Model):
+    """
+    Platform totals of one day, read by the admin stats and payout summary
+    pages instead of aggregating the ledger and payments tables. Ledger
+    rows count on the day they were written, payments on the day they
+    were created, and a status change moves them between buckets of that
+    same day.
+
+    Writers add their deltas to one of a few shard rows of the day so
+    concurrent writes rarely wait on the same row; counters of a shard may
+    therefore be negative, only the sum over a day is meaningful. The
+    nightly compaction folds every day into its shard 0 row.
+    """
+    date = models.DateField()
+    shard = models.PositiveSmallIntegerField(default=0)
+
+    cash_in_count = models.IntegerField(default=0)
+    cash_in_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    fee_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    payout_count = models.IntegerField(default=0)
+    payout_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    payout_pending_count = models.IntegerField(default=0)
+    payout_pending_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    payout_completed_count = models.IntegerField(default=0)
+    payout_completed_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    payout_failed_count = models.IntegerField(default=0)
+    payout_failed_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    payment_count = models.IntegerField(default=0)
+    payment_pending_count = models.IntegerField(default=0)
+    payment_pending_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    payment_completed_count = models.IntegerField(default=0)
+    payment_completed_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    payment_failed_count = models.IntegerField(default=0)
+    payment_failed_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-date', 'shard']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'shard'], name='daily_platform_stats_shard_uniq'),
+        ]
+        verbose_name_plural = 'daily platform stats'
+
+    def __str__(self):
+        return f"Platform stats {self.date} (shard {self.shard})"
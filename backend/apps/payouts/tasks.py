@@ -1,21 +1,230 @@
-from celery import shared_task
+from celery import chord, shared_task
+from celery.schedules import crontab
+from config.celery import app
 from apps.wallets.models import Wallet
+from apps.payments.services.payout_dispatcher import PayoutDispatcher
 from apps.payments.services.payout_orchestrator import PayoutOrchestrator
+from apps.payments.services.platform_stats import PlatformStatsService
+from apps.payouts.models import PayoutRun
+from apps.wallets.services.wallet_services import PayoutScheduleService
 from django.contrib.auth import get_user_model
 from django.core.mail import send_mail
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from utils.exceptions import InsufficientBalance, InvalidTransaction
 import logging
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+# Wallet ids read per keyset page, and wallets paid out per subtask
+PAYOUT_PAGE_SIZE = 1000
+PAYOUT_CHUNK_SIZE = 100
+
+# Only one payout dispatcher runs at a time
+PAYOUT_DISPATCH_LOCK_KEY = "payouts:dispatcher"
+PAYOUT_DISPATCH_LOCK_TTL = 5 * 60
+
+
+def eligible_wallet_ids(page_size=PAYOUT_PAGE_SIZE, now=None):
+    """
+    Yields the ids of the wallets due for a payout, paging by
+    (next_payout_at, id) so every page is one range scan of the
+    wallet_next_payout_idx index however many wallets there are.
+    """
+    wallets = PayoutScheduleService.due_wallets(now or timezone.now())
+    last = None
+    while True:
+        page = wallets
+        if last is not None:
+            last_at, last_id = last
+            page = wallets.filter(
+                Q(next_payout_at__gt=last_at)
+                | Q(next_payout_at=last_at, pk__gt=last_id)
+            )
+        rows = list(page.values_list("next_payout_at", "pk")[:page_size])
+        for _, wallet_id in rows:
+            yield wallet_id
+        if len(rows) < page_size:
+            return
+        last = rows[-1]
+
+
+@shared_task
+def auto_payout_wallets(chunk_size=PAYOUT_CHUNK_SIZE):
+    """
+    Starts a payout run: the wallets due for a payout are split into
+    chunks paid out by parallel payout_wallet_chunk subtasks, and
+    finish_payout_run closes the run once every chunk is done.
+
+    Returns:
+        int: Id of the PayoutRun.
+    """
+    run = PayoutRun.objects.create()
+    chunks, chunk = [], []
+    for wallet_id in eligible_wallet_ids():
+        chunk.append(str(wallet_id))
+        if len(chunk) == chunk_size:
+            chunks.append(chunk)
+            chunk = []
+    if chunk:
+        chunks.append(chunk)
+
+    PayoutRun.objects.filter(pk=run.pk).update(
+        total_wallets=sum(len(ids) for ids in chunks),
+        total_chunks=len(chunks),
+    )
+    if not chunks:
+        finish_payout_run.run([], run.pk)
+        return run.pk
+
+    chord(
+        payout_wallet_chunk.s(run.pk, ids) for ids in chunks
+    )(finish_payout_run.s(run.pk).on_error(fail_payout_run.s(run.pk)))
+    return run.pk
+
 
 @shared_task
-def auto_payout_wallets():
-    # get superuser
+def payout_wallet_chunk(run_id, wallet_ids):
+    """
+    Initiates the payouts of a chunk of wallets. Each wallet runs in its
+    own transaction, so one failing wallet never affects the others.
+
+    Returns:
+        dict: Counters of succeeded, skipped and failed wallets.
+    """
+    counters = {"succeeded": 0, "skipped": 0, "failed": 0}
     system_user = User.objects.filter(is_superuser=True).first()
-    for wallet in Wallet.objects.filter(balance__gt=0, is_verified=True):
-        PayoutOrchestrator.initiate_payout(
-            wallet=wallet,
-            initiated_by=system_user,  # System initiated
-        )
\ No newline at end of file
+    if system_user is None:
+        logger.error(f"Payout run {run_id}: no system user to initiate payouts")
+        counters["failed"] = len(wallet_ids)
+    else:
+        for wallet in Wallet.objects.filter(pk__in=wallet_ids):
+            try:
+                PayoutOrchestrator.initiate_payout(
+                    wallet=wallet,
+                    initiated_by=system_user,  # System initiated
+                )
+                counters["succeeded"] += 1
+            except (InsufficientBalance, InvalidTransaction) as exc:
+                # Emptied or already pending since the run started
+                logger.info(f"Payout run {run_id}: skipped wallet {wallet.pk}: {exc}")
+                counters["skipped"] += 1
+            except Exception:
+                logger.exception(f"Payout run {run_id}: payout of wallet {wallet.pk} failed")
+                counters["failed"] += 1
+
+    PayoutRun.objects.filter(pk=run_id).update(
+        chunks_done=F("chunks_done") + 1,
+        succeeded=F("succeeded") + counters["succeeded"],
+        skipped=F("skipped") + counters["skipped"],
+        failed=F("failed") + counters["failed"],
+    )
+    return counters
+
+
+@shared_task
+def finish_payout_run(results, run_id):
+    """Marks a payout run completed once all of its chunks are done."""
+    with transaction.atomic():
+        run = PayoutRun.objects.select_for_update().get(pk=run_id)
+        run.status = "completed"
+        run.finished_at = timezone.now()
+        run.save(update_fields=["status", "finished_at"])
+    logger.info(
+        f"Payout run {run_id} completed: {run.succeeded} paid, "
+        f"{run.skipped} skipped, {run.failed} failed"
+    )
+    if run.succeeded and getattr(settings, "PAWAPAY_PAYOUTS_ENABLED", False):
+        # Send the new payouts without waiting for the next schedule
+        transaction.on_commit(dispatch_pending_payouts.delay)
+    return run_id
+
+
+@shared_task
+def fail_payout_run(request, exc, traceback, run_id):
+    """Marks a payout run failed when one of its chunks crashed."""
+    PayoutRun.objects.filter(pk=run_id, status="running").update(
+        status="failed", error=str(exc), finished_at=timezone.now())
+    logger.error(f"Payout run {run_id} failed: {exc}")
+
+
+@shared_task
+def dispatch_pending_payouts():
+    """
+    Submits pending payouts to PawaPay in bulk batches. Does nothing
+    unless PAWAPAY_PAYOUTS_ENABLED is on; runs never overlap.
+
+    Returns:
+        dict: Counters of the run, or a status message if skipped.
+    """
+    if not getattr(settings, "PAWAPAY_PAYOUTS_ENABLED", False):
+        return "Provider payouts disabled"
+    if not cache.add(PAYOUT_DISPATCH_LOCK_KEY, 1,
+                     timeout=PAYOUT_DISPATCH_LOCK_TTL):
+        return "Dispatch already running"
+    try:
+        return PayoutDispatcher.run()
+    finally:
+        cache.delete(PAYOUT_DISPATCH_LOCK_KEY)
+
+
+@shared_task
+def settle_accepted_payouts():
+    """Polls accepted payouts whose callback never arrived."""
+    if not getattr(settings, "PAWAPAY_PAYOUTS_ENABLED", False):
+        return "Provider payouts disabled"
+    return PayoutDispatcher.poll_accepted()
+
+
+@shared_task
+def compact_platform_stats():
+    """
+    Rebuilds the recent days of the admin dashboard totals from the
+    ledger and payments tables and folds older shard rows.
+
+    Returns:
+        dict: Number of days rebuilt and shard rows folded.
+    """
+    result = PlatformStatsService.compact()
+    logger.info(
+        f"Platform stats compacted: {result['rebuilt']} days rebuilt, "
+        f"{result['folded']} shard rows folded"
+    )
+    return result
+
+
+# Submit pending payouts every five minutes
+@app.on_after_finalize.connect
+def setup_dispatch_pending_payouts_task(sender, **kwargs):
+    """Schedule the payout dispatcher to run every five minutes."""
+    sender.add_periodic_task(
+        crontab(minute="*/5"),
+        dispatch_pending_payouts.s(),
+        name='Submit pending payouts to PawaPay every five minutes',
+    )
+
+
+# Settle payouts with a missing callback every fifteen minutes
+@app.on_after_finalize.connect
+def setup_settle_accepted_payouts_task(sender, **kwargs):
+    """Schedule the accepted payout status check every fifteen minutes."""
+    sender.add_periodic_task(
+        crontab(minute="*/15"),
+        settle_accepted_payouts.s(),
+        name='Settle accepted PawaPay payouts every fifteen minutes',
+    )
+
+
+# Compact the dashboard totals once the day is closed
+@app.on_after_finalize.connect
+def setup_compact_platform_stats_task(sender, **kwargs):
+    """Schedule the platform stats compaction every night at 00:30."""
+    sender.add_periodic_task(
+        crontab(hour=0, minute=30),
+        compact_platform_stats.s(),
+        name='Compact daily platform stats every night',
+    )
@@ -1,12 +1,15 @@
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib import messages
+from django.db import transaction
 from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse
 from django.views.decorators.http import require_http_methods
 
+from apps.payouts.models import ProviderPayout
 from apps.wallets.models import Wallet, WalletTransaction
 from apps.payments.services.payout_orchestrator import PayoutOrchestrator
+from apps.payments.services.platform_stats import PlatformStatsService
 from utils.send_emails import send_missing_payout_account_email
 
 
@@ -15,6 +18,15 @@ def superuser_required(view_func):
         lambda u: u.is_active and u.is_superuser)(view_func)
 
 
+def _submitted_to_provider(payout_tx):
+    """
+    Whether a payout is in PawaPay's hands: submitted and neither rejected
+    nor failed. Finalising it by hand could pay the creator twice.
+    """
+    return ProviderPayout.objects.filter(payout_tx=payout_tx).exclude(
+        status__in=["rejected", "failed"]).exists()
+
+
 @staff_member_required
 @superuser_required
 @require_http_methods(["GET", "POST"])
@@ -42,6 +54,14 @@ def finalise_wallet_payout(request, payout_tx_id):
         args=[wallet.id],
     )
 
+    if _submitted_to_provider(payout_tx):
+        messages.error(
+            request,
+            "Payout was submitted to PawaPay and is settled by its outcome; "
+            "it can no longer be finalised manually.",
+        )
+        return redirect(wallet_change_url)
+
     # =============================
     # STEP 1: Confirmation page
     # =============================
@@ -61,11 +81,17 @@ def finalise_wallet_payout(request, payout_tx_id):
     # STEP 2: Finalise payout
     # =============================
     try:
-        PayoutOrchestrator.finalize(
-            payout_tx=payout_tx,
-            success=True,
-            approved_by=request.user,
-        )
+        with transaction.atomic():
+            # The payout dispatcher claims payouts under the same row lock
+            WalletTransaction.objects.select_for_update().filter(
+                pk=payout_tx.pk).exists()
+            if _submitted_to_provider(payout_tx):
+                raise ValueError("payout was submitted to PawaPay meanwhile")
+            PayoutOrchestrator.finalize(
+                payout_tx=payout_tx,
+                success=True,
+                approved_by=request.user,
+            )
 
         messages.success(
             request,
@@ -159,50 +185,35 @@ def payout_summary(request):
     """
     Superuser-only view to display payout summary and statistics.
     Shows pending payouts, completed payouts, total amounts, etc.
+    Totals are read from the daily platform stats rollup.
     """
-    from django.db.models import Sum, Count, Q
     from django.utils import timezone
     from datetime import timedelta
 
-    # Get all wallet transactions
-    all_transactions = WalletTransaction.objects.filter(transaction_type="PAYOUT")
-    
-    # Pending payouts
-    pending_payouts = all_transactions.filter(status="PENDING")
-    pending_count = pending_payouts.count()
-    pending_total = pending_payouts.aggregate(Sum("amount"))["amount__sum"] or 0
-    
-    # Completed payouts
-    completed_payouts = all_transactions.filter(status="COMPLETED")
-    completed_count = completed_payouts.count()
-    completed_total = completed_payouts.aggregate(Sum("amount"))["amount__sum"] or 0
-    
-    # Failed payouts
-    failed_payouts = all_transactions.filter(status="FAILED")
-    failed_count = failed_payouts.count()
-    failed_total = failed_payouts.aggregate(Sum("amount"))["amount__sum"] or 0
-    
-    # Recent payouts (last 30 days)
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    recent_payouts = all_transactions.filter(created_at__gte=thirty_days_ago)
-    
-    # Total statistics
-    total_payouts = all_transactions.aggregate(Sum("amount"))["amount__sum"] or 0
-    total_count = all_transactions.count()
-    
+    totals = PlatformStatsService.totals()
+    # Last 30 days, today included
+    recent = PlatformStatsService.totals(
+        since=timezone.localdate() - timedelta(days=29))
+
+    payouts = (
+        WalletTransaction.objects.filter(transaction_type="PAYOUT")
+        .select_related("wallet__creator__user", "approved_by")
+        .order_by("-created_at")
+    )
+
     context = {
-        "pending_payouts": pending_payouts[:10],  # Show last 10 pending
-        "pending_count": pending_count,
-        "pending_total": pending_total,
-        "completed_payouts": completed_payouts[:10],  # Show last 10 completed
-        "completed_count": completed_count,
-        "completed_total": completed_total,
-        "failed_payouts": failed_payouts[:10],  # Show last 10 failed
-        "failed_count": failed_count,
-        "failed_total": failed_total,
-        "recent_payouts_count": recent_payouts.count(),
-        "total_payouts": total_payouts,
-        "total_count": total_count,
+        "pending_payouts": payouts.filter(status="PENDING")[:10],  # Show last 10 pending
+        "pending_count": totals["payout_pending_count"],
+        "pending_total": totals["payout_pending_amount"],
+        "completed_payouts": payouts.filter(status="COMPLETED")[:10],  # Show last 10 completed
+        "completed_count": totals["payout_completed_count"],
+        "completed_total": totals["payout_completed_amount"],
+        "failed_payouts": payouts.filter(status="FAILED")[:10],  # Show last 10 failed
+        "failed_count": totals["payout_failed_count"],
+        "failed_total": totals["payout_failed_amount"],
+        "recent_payouts_count": recent["payout_count"],
+        "total_payouts": totals["payout_amount"],
+        "total_count": totals["payout_count"],
     }
     
     return render(request, "payouts/payout_summary.html", context)
@@ -214,81 +225,48 @@ def stats(request):
     """
     Superuser-only view to display overall platform statistics.
     Shows creator counts, wallet statistics, payment statistics, etc.
+    Payment and ledger totals are read from the daily platform stats
+    rollup; wallet figures are current state, read in one aggregate.
     """
     from django.db.models import Sum, Count, Avg, Q
-    from django.db.models.functions import Abs
     from django.utils import timezone
     from datetime import timedelta
     from apps.creators.models import CreatorProfile
-    from apps.payments.models import Payment
-    
-    # Creator statistics
-    total_creators = CreatorProfile.objects.count()
-    verified_creators = Wallet.objects.filter(is_verified=True).count()
-    active_creators = Wallet.objects.filter(is_active=True).count()
-    
-    # Wallet statistics
-    total_wallets = Wallet.objects.count()
-    total_balance = Wallet.objects.aggregate(Sum("balance"))["balance__sum"] or 0
-    avg_balance = Wallet.objects.aggregate(Avg("balance"))["balance__avg"] or 0
-    
-    # Transaction statistics (last 30 days)
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    cash_in_txns = WalletTransaction.objects.filter(
-        transaction_type="CASH_IN",
-        created_at__gte=thirty_days_ago
-    )
-    payout_txns = WalletTransaction.objects.filter(
-        transaction_type="PAYOUT",
-        created_at__gte=thirty_days_ago
+
+    # Creator and wallet statistics
+    wallets = Wallet.objects.aggregate(
+        total_wallets=Count("id"),
+        verified_creators=Count("id", filter=Q(is_verified=True)),
+        active_creators=Count("id", filter=Q(is_active=True)),
+        total_balance=Sum("balance"),
+        avg_balance=Avg("balance"),
     )
-    
-    cash_in_total = cash_in_txns.aggregate(Sum("amount"))["amount__sum"] or 0
-    payout_total = payout_txns.aggregate(Sum("amount"))["amount__sum"] or 0
-    
-    # Payment statistics
-    total_payments = Payment.objects.count()
-    successful_payments = Payment.objects.filter(status="completed").count()
-    pending_payments = Payment.objects.filter(status="pending").count()
-    failed_payments = Payment.objects.filter(status="failed").count()
-    
-    # Only sum completed payments for total amount
-    total_payment_amount = Payment.objects.filter(status="completed").aggregate(
-        Sum("amount")
-    )["amount__sum"] or 0
-
-    total_failed_amount = Payment.objects.filter(status="failed").aggregate(
-        Sum("amount")
-    )["amount__sum"] or 0
-
-    total_pending_amount = Payment.objects.filter(status="pending").aggregate(
-        Sum("amount")
-    )["amount__sum"] or 0
-    
-    # Fee statistics
-    total_fees = WalletTransaction.objects.filter(
-        transaction_type="FEE"
-    ).aggregate(total=Sum(Abs("amount")))["total"] or 0
-    
+
+    totals = PlatformStatsService.totals()
+    # Transaction statistics (last 30 days, today included)
+    recent = PlatformStatsService.totals(
+        since=timezone.localdate() - timedelta(days=29))
+
     context = {
-        "total_creators": total_creators,
-        "verified_creators": verified_creators,
-        "active_creators": active_creators,
-        "total_wallets": total_wallets,
-        "total_balance": total_balance,
-        "avg_balance": avg_balance,
-        "cash_in_total": cash_in_total,
-        "cash_in_count": cash_in_txns.count(),
-        "payout_total": payout_total,
-        "payout_count": payout_txns.count(),
-        "total_payments": total_payments,
-        "successful_payments": successful_payments,
-        "pending_payments": pending_payments,
-        "failed_payments": failed_payments,
-        "total_payment_amount": total_payment_amount,
-        "total_pending_amount": total_pending_amount,
-        "total_failed_amount": total_failed_amount,
-        "total_fees": total_fees,
+        "total_creators": CreatorProfile.objects.count(),
+        "verified_creators": wallets["verified_creators"],
+        "active_creators": wallets["active_creators"],
+        "total_wallets": wallets["total_wallets"],
+        "total_balance": wallets["total_balance"] or 0,
+        "avg_balance": wallets["avg_balance"] or 0,
+        "cash_in_total": recent["cash_in_amount"],
+        "cash_in_count": recent["cash_in_count"],
+        "payout_total": recent["payout_amount"],
+        "payout_count": recent["payout_count"],
+        "total_payments": totals["payment_count"],
+        "successful_payments": totals["payment_completed_count"],
+        "pending_payments": totals["payment_pending_count"],
+        "failed_payments": totals["payment_failed_count"],
+        # Only completed payments count towards the total amount
+        "total_payment_amount": totals["payment_completed_amount"],
+        "total_pending_amount": totals["payment_pending_amount"],
+        "total_failed_amount": totals["payment_failed_amount"],
+        "total_fees": totals["fee_amount"],
     }
     
     return render(request, "payouts/stats.html", context)
@@ -0,0 +1,250 @@
+"""
+Management command to benchmark the WalletTransaction hot query shapes.
+
+Seeds a synthetic ledger (optionally), then prints the query plan and
+latency of every query the wallet endpoints and services run. Run it
+once before and once after `migrate wallets 0003` to compare plans:
+
+    python manage.py benchmark_wallet_queries --seed 10000000 --wallets 1000
+    python manage.py migrate wallets 0002
+    python manage.py benchmark_wallet_queries
+    python manage.py migrate wallets
+    python manage.py benchmark_wallet_queries
+    python manage.py benchmark_wallet_queries --cleanup
+"""
+import statistics
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+from apps.wallets.models import Wallet, WalletTransaction
+
+BENCH_PREFIX = "BENCH-"
+SEED_CHUNK = 1_000_000
+BULK_BATCH = 5_000
+
+
+class Command(BaseCommand):
+    help = 'Benchmark WalletTransaction query plans and latencies'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Number of synthetic ledger rows to insert before benchmarking'
+        )
+        parser.add_argument(
+            '--wallets',
+            type=int,
+            default=100,
+            help='Number of existing wallets to spread the seeded rows over'
+        )
+        parser.add_argument(
+            '--hot-share',
+            type=int,
+            default=10,
+            help='Percentage of seeded rows that go to the benchmarked wallet'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Number of timed runs per query'
+        )
+        parser.add_argument(
+            '--wallet',
+            type=str,
+            default=None,
+            help='Wallet id to benchmark (defaults to the first seeded wallet)'
+        )
+        parser.add_argument(
+            '--cleanup',
+            action='store_true',
+            help='Delete the seeded rows and exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted, _ = WalletTransaction.objects.filter(
+                reference__startswith=BENCH_PREFIX).delete()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} seeded rows'))
+            return
+
+        wallet_ids = list(
+            Wallet.objects.order_by('id').values_list('id', flat=True)[
+                :options['wallets']]
+        )
+        if not wallet_ids:
+            raise CommandError('No wallets found. Create wallets first.')
+
+        if options['seed']:
+            self.seed(options['seed'], wallet_ids, options['hot_share'])
+
+        wallet_id = options['wallet'] or wallet_ids[0]
+        wallet = Wallet.objects.get(id=wallet_id)
+        self.stdout.write(
+            f'Benchmarking wallet {wallet.id} '
+            f'({wallet.transactions.count()} rows, '
+            f'{WalletTransaction.objects.count()} rows in total)\n'
+        )
+        for name, queryset, run in self.queries(wallet):
+            self.report(name, queryset, run, options['repeat'])
+
+    def seed(self, rows, wallet_ids, hot_share):
+        """Insert `rows` synthetic ledger rows spread over `wallet_ids`."""
+        started = time.perf_counter()
+        if connection.vendor == 'postgresql':
+            self._seed_postgres(rows, wallet_ids, hot_share)
+        else:
+            self._seed_bulk(rows, wallet_ids, hot_share)
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {rows} rows in {time.perf_counter() - started:.1f}s'))
+
+    def _seed_postgres(self, rows, wallet_ids, hot_share):
+        table = WalletTransaction._meta.db_table
+        sql = f"""
+            INSERT INTO {table} (
+                id, wallet_id, amount, fee, transaction_type, status,
+                reference, correlation_id, created_at
+            )
+            SELECT
+                gen_random_uuid(),
+                CASE WHEN g %% 100 < %(hot_share)s THEN (%(wallets)s::uuid[])[1]
+                     ELSE (%(wallets)s::uuid[])[1 + g %% %(count)s] END,
+                CASE WHEN g %% 10 = 0 THEN -50 WHEN g %% 10 IN (1, 2) THEN -1
+                     ELSE 10 END,
+                0,
+                CASE WHEN g %% 10 = 0 THEN 'PAYOUT' WHEN g %% 10 IN (1, 2) THEN 'FEE'
+                     ELSE 'CASH_IN' END,
+                CASE WHEN g %% 10 = 0 AND g %% 997 = 0 THEN 'PENDING'
+                     WHEN g %% 50 = 0 THEN 'FAILED' ELSE 'COMPLETED' END,
+                %(prefix)s || g,
+                %(prefix)s || 'CORR-' || g,
+                now() - (g * interval '1 second')
+            FROM generate_series(%(start)s, %(end)s) AS g
+        """
+        offset = WalletTransaction.objects.filter(
+            reference__startswith=BENCH_PREFIX).count()
+        for start in range(offset + 1, offset + rows + 1, SEED_CHUNK):
+            end = min(start + SEED_CHUNK - 1, offset + rows)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, {
+                    'hot_share': hot_share,
+                    'wallets': [str(w) for w in wallet_ids],
+                    'count': len(wallet_ids),
+                    'prefix': BENCH_PREFIX,
+                    'start': start,
+                    'end': end,
+                })
+            self.stdout.write(f'  inserted rows {start}..{end}')
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {table}')
+
+    def _seed_bulk(self, rows, wallet_ids, hot_share):
+        offset = WalletTransaction.objects.filter(
+            reference__startswith=BENCH_PREFIX).count()
+        now = timezone.now()
+        batch = []
+        for g in range(offset + 1, offset + rows + 1):
+            wallet_id = (
+                wallet_ids[0] if g % 100 < hot_share
+                else wallet_ids[g % len(wallet_ids)]
+            )
+            if g % 10 == 0:
+                tx_type, amount = 'PAYOUT', Decimal('-50')
+            elif g % 10 in (1, 2):
+                tx_type, amount = 'FEE', Decimal('-1')
+            else:
+                tx_type, amount = 'CASH_IN', Decimal('10')
+            if tx_type == 'PAYOUT' and g % 997 == 0:
+                tx_status = 'PENDING'
+            elif g % 50 == 0:
+                tx_status = 'FAILED'
+            else:
+                tx_status = 'COMPLETED'
+            batch.append(WalletTransaction(
+                id=uuid.uuid4(),
+                wallet_id=wallet_id,
+                amount=amount,
+                transaction_type=tx_type,
+                status=tx_status,
+                reference=f'{BENCH_PREFIX}{g}',
+                correlation_id=f'{BENCH_PREFIX}CORR-{g}',
+            ))
+            if len(batch) == BULK_BATCH:
+                self._flush(batch, now)
+                batch = []
+        if batch:
+            self._flush(batch, now)
+
+    def _flush(self, batch, now):
+        WalletTransaction.objects.bulk_create(batch)
+        # created_at is auto_now_add, spread it out after the insert
+        for tx in batch:
+            g = int(tx.reference[len(BENCH_PREFIX):])
+            tx.created_at = now - timedelta(seconds=g)
+        WalletTransaction.objects.bulk_update(batch, ['created_at'])
+
+    def queries(self, wallet):
+        """(name, queryset, callable) for every hot query shape."""
+        txns = WalletTransaction.objects.filter(wallet=wallet)
+        ledger = txns.filter(
+            Q(transaction_type='CASH_IN') | Q(transaction_type='PAYOUT'),
+            status='COMPLETED',
+        )
+        recent = txns.filter(transaction_type='CASH_IN').order_by('-created_at')[:10]
+        page = txns.order_by('-created_at', '-id')[:21]
+        # A deep keyset page starts right after a cursor row
+        anchor = next(iter(
+            txns.order_by('-created_at', '-id').values('created_at', 'id')[9999:10000]
+        ), {'created_at': timezone.now(), 'id': uuid.uuid4()})
+        deep_page = txns.filter(
+            Q(created_at__lt=anchor['created_at'])
+            | Q(created_at=anchor['created_at'], id__lt=anchor['id'])
+        ).order_by('-created_at', '-id')[:21]
+        filtered = txns.filter(
+            transaction_type='PAYOUT', status='COMPLETED'
+        ).order_by('-created_at', '-id')[:21]
+        pending = txns.filter(transaction_type='PAYOUT', status='PENDING')
+        last_payout = txns.filter(transaction_type='PAYOUT').order_by('-created_at')[:1]
+        tail = txns.filter(created_at__gte=timezone.now() - timedelta(days=1))
+        return [
+            ('recalculate_wallet_balance', ledger,
+             lambda: ledger.aggregate(total=Sum('amount'))),
+            ('WalletListView recent CASH_IN', recent, lambda: list(recent)),
+            ('WalletTransactionsView page', page, lambda: list(page)),
+            ('WalletTransactionsView deep page', deep_page,
+             lambda: list(deep_page)),
+            ('WalletTransactionsView filtered', filtered, lambda: list(filtered)),
+            ('initiate_payout pending check', pending, lambda: pending.exists()),
+            ('get_next_payout_date last payout', last_payout,
+             lambda: list(last_payout)),
+            ('snapshot tail (last 24h)', tail,
+             lambda: tail.aggregate(total=Sum('amount'))),
+        ]
+
+    def report(self, name, queryset, run, repeat):
+        """Print the plan and latency percentiles of one query."""
+        if connection.vendor == 'postgresql':
+            plan = queryset.explain(analyze=True, buffers=True)
+        else:
+            plan = queryset.explain()
+        run()  # warm up
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(self.style.MIGRATE_HEADING(name))
+        self.stdout.write(plan)
+        self.stdout.write(
+            f'median {statistics.median(timings):.2f}ms  '
+            f'p95 {p95:.2f}ms  over {repeat} runs\n'
+        )
@@ -0,0 +1,48 @@
+"""
+Management command to verify every wallet balance and the ledger
+invariants, optionally repairing drifted balances.
+"""
+from django.core.management.base import BaseCommand
+from apps.wallets.services.reconciliation_service import (
+    LedgerReconciliationService)
+
+
+class Command(BaseCommand):
+    help = 'Reconcile wallet balances against the transaction ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=LedgerReconciliationService.CHUNK_SIZE,
+            help='Number of wallets compared per query'
+        )
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='Rewrite drifted wallet balances from the ledger'
+        )
+
+    def handle(self, *args, **options):
+        report = LedgerReconciliationService.run(options['chunk_size'])
+
+        for check, rows in report.items():
+            label = check.replace('_', ' ').capitalize()
+            if not rows:
+                self.stdout.write(self.style.SUCCESS(f'{label}: none'))
+                continue
+            self.stdout.write(self.style.ERROR(f'{label}: {len(rows)}'))
+            for row in rows:
+                self.stdout.write(f'  {row}')
+
+        if options['repair'] and report['balance_mismatches']:
+            repaired = LedgerReconciliationService.repair_balances(
+                report['balance_mismatches'])
+            self.stdout.write(
+                self.style.SUCCESS(f'Repaired {repaired} wallet balances'))
+
+        issues = sum(len(rows) for rows in report.values())
+        self.stdout.write(
+            self.style.SUCCESS('Ledger is consistent') if not issues
+            else self.style.WARNING(f'Found {issues} discrepancies')
+        )
@@ -0,0 +1,37 @@
+# Generated by Django 6.0.1 on 2026-10-17 17:48
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletBalanceSnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('as_of', models.DateTimeField(help_text='Covers transactions created strictly before this time')),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('cash_in', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cash_out', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cash_in_costs', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_outgoing', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='wallets.wallet')),
+            ],
+            options={
+                'verbose_name': 'Wallet Balance Snapshot',
+                'verbose_name_plural': 'Wallet Balance Snapshots',
+                'get_latest_by': 'as_of',
+                'indexes': [models.Index(fields=['wallet', '-as_of'], name='wallets_wal_wallet__31b682_idx')],
+                'constraints': [models.UniqueConstraint(fields=('wallet', 'as_of'), name='unique_wallet_snapshot_as_of')],
+            },
+        ),
+    ]
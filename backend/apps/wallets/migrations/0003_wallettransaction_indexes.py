@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-17 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0002_walletbalancesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['wallet', 'transaction_type', 'status', '-created_at'], name='wallet_txn_type_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['wallet', '-created_at'], name='wallet_txn_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['wallet', 'transaction_type', 'created_at'], name='wallet_txn_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['transaction_type', 'created_at'], name='wallet_txn_type_created_idx'),
+        ),
+    ]
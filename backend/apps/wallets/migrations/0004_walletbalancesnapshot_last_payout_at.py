@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-17 18:06
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def backfill_last_payout_at(apps, schema_editor):
+    WalletBalanceSnapshot = apps.get_model('wallets', 'WalletBalanceSnapshot')
+    WalletTransaction = apps.get_model('wallets', 'WalletTransaction')
+    last_payout = WalletTransaction.objects.filter(
+        wallet_id=OuterRef('wallet_id'),
+        transaction_type='PAYOUT',
+        created_at__lt=OuterRef('as_of'),
+    ).values('wallet_id').annotate(last=Max('created_at')).values('last')
+    WalletBalanceSnapshot.objects.update(last_payout_at=Subquery(last_payout))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0003_wallettransaction_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='walletbalancesnapshot',
+            name='last_payout_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(
+            backfill_last_payout_at, migrations.RunPython.noop),
+    ]
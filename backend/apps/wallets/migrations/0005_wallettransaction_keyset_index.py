@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-17 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0004_walletbalancesnapshot_last_payout_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='wallettransaction',
+            name='wallet_txn_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['wallet', '-created_at', '-id'], name='wallet_txn_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 6.0.1 on 2026-10-17 18:17
+
+import django.db.models.deletion
+import uuid
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def backfill_supporters(apps, schema_editor):
+    """Builds the aggregates from the existing cash-in transactions."""
+    SupporterAggregate = apps.get_model('wallets', 'SupporterAggregate')
+    WalletTransaction = apps.get_model('wallets', 'WalletTransaction')
+    cash_ins = WalletTransaction.objects.filter(
+        transaction_type='CASH_IN', status='COMPLETED', payment__isnull=False,
+    ).select_related('payment').order_by('created_at')
+
+    supporters = {}
+    for tx in cash_ins.iterator(chunk_size=2000):
+        key = (tx.payment.patron_phone or '').strip() or 'anonymous'
+        supporter = supporters.get((tx.wallet_id, key))
+        if supporter is None:
+            supporter = supporters[(tx.wallet_id, key)] = SupporterAggregate(
+                wallet_id=tx.wallet_id,
+                patron_key=key,
+                total_amount=Decimal('0'),
+                tip_count=0,
+                first_tip_at=tx.created_at,
+            )
+        supporter.total_amount += tx.payment.amount
+        supporter.tip_count += 1
+        supporter.last_tip_at = tx.created_at
+        supporter.patron_name = tx.payment.patron_name or 'Anonymous'
+        supporter.patron_message = tx.payment.patron_message
+    SupporterAggregate.objects.bulk_create(supporters.values(), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0005_wallettransaction_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupporterAggregate',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('patron_key', models.CharField(max_length=32)),
+                ('patron_name', models.CharField(default='Anonymous', max_length=255)),
+                ('patron_message', models.TextField(blank=True, null=True)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tip_count', models.PositiveIntegerField(default=0)),
+                ('first_tip_at', models.DateTimeField()),
+                ('last_tip_at', models.DateTimeField()),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='supporters', to='wallets.wallet')),
+            ],
+            options={
+                'verbose_name': 'Supporter Aggregate',
+                'verbose_name_plural': 'Supporter Aggregates',
+                'indexes': [models.Index(fields=['wallet', '-total_amount'], name='supporter_total_idx'), models.Index(fields=['wallet', '-tip_count'], name='supporter_count_idx'), models.Index(fields=['wallet', '-last_tip_at'], name='supporter_recent_idx')],
+                'constraints': [models.UniqueConstraint(fields=('wallet', 'patron_key'), name='unique_wallet_supporter')],
+            },
+        ),
+        migrations.RunPython(backfill_supporters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0006_supporteraggregate'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymentattempt',
+            name='status',
+            field=models.CharField(choices=[('initiating', 'Initiating'), ('accepted', 'Accepted'), ('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('captured', 'Captured'), ('partially_captured', 'Partially Captured'), ('refunded', 'Refunded'), ('partially_refunded', 'Partially Refunded'), ('failed', 'Failed'), ('cancelled', 'Cancelled'), ('expired', 'Expired'), ('requires_action', 'Requires Action'), ('requires_confirmation', 'Requires Confirmation'), ('disputed', 'Disputed'), ('in_reconciliation', 'IN_RECONCILIATION'), ('paid', 'Paid'), ('submitted', 'Submitted'), ('rejected', 'Rejected')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:32
+
+from datetime import timedelta
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def backfill_next_payout_at(apps, schema_editor):
+    Wallet = apps.get_model('wallets', 'Wallet')
+    WalletTransaction = apps.get_model('wallets', 'WalletTransaction')
+    last_payouts = (
+        WalletTransaction.objects.filter(
+            transaction_type='PAYOUT', status='COMPLETED')
+        .values('wallet_id')
+        .annotate(last=Max('created_at'))
+    )
+    # Wallets never paid out keep the default and are due at once
+    intervals = dict(Wallet.objects.values_list('pk', 'payout_interval_days'))
+    wallets = [
+        Wallet(
+            pk=row['wallet_id'],
+            next_payout_at=row['last'] + timedelta(
+                days=intervals[row['wallet_id']]),
+        )
+        for row in last_payouts.iterator()
+    ]
+    Wallet.objects.bulk_update(wallets, ['next_payout_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0007_paymentattempt_status_initiating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='next_payout_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(
+            backfill_next_payout_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='wallet',
+            index=models.Index(fields=['next_payout_at', 'id'], name='wallet_next_payout_idx'),
+        ),
+    ]
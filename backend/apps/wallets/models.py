@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from apps.creators.models import CreatorProfile
 from apps.payments.models import (
@@ -30,6 +31,9 @@ class Wallet(UUIDModel):
     level = models.CharField(max_length=20, default="BASIC")
     is_active = models.BooleanField(default=True)
     is_verified = models.BooleanField(default=False)
+    # When the wallet is next due for an automatic payout; maintained by
+    # PayoutScheduleService. New wallets are due at once.
+    next_payout_at = models.DateTimeField(default=timezone.now)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -37,6 +41,11 @@ class Wallet(UUIDModel):
         return f"Wallet({self.creator.user}) - {self.currency}"
 
     class Meta:
+        indexes = [
+            # Due wallets are read as one range scan, paged by id
+            models.Index(
+                fields=["next_payout_at", "id"], name="wallet_next_payout_idx"),
+        ]
         constraints = [
             models.CheckConstraint(
                 condition=models.Q(balance__gte=0),
@@ -117,10 +126,133 @@ class WalletTransaction(UUIDModel):
     )
     approved_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Dashboard, transactions list, ledger totals and payout lookups
+            # filter by (wallet, type, status) and read newest first
+            models.Index(
+                fields=["wallet", "transaction_type", "status", "-created_at"],
+                name="wallet_txn_type_status_idx",
+            ),
+            # Unfiltered history keyset pages on (created_at, id) and
+            # snapshot tails (created_at >= as_of)
+            models.Index(
+                fields=["wallet", "-created_at", "-id"],
+                name="wallet_txn_created_id_idx",
+            ),
+            # Pending rows are few: pending payout checks and the snapshot
+            # cutoff only scan this partial index
+            models.Index(
+                fields=["wallet", "transaction_type", "created_at"],
+                condition=models.Q(status="PENDING"),
+                name="wallet_txn_pending_idx",
+            ),
+            # Platform wide reporting over a time window
+            models.Index(
+                fields=["transaction_type", "created_at"],
+                name="wallet_txn_type_created_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"TXN - {self.transaction_type} - {self.amount}"
 
 
+class WalletBalanceSnapshot(UUIDModel):
+    """
+    Checkpoint of the wallet ledger totals for every transaction created
+    before `as_of`. Reads only aggregate the ledger rows created at or
+    after the latest checkpoint, the ledger stays the source of truth.
+    """
+
+    wallet = models.ForeignKey(
+        Wallet, on_delete=models.CASCADE, related_name="balance_snapshots"
+    )
+    as_of = models.DateTimeField(
+        help_text=_("Covers transactions created strictly before this time")
+    )
+
+    # Running totals up to as_of (same definitions as the ledger reads)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cash_in = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cash_out = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cash_in_costs = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0)
+    total_outgoing = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+    last_payout_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Wallet Balance Snapshot")
+        verbose_name_plural = _("Wallet Balance Snapshots")
+        get_latest_by = "as_of"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["wallet", "as_of"],
+                name="unique_wallet_snapshot_as_of",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["wallet", "-as_of"]),
+        ]
+
+    def __str__(self):
+        return f"Snapshot({self.wallet_id}) @ {self.as_of.isoformat()}"
+
+
+class SupporterAggregate(UUIDModel):
+    """
+    Running tip totals per supporter of a wallet, maintained on every
+    cash-in so the supporters list never has to scan the ledger.
+    Supporters are identified by the mobile money number they paid with.
+    """
+
+    wallet = models.ForeignKey(
+        Wallet, on_delete=models.CASCADE, related_name="supporters"
+    )
+    patron_key = models.CharField(max_length=32)
+    # Taken from the supporter's most recent tip
+    patron_name = models.CharField(max_length=255, default="Anonymous")
+    patron_message = models.TextField(blank=True, null=True)
+
+    total_amount = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0)
+    tip_count = models.PositiveIntegerField(default=0)
+    first_tip_at = models.DateTimeField()
+    last_tip_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = _("Supporter Aggregate")
+        verbose_name_plural = _("Supporter Aggregates")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["wallet", "patron_key"],
+                name="unique_wallet_supporter",
+            )
+        ]
+        indexes = [
+            # One index per supported sort order of the leaderboard
+            models.Index(
+                fields=["wallet", "-total_amount"],
+                name="supporter_total_idx",
+            ),
+            models.Index(
+                fields=["wallet", "-tip_count"],
+                name="supporter_count_idx",
+            ),
+            models.Index(
+                fields=["wallet", "-last_tip_at"],
+                name="supporter_recent_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Supporter({self.patron_name}) of {self.wallet_id}"
+
+
 class WalletKYC(models.Model):
 
     ID_DOCUMENT_TYPE = (
@@ -3,21 +3,34 @@ Serializers for payment-related models (Wallet, WalletTransaction, KYC, etc.)
 """
 from rest_framework import serializers
 from decimal import Decimal
-from django.db import models
-from .models import Wallet, WalletPayoutAccount, WalletTransaction, WalletKYC
+from django.utils import timezone
+from .models import (
+    SupporterAggregate,
+    Wallet,
+    WalletPayoutAccount,
+    WalletTransaction,
+    WalletKYC,
+)
 
 
 class CreatorSupporterSerializer(serializers.ModelSerializer):
-    """Serializer for creator/supporter info in wallet serializers"""
-    patron_name = serializers.CharField(read_only=True, source="payment.patron_name")
-    patron_message = serializers.CharField(read_only=True, source="payment.patron_message")
-    amount = serializers.CharField(read_only=True, source="payment.amount")
-    created_at = serializers.CharField(read_only=True, source="payment.created_at")
+    """Serializer for a supporter's aggregated tips to a creator"""
+    amount = serializers.CharField(read_only=True, source="total_amount")
+    created_at = serializers.DateTimeField(read_only=True, source="first_tip_at")
     account_type = serializers.CharField(read_only=True, default="Supporter")
 
     class Meta:
-        model = WalletTransaction
-        fields = ["patron_name", "patron_message", "account_type", "amount", "created_at"]
+        model = SupporterAggregate
+        fields = [
+            "patron_name",
+            "patron_message",
+            "account_type",
+            "amount",
+            "tip_count",
+            "created_at",
+            "last_tip_at",
+        ]
+        read_only_fields = fields
 
 
 # ========== WALLET SERIALIZERS ==========
@@ -99,23 +112,25 @@ class WalletDetailSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
 
+    def _summary(self, obj):
+        """Dashboard summary passed by the view, or computed on demand."""
+        summary = self.context.get("summary")
+        if summary is None:
+            from .services.summary_service import WalletSummaryService
+            summary = WalletSummaryService.get_summary(obj)
+            self.context["summary"] = summary
+        return summary
+
     def get_transaction_count(self, obj):
-        return obj.transactions.count()
+        return self._summary(obj)["transaction_count"]
 
     def get_total_outgoing(self, obj):
-        return abs(obj.transactions.filter(transaction_type="PAYOUT").aggregate(
-            total=models.Sum("amount")
-        )["total"] or Decimal("0"))
+        return abs(self._summary(obj)["total_outgoing"])
 
     def get_next_payout_date(self, obj):
-        from .services.wallet_services import PayoutScheduleService
-        last_payout = obj.transactions.filter(transaction_type="PAYOUT").order_by("-created_at").first()
-        last_payout_date = last_payout.created_at if last_payout else None
-        payout_interval = obj.payout_interval_days or 30  # default to 30 days if not set
-        next_payout_date = PayoutScheduleService.get_next_payout_date(
-            last_payout_date, payout_interval
-        )
-        return next_payout_date.isoformat() if next_payout_date else None
+        # A payout that is already due goes out with the next run
+        next_payout_date = max(obj.next_payout_at, timezone.now())
+        return next_payout_date.isoformat()
 
 
 class WalletUpdateSerializer(serializers.ModelSerializer):
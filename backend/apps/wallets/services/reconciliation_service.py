@@ -0,0 +1,228 @@
+"""
+Platform-wide ledger reconciliation. Every check is a set-based query
+(GROUP BY / correlated aggregate) streamed from the database, so a full
+pass costs a handful of scans instead of one query per wallet.
+"""
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import (
+    Count, DecimalField, Exists, F, OuterRef, Q, Subquery, Sum, Value)
+from django.db.models.functions import Coalesce
+from apps.payments.models import Payment, PaymentStatus
+from apps.wallets.models import Wallet, WalletTransaction
+from apps.wallets.services.wallet_services import WalletService
+
+SUCCESSFUL_PAYMENT_STATUSES = [PaymentStatus.COMPLETED, PaymentStatus.CAPTURED]
+
+
+class LedgerReconciliationService:
+    """Verify wallet balances and ledger integrity across all wallets."""
+
+    CHUNK_SIZE = 1000
+
+    @staticmethod
+    def balance_mismatches(chunk_size: int = CHUNK_SIZE):
+        """
+        Compares every stored wallet balance with its full ledger, one
+        chunk of wallets per query.
+        Args:
+            chunk_size (int): Number of wallets compared per query.
+        Yields:
+            dict: wallet_id, balance, ledger_balance and drift for every
+            wallet whose stored balance differs from the ledger.
+        """
+        ledger = (
+            WalletTransaction.objects.filter(
+                wallet=OuterRef("pk"),
+                status="COMPLETED",
+                transaction_type__in=["CASH_IN", "PAYOUT", "REVERSAL"],
+            )
+            .values("wallet")
+            .annotate(total=Sum("amount"))
+            .values("total")
+        )
+        last_id = None
+        while True:
+            wallets = Wallet.objects.order_by("pk")
+            if last_id is not None:
+                wallets = wallets.filter(pk__gt=last_id)
+            ids = list(wallets.values_list("pk", flat=True)[:chunk_size])
+            if not ids:
+                return
+            last_id = ids[-1]
+
+            rows = (
+                Wallet.objects.filter(pk__in=ids)
+                .annotate(ledger_balance=Coalesce(
+                    Subquery(ledger),
+                    Value(Decimal("0")),
+                    output_field=DecimalField(max_digits=14, decimal_places=2),
+                ))
+                .exclude(balance=F("ledger_balance"))
+                .order_by("pk")
+                .values("pk", "balance", "ledger_balance")
+            )
+            for row in rows:
+                yield {
+                    "wallet_id": row["pk"],
+                    "balance": row["balance"],
+                    "ledger_balance": row["ledger_balance"],
+                    "drift": row["balance"] - row["ledger_balance"],
+                }
+
+    @staticmethod
+    def unlinked_fees():
+        """
+        FEE rows that are not linked to a cash-in or payout of the same
+        wallet.
+        Returns:
+            QuerySet: References of the offending fee rows.
+        """
+        return WalletTransaction.objects.filter(
+            transaction_type="FEE"
+        ).filter(
+            Q(related_transaction__isnull=True)
+            | ~Q(related_transaction__transaction_type__in=["CASH_IN", "PAYOUT"])
+            | ~Q(related_transaction__wallet_id=F("wallet_id"))
+        ).values_list("reference", flat=True)
+
+    @staticmethod
+    def invalid_fee_reversals():
+        """
+        FEE_REVERSAL rows that do not exactly undo the fee of a failed
+        payout.
+        Returns:
+            QuerySet: References of the offending reversal rows.
+        """
+        return WalletTransaction.objects.filter(
+            transaction_type="FEE_REVERSAL"
+        ).filter(
+            Q(related_transaction__isnull=True)
+            | ~Q(related_transaction__transaction_type="FEE")
+            | ~Q(amount=-F("related_transaction__amount"))
+            | ~Q(related_transaction__related_transaction__status="FAILED")
+        ).values_list("reference", flat=True)
+
+    @staticmethod
+    def missing_fee_reversals():
+        """
+        Fees of failed payouts that were not reversed exactly once.
+        Returns:
+            QuerySet: References of the fee rows.
+        """
+        return WalletTransaction.objects.filter(
+            transaction_type="FEE",
+            status="COMPLETED",
+            related_transaction__transaction_type="PAYOUT",
+            related_transaction__status="FAILED",
+        ).annotate(
+            reversals=Count(
+                "related_fees",
+                filter=Q(related_fees__transaction_type="FEE_REVERSAL"),
+            )
+        ).exclude(reversals=1).values_list("reference", flat=True)
+
+    @staticmethod
+    def duplicate_credits():
+        """
+        Payments credited more than once (references are unique, so a
+        double credit shows up as several CASH_IN rows for one payment).
+        Returns:
+            QuerySet: payment_id and credits for every such payment.
+        """
+        return (
+            WalletTransaction.objects.filter(
+                transaction_type="CASH_IN", payment__isnull=False)
+            .values("payment_id")
+            .annotate(credits=Count("id"))
+            .filter(credits__gt=1)
+            .order_by("payment_id")
+        )
+
+    @staticmethod
+    def orphan_cash_ins():
+        """
+        CASH_IN rows whose payment did not succeed and that were not
+        reversed (refunded payments).
+        Returns:
+            QuerySet: References of the offending cash-in rows.
+        """
+        return WalletTransaction.objects.filter(
+            transaction_type="CASH_IN", payment__isnull=False,
+        ).exclude(
+            payment__status__in=SUCCESSFUL_PAYMENT_STATUSES
+        ).exclude(
+            related_fees__transaction_type="REVERSAL"
+        ).values_list("reference", flat=True)
+
+    @staticmethod
+    def uncredited_payments():
+        """
+        Completed payments to a wallet that never produced a CASH_IN.
+        Returns:
+            QuerySet: Ids of the payments.
+        """
+        credited = WalletTransaction.objects.filter(
+            payment=OuterRef("pk"), transaction_type="CASH_IN")
+        return Payment.objects.filter(
+            ~Exists(credited),
+            status__in=SUCCESSFUL_PAYMENT_STATUSES,
+            wallet__isnull=False,
+        ).values_list("pk", flat=True)
+
+    @staticmethod
+    def unrecovered_reversals():
+        """
+        Refunded credits the wallet balance could not cover (the creator
+        had been paid out), still owed by the creator.
+        Returns:
+            QuerySet: References of the PENDING reversal rows.
+        """
+        return WalletTransaction.objects.filter(
+            transaction_type="REVERSAL", status="PENDING",
+        ).values_list("reference", flat=True)
+
+    @staticmethod
+    def run(chunk_size: int = CHUNK_SIZE):
+        """
+        Runs every check and collects the discrepancies.
+        Args:
+            chunk_size (int): Number of wallets compared per query.
+        Returns:
+            dict: One list per check, empty when the ledger is consistent.
+        """
+        service = LedgerReconciliationService
+        return {
+            "balance_mismatches": list(service.balance_mismatches(chunk_size)),
+            "unlinked_fees": list(service.unlinked_fees().iterator()),
+            "invalid_fee_reversals": list(
+                service.invalid_fee_reversals().iterator()),
+            "missing_fee_reversals": list(
+                service.missing_fee_reversals().iterator()),
+            "duplicate_credits": list(service.duplicate_credits().iterator()),
+            "orphan_cash_ins": list(service.orphan_cash_ins().iterator()),
+            "uncredited_payments": list(
+                service.uncredited_payments().iterator()),
+            "unrecovered_reversals": list(
+                service.unrecovered_reversals().iterator()),
+        }
+
+    @staticmethod
+    def repair_balances(mismatches):
+        """
+        Rewrites the stored balance of the given wallets from their full
+        ledger. Each wallet is locked while it is recalculated so no money
+        movement can interleave with the repair.
+        Args:
+            mismatches (Iterable[dict]): Rows from balance_mismatches().
+        Returns:
+            int: Number of wallets repaired.
+        """
+        repaired = 0
+        for row in mismatches:
+            with transaction.atomic():
+                wallet = Wallet.objects.select_for_update().get(
+                    pk=row["wallet_id"])
+                WalletService.recalculate_wallet_balance(wallet, full=True)
+            repaired += 1
+        return repaired
@@ -0,0 +1,194 @@
+"""
+Balance checkpoints for the wallet ledger. A snapshot stores the running
+totals of a wallet up to a point in time so that balance audits, repairs
+and dashboard totals only aggregate the ledger rows written after it.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+from apps.wallets.models import Wallet, WalletBalanceSnapshot, WalletTransaction
+
+
+# Conditional aggregates shared by snapshots and ledger reads. Every key
+# maps to a WalletBalanceSnapshot field of the same name.
+LEDGER_TOTALS = {
+    "balance": Sum(
+        "amount",
+        filter=Q(
+            status="COMPLETED",
+            transaction_type__in=["CASH_IN", "PAYOUT", "REVERSAL"],
+        ),
+    ),
+    "cash_in": Sum("amount", filter=Q(status="COMPLETED", amount__gt=0)),
+    "cash_out": Sum(
+        "amount",
+        filter=Q(status="COMPLETED", amount__lt=0, transaction_type="PAYOUT"),
+    ),
+    "cash_in_costs": Sum(
+        "amount",
+        filter=Q(status="COMPLETED", amount__lt=0, transaction_type="FEE"),
+    ),
+    "total_outgoing": Sum("amount", filter=Q(transaction_type="PAYOUT")),
+    "transaction_count": Count("id"),
+}
+
+# Point-in-time markers, combined with max() instead of summed
+LEDGER_MARKERS = {
+    "last_payout_at": Max("created_at", filter=Q(transaction_type="PAYOUT")),
+}
+
+
+def _combine(snapshot, tail):
+    """Adds the tail totals to a snapshot and keeps the latest markers."""
+    totals = {key: getattr(snapshot, key) + tail[key] for key in LEDGER_TOTALS}
+    for key in LEDGER_MARKERS:
+        markers = [m for m in (getattr(snapshot, key), tail[key]) if m]
+        totals[key] = max(markers) if markers else None
+    return totals
+
+
+class WalletSnapshotService:
+    """Create and read wallet ledger checkpoints."""
+
+    # Rows younger than this may still belong to open transactions, so
+    # they are never folded into a checkpoint.
+    SNAPSHOT_LAG = timedelta(minutes=10)
+
+    @staticmethod
+    def _aggregate(queryset):
+        totals = queryset.aggregate(**LEDGER_TOTALS, **LEDGER_MARKERS)
+        return {
+            key: value if value is not None or key in LEDGER_MARKERS else (
+                0 if key == "transaction_count" else Decimal("0"))
+            for key, value in totals.items()
+        }
+
+    @staticmethod
+    def get_latest_snapshot(wallet):
+        """
+        Returns the most recent snapshot of a wallet or None.
+        Args:
+            wallet (Wallet): The wallet instance.
+        Returns:
+            WalletBalanceSnapshot | None
+        """
+        return (
+            WalletBalanceSnapshot.objects.filter(wallet=wallet)
+            .order_by("-as_of")
+            .first()
+        )
+
+    @staticmethod
+    def ledger_totals(wallet, *, full: bool = False):
+        """
+        Computes the ledger totals for a wallet. Starts from the latest
+        checkpoint and only aggregates transactions created at or after
+        it, unless `full` is set.
+        Args:
+            wallet (Wallet): The wallet instance.
+            full (bool): Ignore snapshots and aggregate the whole ledger.
+        Returns:
+            dict: balance, cash_in, cash_out, cash_in_costs, total_outgoing,
+            transaction_count and last_payout_at.
+        """
+        queryset = WalletTransaction.objects.filter(wallet=wallet)
+        snapshot = None if full else WalletSnapshotService.get_latest_snapshot(
+            wallet)
+        if snapshot is None:
+            return WalletSnapshotService._aggregate(queryset)
+
+        tail = WalletSnapshotService._aggregate(
+            queryset.filter(created_at__gte=snapshot.as_of))
+        return _combine(snapshot, tail)
+
+    @staticmethod
+    def snapshot_cutoff(wallet, now=None):
+        """
+        Returns the latest point in time a checkpoint may cover. This is
+        bounded by SNAPSHOT_LAG and by the oldest pending transaction,
+        since pending rows can still change status.
+        """
+        now = now or timezone.now()
+        cutoff = now - WalletSnapshotService.SNAPSHOT_LAG
+        oldest_pending = WalletTransaction.objects.filter(
+            wallet=wallet, status="PENDING"
+        ).aggregate(oldest=Min("created_at"))["oldest"]
+        if oldest_pending is not None and oldest_pending < cutoff:
+            cutoff = oldest_pending
+        return cutoff
+
+    @staticmethod
+    def take_snapshot(wallet, now=None):
+        """
+        Rolls the wallet checkpoint forward to the current cutoff.
+        Args:
+            wallet (Wallet): The wallet instance.
+            now (datetime): Optional reference time (defaults to now).
+        Returns:
+            WalletBalanceSnapshot | None: The latest snapshot, or None when
+            the wallet has nothing to checkpoint yet.
+        """
+        cutoff = WalletSnapshotService.snapshot_cutoff(wallet, now=now)
+        latest = WalletSnapshotService.get_latest_snapshot(wallet)
+        if latest is not None and latest.as_of >= cutoff:
+            return latest
+
+        queryset = WalletTransaction.objects.filter(
+            wallet=wallet, created_at__lt=cutoff)
+        if latest is not None:
+            queryset = queryset.filter(created_at__gte=latest.as_of)
+            totals = WalletSnapshotService._aggregate(queryset)
+            if not totals["transaction_count"]:
+                return latest
+            totals = _combine(latest, totals)
+        else:
+            totals = WalletSnapshotService._aggregate(queryset)
+            if not totals["transaction_count"]:
+                return None
+
+        try:
+            with transaction.atomic():
+                return WalletBalanceSnapshot.objects.create(
+                    wallet=wallet, as_of=cutoff, **totals)
+        except IntegrityError:
+            # Another worker checkpointed the same cutoff
+            return WalletSnapshotService.get_latest_snapshot(wallet)
+
+    @staticmethod
+    def verify_snapshot(snapshot):
+        """
+        Re-aggregates the ledger up to a snapshot and returns the fields
+        that do not match.
+        Args:
+            snapshot (WalletBalanceSnapshot): The snapshot to check.
+        Returns:
+            dict: field -> (snapshot value, ledger value). Empty when valid.
+        """
+        totals = WalletSnapshotService._aggregate(
+            WalletTransaction.objects.filter(
+                wallet_id=snapshot.wallet_id, created_at__lt=snapshot.as_of)
+        )
+        return {
+            key: (getattr(snapshot, key), totals[key])
+            for key in totals
+            if getattr(snapshot, key) != totals[key]
+        }
+
+    @staticmethod
+    def roll_forward_all(now=None):
+        """
+        Rolls checkpoints forward for every wallet with ledger activity.
+        Returns:
+            int: Number of snapshots written.
+        """
+        written = 0
+        wallet_ids = Wallet.objects.order_by("id").values_list("id", flat=True)
+        for wallet_id in wallet_ids.iterator():
+            wallet = Wallet(pk=wallet_id)
+            before = WalletSnapshotService.get_latest_snapshot(wallet)
+            after = WalletSnapshotService.take_snapshot(wallet, now=now)
+            if after is not None and (before is None or after.pk != before.pk):
+                written += 1
+        return written
@@ -0,0 +1,118 @@
+"""
+Cached creator dashboard summary. The ledger totals, the last payout and
+the recent cash-ins of a wallet are computed together and cached per
+wallet until the next ledger write.
+"""
+import time
+from django.core.cache import cache
+from django.db import transaction
+from apps.wallets.models import WalletTransaction
+from apps.wallets.serializers import WalletTransactionListSerializer
+from apps.wallets.services.snapshot_service import WalletSnapshotService
+
+SUMMARY_CACHE_TTL = 10 * 60
+SUMMARY_KEY = "wallets:summary:{}:{}"
+# Bumped on every ledger write, summaries cached under an older
+# generation are never read again
+GENERATION_KEY = "wallets:summary-generation:{}"
+COUNT_KEY = "wallets:count:{}:{}:{}:{}"
+RECENT_TRANSACTIONS_LIMIT = 10
+
+
+class WalletSummaryService:
+    """Build, cache and invalidate wallet dashboard summaries."""
+
+    @staticmethod
+    def _generation(wallet_id):
+        key = GENERATION_KEY.format(wallet_id)
+        generation = cache.get(key)
+        if generation is None:
+            # A fresh, unique value so that an evicted generation can
+            # never make an old summary current again
+            cache.add(key, time.time_ns(), timeout=None)
+            generation = cache.get(key)
+        return generation
+
+    @staticmethod
+    def build_summary(wallet):
+        """
+        Computes the dashboard summary of a wallet from the database.
+        Args:
+            wallet (Wallet): The wallet instance.
+        Returns:
+            dict: The ledger totals (see WalletSnapshotService.ledger_totals)
+            and the serialized recent cash-in transactions.
+        """
+        summary = WalletSnapshotService.ledger_totals(wallet)
+        recent = WalletTransaction.objects.filter(
+            wallet=wallet, transaction_type="CASH_IN"
+        ).order_by("-created_at")[:RECENT_TRANSACTIONS_LIMIT]
+        summary["recent_transactions"] = [
+            dict(item) for item in
+            WalletTransactionListSerializer(recent, many=True).data
+        ]
+        return summary
+
+    @staticmethod
+    def get_summary(wallet):
+        """
+        Returns the dashboard summary of a wallet, from the cache when it
+        is still current.
+        Args:
+            wallet (Wallet): The wallet instance.
+        Returns:
+            dict: See build_summary.
+        """
+        key = SUMMARY_KEY.format(
+            wallet.pk, WalletSummaryService._generation(wallet.pk))
+        summary = cache.get(key)
+        if summary is None:
+            summary = WalletSummaryService.build_summary(wallet)
+            cache.set(key, summary, timeout=SUMMARY_CACHE_TTL)
+        return summary
+
+    @staticmethod
+    def get_transaction_count(wallet, transaction_type=None, status=None):
+        """
+        Returns the number of wallet transactions matching the filters,
+        cached until the next ledger write.
+        Args:
+            wallet (Wallet): The wallet instance.
+            transaction_type (str): Optional transaction type filter.
+            status (str): Optional status filter.
+        Returns:
+            int: The number of matching transactions.
+        """
+        if not transaction_type and not status:
+            return WalletSummaryService.get_summary(wallet)["transaction_count"]
+
+        key = COUNT_KEY.format(
+            wallet.pk, WalletSummaryService._generation(wallet.pk),
+            transaction_type or "", status or "")
+        count = cache.get(key)
+        if count is None:
+            queryset = WalletTransaction.objects.filter(wallet=wallet)
+            if transaction_type:
+                queryset = queryset.filter(transaction_type=transaction_type)
+            if status:
+                queryset = queryset.filter(status=status)
+            count = queryset.count()
+            cache.set(key, count, timeout=SUMMARY_CACHE_TTL)
+        return count
+
+    @staticmethod
+    def invalidate(wallet_id):
+        """
+        Marks the cached summary of a wallet stale once the current
+        transaction commits, so readers never cache uncommitted state.
+        Args:
+            wallet_id: The wallet primary key.
+        """
+        def bump():
+            key = GENERATION_KEY.format(wallet_id)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, time.time_ns(), timeout=None)
+
+        transaction.on_commit(bump)
@@ -0,0 +1,133 @@
+"""
+Supporter leaderboard maintenance. Every cash-in folds the tip into the
+SupporterAggregate row of the paying supporter, so listing supporters
+reads one row per supporter instead of every ledger entry.
+"""
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from apps.wallets.models import SupporterAggregate, WalletTransaction
+
+
+# Leaderboard sort options, each backed by a SupporterAggregate index
+SUPPORTER_ORDERING = {
+    "total": ("-total_amount", "-last_tip_at"),
+    "count": ("-tip_count", "-last_tip_at"),
+    "recent": ("-last_tip_at",),
+}
+
+
+class SupporterService:
+    """Maintain and read per-wallet supporter aggregates."""
+
+    @staticmethod
+    def patron_key(payment) -> str:
+        """Identity of the supporter behind a payment."""
+        return (payment.patron_phone or "").strip() or "anonymous"
+
+    @staticmethod
+    def record_tip(
+        *, wallet, payment, amount: Decimal, tipped_at=None, tips: int = 1
+    ):
+        """
+        Folds tips into the supporter's aggregate. Must run inside the
+        transaction that writes the cash-in.
+        Args:
+            wallet (Wallet): The wallet that received the tip.
+            payment (Payment): The latest payment of the supporter, carrying
+                the supporter details.
+            amount (Decimal): The gross amount tipped.
+            tipped_at (datetime): When the tip was received (defaults to now).
+            tips (int): Number of tips `amount` covers (bulk cash-ins).
+        """
+        if payment is None:
+            return
+        tipped_at = tipped_at or timezone.now()
+        key = SupporterService.patron_key(payment)
+        changes = {
+            "patron_name": payment.patron_name or "Anonymous",
+            "patron_message": payment.patron_message,
+            "last_tip_at": tipped_at,
+        }
+        queryset = SupporterAggregate.objects.filter(
+            wallet=wallet, patron_key=key)
+
+        if not queryset.update(
+            total_amount=F("total_amount") + amount,
+            tip_count=F("tip_count") + tips,
+            **changes,
+        ):
+            try:
+                with transaction.atomic():
+                    SupporterAggregate.objects.create(
+                        wallet=wallet,
+                        patron_key=key,
+                        total_amount=amount,
+                        tip_count=tips,
+                        first_tip_at=tipped_at,
+                        **changes,
+                    )
+            except IntegrityError:
+                # First tip of this supporter recorded concurrently
+                queryset.update(
+                    total_amount=F("total_amount") + amount,
+                    tip_count=F("tip_count") + tips,
+                    **changes,
+                )
+
+    @staticmethod
+    def leaderboard(wallet, sort: str = "total"):
+        """
+        Returns the supporters of a wallet in leaderboard order.
+        Args:
+            wallet (Wallet): The wallet instance.
+            sort (str): One of SUPPORTER_ORDERING.
+        Returns:
+            QuerySet[SupporterAggregate]
+        Raises:
+            ValueError: If the sort option is unknown.
+        """
+        if sort not in SUPPORTER_ORDERING:
+            raise ValueError(
+                f"Sort must be one of {list(SUPPORTER_ORDERING)}")
+        return SupporterAggregate.objects.filter(
+            wallet=wallet).order_by(*SUPPORTER_ORDERING[sort], "id")
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild(wallet):
+        """
+        Recomputes the supporter aggregates of a wallet from its cash-in
+        transactions, e.g. after importing historic data.
+        Args:
+            wallet (Wallet): The wallet instance.
+        Returns:
+            int: Number of supporters written.
+        """
+        SupporterAggregate.objects.filter(wallet=wallet).delete()
+        cash_ins = WalletTransaction.objects.filter(
+            wallet=wallet, transaction_type="CASH_IN",
+            status="COMPLETED", payment__isnull=False,
+        )
+        supporters = {}
+        for tx in cash_ins.select_related("payment").order_by("created_at"):
+            key = SupporterService.patron_key(tx.payment)
+            supporter = supporters.get(key)
+            if supporter is None:
+                supporter = supporters[key] = SupporterAggregate(
+                    wallet=wallet,
+                    patron_key=key,
+                    total_amount=Decimal("0"),
+                    tip_count=0,
+                    first_tip_at=tx.created_at,
+                )
+            supporter.total_amount += tx.payment.amount
+            supporter.tip_count += 1
+            supporter.last_tip_at = tx.created_at
+            supporter.patron_name = tx.payment.patron_name or "Anonymous"
+            supporter.patron_message = tx.payment.patron_message
+
+        rows = list(supporters.values())
+        SupporterAggregate.objects.bulk_create(rows)
+        return len(rows)
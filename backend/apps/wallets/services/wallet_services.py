@@ -7,13 +7,18 @@ wallet balances.
 """
 import uuid
 from decimal import Decimal
-from django.db import transaction
-from django.db.models import Sum, Q
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
 from utils.exceptions import WalletNotFound, WalletError
 from datetime import datetime, timedelta
 from typing import Optional
 from apps.wallets.models import WalletTransaction, Wallet
+from apps.wallets.services.snapshot_service import WalletSnapshotService
+from apps.wallets.services.summary_service import WalletSummaryService
+from apps.wallets.services.supporter_service import SupporterService
 from apps.payments.services.fee_service import FeeService
+from apps.payments.services.platform_stats import PlatformStatsService
 from utils.exceptions import (
     InsufficientBalance,
     DuplicateTransaction,
@@ -49,6 +54,61 @@ class PayoutScheduleService:
             return datetime.now()
         return last_payout_date + timedelta(days=payout_interval_days)
 
+    @staticmethod
+    def last_completed_payout_at(wallet) -> Optional[datetime]:
+        """Creation time of the wallet's last completed payout, if any."""
+        return (
+            WalletTransaction.objects.filter(
+                wallet_id=wallet.pk, transaction_type="PAYOUT", status="COMPLETED")
+            .order_by("-created_at")
+            .values_list("created_at", flat=True)
+            .first()
+        )
+
+    @staticmethod
+    def mark_paid_out(wallet, paid_at: datetime):
+        """
+        Schedules the next automatic payout one interval after a completed
+        payout.
+        args:
+            wallet: the wallet that was paid out
+            paid_at: when the completed payout was initiated
+        """
+        wallet.next_payout_at = paid_at + timedelta(days=wallet.payout_interval_days)
+        Wallet.objects.filter(pk=wallet.pk).update(
+            next_payout_at=wallet.next_payout_at)
+
+    @staticmethod
+    def set_interval(wallet, payout_interval_days: int):
+        """
+        Changes the payout interval and moves the next payout to one new
+        interval after the last completed payout (or now if there is none).
+        args:
+            wallet: the wallet to update
+            payout_interval_days: the new interval in days
+        """
+        last_payout_at = PayoutScheduleService.last_completed_payout_at(wallet)
+        wallet.payout_interval_days = payout_interval_days
+        wallet.next_payout_at = (
+            timezone.now() if last_payout_at is None
+            else last_payout_at + timedelta(days=payout_interval_days)
+        )
+        # Never write balance from a possibly stale instance
+        wallet.save(update_fields=[
+            "payout_interval_days", "next_payout_at", "updated_at"])
+
+    @staticmethod
+    def due_wallets(now: Optional[datetime] = None):
+        """
+        Verified wallets with a balance whose next payout is due, ordered
+        for keyset paging on (next_payout_at, id).
+        """
+        return Wallet.objects.filter(
+            next_payout_at__lte=now or timezone.now(),
+            balance__gt=0,
+            is_verified=True,
+        ).order_by("next_payout_at", "pk")
+
 
 class WalletService:
     """Core wallet operations."""
@@ -63,30 +123,82 @@ class WalletService:
         Raises:
             WalletNotFound: If the user does not have a wallet.
         """
-        try:
-            return user.creator_profile.wallet
-        except Exception:
+        wallet = (
+            Wallet.objects.select_related("creator__user")
+            .filter(creator__user_id=getattr(user, "pk", None))
+            .first()
+        )
+        if wallet is None:
             raise WalletNotFound("User does not have a wallet")
+        return wallet
+
+    @staticmethod
+    def apply_balance_delta(wallet, delta: Decimal):
+        """
+        Applies a signed delta to the wallet balance with a single
+        UPDATE ... SET balance = balance + delta, so the cost of a money
+        movement does not depend on the size of the wallet ledger.
+        Must be called inside the transaction that writes the ledger row.
+        Args:
+            wallet (Wallet): The wallet instance to update.
+            delta (Decimal): Signed amount to add to the balance.
+        Returns:
+            Decimal: The updated wallet balance.
+        """
+        if not delta:
+            return wallet.balance
+        Wallet.objects.filter(pk=wallet.pk).update(
+            balance=F("balance") + delta)
+        wallet.refresh_from_db(fields=["balance"])
+        return wallet.balance
+
+    @staticmethod
+    def compute_ledger_balance(wallet, full: bool = False):
+        """
+        Computes the wallet balance from the transaction ledger
+        (completed CASH_IN and PAYOUT rows). This is the source of truth
+        used by the verification and repair paths. Starts from the latest
+        balance snapshot unless `full` is set.
+        Args:
+            wallet (Wallet): The wallet instance to compute balance for.
+            full (bool): Aggregate the whole ledger, ignoring snapshots.
+        Returns:
+            Decimal: The balance according to the ledger.
+        """
+        if not isinstance(wallet, Wallet):
+            raise WalletError("Wallet error")
+        return WalletSnapshotService.ledger_totals(wallet, full=full)["balance"]
+
+    @staticmethod
+    def verify_wallet_balance(wallet, full: bool = False):
+        """
+        Compares the stored wallet balance with the ledger without
+        writing anything.
+        Args:
+            wallet (Wallet): The wallet instance to verify.
+            full (bool): Aggregate the whole ledger, ignoring snapshots.
+        Returns:
+            Decimal: The drift (stored balance - ledger balance). Zero
+            means the wallet is consistent.
+        """
+        ledger_balance = WalletService.compute_ledger_balance(wallet, full=full)
+        wallet.refresh_from_db(fields=["balance"])
+        return wallet.balance - ledger_balance
 
     @staticmethod
-    def recalculate_wallet_balance(wallet):
+    def recalculate_wallet_balance(wallet, full: bool = False):
         """
         Recalculates and updates the wallet balance based on
-        completed transactions.
+        completed transactions. This is the repair mode for the
+        incrementally maintained balance and is not called on the
+        money movement paths.
         Args:
             wallet (Wallet): The wallet instance to recalculate balance for.
+            full (bool): Aggregate the whole ledger, ignoring snapshots.
         Returns:
             Decimal: The updated wallet balance.
         """
-        try:
-            query_filter = (
-                (Q(transaction_type="CASH_IN") | Q(transaction_type="PAYOUT")) &
-                Q(status="COMPLETED")
-            )
-            total = (wallet.transactions.filter(query_filter).aggregate(
-                total=Sum("amount"))["total"] or 0)
-        except AttributeError:
-            raise WalletError("Wallet error")
+        total = WalletService.compute_ledger_balance(wallet, full=full)
 
         wallet.balance = total
         wallet.save(update_fields=["balance"])
@@ -98,6 +210,28 @@ class WalletTransactionService:
     """
     Single source of truth for all wallet money movements.
     """
+    @staticmethod
+    def create_once(**fields):
+        """
+        Insert a ledger row unless its reference is already taken. Relies
+        on the unique reference constraint instead of a prior lookup, so
+        concurrent duplicates resolve deterministically. The insert runs
+        in a savepoint, a conflict leaves the caller's transaction usable.
+        args:
+            fields: WalletTransaction field values, including reference
+        returns: (transaction, created). On conflict the existing row is
+        returned with created False.
+        """
+        try:
+            with transaction.atomic():
+                return WalletTransaction.objects.create(**fields), True
+        except IntegrityError:
+            existing = WalletTransaction.objects.filter(
+                reference=fields["reference"]).first()
+            if existing is None:
+                raise  # some other constraint
+            return existing, False
+
     @staticmethod
     def create_fee_transaction(
         *,
@@ -126,10 +260,7 @@ class WalletTransactionService:
         else:
             final_amount = -amount if transaction_type == "FEE" else amount
 
-        if WalletTransaction.objects.filter(reference=reference).exists():
-            raise DuplicateTransaction("Transaction already exists")
-            
-        fee_tx = WalletTransaction.objects.create(
+        fee_tx, created = WalletTransactionService.create_once(
             wallet=wallet,
             amount=final_amount,
             transaction_type=transaction_type,
@@ -138,6 +269,8 @@ class WalletTransactionService:
             related_transaction=related_transaction,
             correlation_id=related_transaction.correlation_id,
         )
+        if not created:
+            raise DuplicateTransaction(transaction=fee_tx)
 
         return fee_tx
 
@@ -154,18 +287,18 @@ class WalletTransactionService:
 
         returns: the created cash-in transaction (status COMPLETED). Fees are
         automatically calculated and linked to the cash-in transaction.
+        raises: DuplicateTransaction if the reference was already credited,
+        with the existing transaction on its `transaction` attribute.
         """
         if amount <= 0:
             raise InvalidTransaction("Amount must be positive")
-        if WalletTransaction.objects.filter(reference=reference).exists():
-            raise DuplicateTransaction("Transaction already exists")
 
         fee = FeeService.calculate_cash_in_fee(amount)
         net_amount = amount - fee
         
         correlation_id = f"CASHIN-{uuid.uuid4()}"
 
-        cashin_tx = WalletTransaction.objects.create(
+        cashin_tx, created = WalletTransactionService.create_once(
             wallet=wallet,
             amount=net_amount,
             transaction_type="CASH_IN",
@@ -174,18 +307,167 @@ class WalletTransactionService:
             reference=reference,
             correlation_id=correlation_id,
         )
+        if not created:
+            # Already credited, e.g. a concurrent delivery of the callback
+            raise DuplicateTransaction(transaction=cashin_tx)
 
+        ledger_rows = [cashin_tx]
         # Fee linked to cash-in
         if fee > 0:
-            WalletTransactionService.create_fee_transaction(
+            ledger_rows.append(WalletTransactionService.create_fee_transaction(
                 wallet=wallet,
                 amount=fee,
                 reference=f"{reference}-FEE",
                 related_transaction=cashin_tx,
+            ))
+        PlatformStatsService.record_transactions(ledger_rows)
+
+        SupporterService.record_tip(
+            wallet=wallet, payment=payment, amount=amount,
+            tipped_at=cashin_tx.created_at)
+        WalletService.apply_balance_delta(wallet, net_amount)
+        WalletSummaryService.invalidate(wallet.pk)
+        return cashin_tx
+
+    @staticmethod
+    @transaction.atomic
+    def reverse_cash_in(*, payment):
+        """
+        Reverse the credit of a refunded payment; the cash-in fee is kept.
+        The part of the net credit the wallet balance still covers is taken
+        back with a COMPLETED REVERSAL row. The rest (the creator was paid
+        out meanwhile) is recorded as a PENDING REVERSAL row, a debt that
+        does not move the balance and is reported by the ledger
+        reconciliation for an admin to recover.
+        args:
+        payment: the refunded payment
+
+        returns: the created reversal transactions, empty if the payment
+        was never credited.
+        raises: DuplicateTransaction if the credit was already reversed,
+        with an existing reversal on its `transaction` attribute.
+        """
+        cashin_tx = WalletTransaction.objects.filter(
+            payment=payment, transaction_type="CASH_IN", status="COMPLETED",
+        ).first()
+        if cashin_tx is None:
+            return []
+
+        # Lock the wallet so the balance read stays covered until the
+        # reversal is applied
+        wallet = Wallet.objects.select_for_update().get(pk=cashin_tx.wallet_id)
+        existing = cashin_tx.related_fees.filter(transaction_type="REVERSAL").first()
+        if existing is not None:
+            raise DuplicateTransaction(transaction=existing)
+
+        covered = min(cashin_tx.amount, max(wallet.balance, Decimal("0")))
+        reversals = []
+        for amount, status, suffix in (
+            (covered, "COMPLETED", "REVERSAL"),
+            (cashin_tx.amount - covered, "PENDING", "REVERSAL-DUE"),
+        ):
+            if amount <= 0:
+                continue
+            reversal_tx, created = WalletTransactionService.create_once(
+                wallet=wallet,
+                amount=-amount,
+                transaction_type="REVERSAL",
+                status=status,
+                payment=payment,
+                reference=f"{cashin_tx.reference}-{suffix}",
+                related_transaction=cashin_tx,
+                correlation_id=cashin_tx.correlation_id,
             )
+            if not created:
+                raise DuplicateTransaction(transaction=reversal_tx)
+            reversals.append(reversal_tx)
 
-        WalletService.recalculate_wallet_balance(wallet)
-        return cashin_tx
+        PlatformStatsService.record_transactions(
+            [tx for tx in reversals if tx.status == "COMPLETED"])
+        WalletService.apply_balance_delta(wallet, -covered)
+        WalletSummaryService.invalidate(wallet.pk)
+        return reversals
+
+    @staticmethod
+    @transaction.atomic
+    def cash_in_many(entries):
+        """
+        Process many cash-ins at once, e.g. when replaying a settlement
+        file. Same fee and idempotency rules as cash_in(), but references
+        are checked in one query, rows are bulk inserted and every wallet
+        balance moves once.
+        args:
+        entries: iterable of dicts with wallet, amount, payment and
+        reference keys (same meaning as the cash_in() arguments)
+
+        returns: the created cash-in transactions. Entries whose reference
+        already exists (in the ledger or earlier in the batch) are skipped.
+        """
+        entries = list(entries)
+        if any(entry["amount"] <= 0 for entry in entries):
+            raise InvalidTransaction("Amount must be positive")
+
+        references = [entry["reference"] for entry in entries]
+        existing = set(
+            WalletTransaction.objects.filter(
+                reference__in=references + [f"{ref}-FEE" for ref in references]
+            ).values_list("reference", flat=True)
+        )
+
+        cashins, fees, wallets, deltas, tips = [], [], {}, {}, {}
+        for entry in entries:
+            wallet, amount = entry["wallet"], entry["amount"]
+            reference, payment = entry["reference"], entry["payment"]
+            if reference in existing or f"{reference}-FEE" in existing:
+                continue
+            existing.add(reference)
+
+            fee = FeeService.calculate_cash_in_fee(amount)
+            net_amount = amount - fee
+            cashin_tx = WalletTransaction(
+                wallet=wallet,
+                amount=net_amount,
+                transaction_type="CASH_IN",
+                status="COMPLETED",
+                payment=payment,
+                reference=reference,
+                correlation_id=f"CASHIN-{uuid.uuid4()}",
+            )
+            cashins.append(cashin_tx)
+            if fee > 0:
+                fees.append(WalletTransaction(
+                    wallet=wallet,
+                    amount=-fee,
+                    transaction_type="FEE",
+                    status="COMPLETED",
+                    reference=f"{reference}-FEE",
+                    related_transaction=cashin_tx,
+                    correlation_id=cashin_tx.correlation_id,
+                ))
+
+            wallets.setdefault(wallet.pk, wallet)
+            deltas[wallet.pk] = deltas.get(wallet.pk, Decimal("0")) + net_amount
+            if payment is not None:
+                key = (wallet.pk, SupporterService.patron_key(payment))
+                total, count, _, rows = tips.get(key, (Decimal("0"), 0, None, []))
+                tips[key] = (total + amount, count + 1, payment, rows + [cashin_tx])
+
+        WalletTransaction.objects.bulk_create(cashins, batch_size=1000)
+        WalletTransaction.objects.bulk_create(fees, batch_size=1000)
+        PlatformStatsService.record_transactions(cashins + fees)
+
+        # Each supporter's latest tip, as cash_in() would have recorded it
+        for (wallet_id, _), (total, count, payment, rows) in tips.items():
+            SupporterService.record_tip(
+                wallet=wallets[wallet_id], payment=payment, amount=total,
+                tipped_at=max(row.created_at for row in rows), tips=count)
+
+        # Lock order by id so concurrent batches cannot deadlock
+        for wallet_id in sorted(deltas, key=str):
+            WalletService.apply_balance_delta(
+                wallets[wallet_id], deltas[wallet_id])
+            WalletSummaryService.invalidate(wallet_id)
+        return cashins
 
     @staticmethod
     @transaction.atomic
@@ -209,7 +491,6 @@ class WalletTransactionService:
         payout_fee = FeeService.payout_fee()
         total_required = amount + payout_fee
         wallet = Wallet.objects.select_for_update().get(pk=wallet.pk)
-        WalletService.recalculate_wallet_balance(wallet)
 
         if wallet.balance < total_required:
             raise InsufficientBalance(
@@ -227,16 +508,19 @@ class WalletTransactionService:
             reference=payout_reference,
             correlation_id=correlation_id,
         )
+        ledger_rows = [payout_tx]
         if payout_fee > 0:
             # Fee linked to payout
-            WalletTransactionService.create_fee_transaction(
+            ledger_rows.append(WalletTransactionService.create_fee_transaction(
                 wallet=wallet,
                 amount=payout_fee,
                 reference=f"{payout_reference}-FEE",
                 related_transaction=payout_tx,
-            )
+            ))
+        PlatformStatsService.record_transactions(ledger_rows)
 
-        WalletService.recalculate_wallet_balance(wallet)
+        WalletSummaryService.invalidate(wallet.pk)
+        # Pending payouts do not move the balance until finalized
         return payout_tx
 
     @staticmethod
@@ -259,17 +543,29 @@ class WalletTransactionService:
         if payout_tx.status != "PENDING":
             return payout_tx  # idempotent
 
+        # Lock the wallet so the status flip and the balance delta are
+        # applied exactly once even if finalize is called concurrently
+        wallet = Wallet.objects.select_for_update().get(pk=payout_tx.wallet_id)
+        new_status = "COMPLETED" if success else "FAILED"
+        updated = WalletTransaction.objects.filter(
+            pk=payout_tx.pk, status="PENDING"
+        ).update(status=new_status, approved_by=approved_by)
+        if not updated:
+            payout_tx.refresh_from_db()
+            return payout_tx  # finalized by a concurrent call
+
+        payout_tx.status = new_status
         payout_tx.approved_by = approved_by
+        PlatformStatsService.record_payout_status(payout_tx, "PENDING", new_status)
+        WalletSummaryService.invalidate(wallet.pk)
 
         if success:
-            payout_tx.status = "COMPLETED"
-            payout_tx.save(update_fields=["status", "approved_by"])
-            WalletService.recalculate_wallet_balance(payout_tx.wallet)
+            WalletService.apply_balance_delta(wallet, payout_tx.amount)
+            PayoutScheduleService.mark_paid_out(wallet, payout_tx.created_at)
+            payout_tx.wallet.balance = wallet.balance
             return payout_tx
-        
+
         # FAILED PAYOUT → reverse fee
-        payout_tx.status = "FAILED"
-        payout_tx.save(update_fields=["status", "approved_by"])
 
         fee_tx = payout_tx.related_fees.filter(
             transaction_type="FEE",
@@ -285,5 +581,6 @@ class WalletTransactionService:
                 transaction_type="FEE_REVERSAL",
             )
 
-        WalletService.recalculate_wallet_balance(payout_tx.wallet)
+        # Fees are not part of the balance, so a failed payout leaves it
+        # untouched
         return payout_tx
@@ -0,0 +1,73 @@
+"""
+Celery tasks for the wallets app.
+"""
+import logging
+from celery import shared_task
+from celery.schedules import crontab
+from config.celery import app
+from apps.wallets.services.reconciliation_service import (
+    LedgerReconciliationService)
+from apps.wallets.services.snapshot_service import WalletSnapshotService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def roll_balance_snapshots():
+    """
+    Roll the balance checkpoints of every wallet forward so that ledger
+    reads only aggregate the transactions written since the last run.
+
+    Returns:
+        str: Status message
+    """
+    written = WalletSnapshotService.roll_forward_all()
+    logger.info(f"Wrote {written} wallet balance snapshots")
+    return f"Wrote {written} wallet balance snapshots"
+
+
+@shared_task
+def reconcile_ledger(repair=False):
+    """
+    Verify every wallet balance and the ledger invariants, logging each
+    discrepancy. With `repair`, drifted balances are rewritten from the
+    ledger; other findings need a manual look.
+
+    Returns:
+        str: Status message
+    """
+    report = LedgerReconciliationService.run()
+    for check, rows in report.items():
+        for row in rows:
+            logger.warning(f"Ledger reconciliation {check}: {row}")
+
+    if repair and report["balance_mismatches"]:
+        repaired = LedgerReconciliationService.repair_balances(
+            report["balance_mismatches"])
+        logger.info(f"Repaired {repaired} wallet balances")
+
+    issues = sum(len(rows) for rows in report.values())
+    logger.info(f"Ledger reconciliation found {issues} discrepancies")
+    return f"Found {issues} discrepancies"
+
+
+# Schedule the snapshot roll forward to run every day at 2:00 AM
+@app.on_after_finalize.connect
+def setup_balance_snapshot_task(sender, **kwargs):
+    """Schedule the wallet balance snapshot task to run every day at 2:00 AM."""
+    sender.add_periodic_task(
+        crontab(hour=2, minute=0),
+        roll_balance_snapshots.s(),
+        name='Roll wallet balance snapshots forward every day',
+    )
+
+
+# Schedule the ledger reconciliation to run every day at 3:00 AM
+@app.on_after_finalize.connect
+def setup_ledger_reconciliation_task(sender, **kwargs):
+    """Schedule the ledger reconciliation task to run every day at 3:00 AM."""
+    sender.add_periodic_task(
+        crontab(hour=3, minute=0),
+        reconcile_ledger.s(),
+        name='Reconcile wallet balances against the ledger every day',
+    )
@@ -1,4 +1,3 @@
-from django.db.models import Sum, Q
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -14,12 +13,22 @@ from apps.wallets.serializers import (
     WalletPayoutAccountSerializer,
     WalletUpdateSerializer,
 )
-from apps.wallets.services.wallet_services import (
-    WalletTransactionService, WalletService)
-from utils.exceptions import DuplicateTransaction, WalletNotFound
+from apps.wallets.services.wallet_services import PayoutScheduleService, WalletService
+from apps.wallets.services.summary_service import WalletSummaryService
+from apps.wallets.services.supporter_service import SupporterService
+from apps.payments.tasks import (
+    PENDING_DEPOSIT_STATUSES, schedule_deposit_reconciliation)
+from utils.exceptions import WalletNotFound
 from utils.authentication import RequireAPIKey
 from utils import serializers as helpers
-from utils.external_requests import pawapay_request
+from utils.pagination import InvalidCursor, paginate_keyset
+
+# Upper bound on payments queued for reconciliation per dashboard load
+RECONCILE_BATCH_LIMIT = 50
+
+# Page size bounds for the wallet transaction history
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
 
 
 class SupporterListView(APIView):
@@ -44,8 +53,10 @@ class SupporterListView(APIView):
         """
         List supporters who have sent tips to the authenticated creator.
 
-        Returns a list of supporters who have sent tips to the creator, including
-        their name and total amount tipped.
+        Returns one entry per supporter with their name, latest message, total
+        amount tipped, number of tips and first/last tip dates. Sort with
+        `sort` (total, count or recent) and page with `page` and `limit`
+        (capped at 100).
 
         Authentication
         --------------
@@ -59,17 +70,35 @@ class SupporterListView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Aggregate total tips by supporter
-        supporters = (
-            WalletTransaction.objects.filter(
-                wallet=wallet, transaction_type="CASH_IN"
+        try:
+            supporters = SupporterService.leaderboard(
+                wallet, sort=request.query_params.get("sort", "total"))
+        except ValueError as exc:
+            return Response(
+                {"status": "failed", "errors": {"sort": [str(exc)]}},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        )
+        try:
+            limit = int(request.query_params.get("limit", DEFAULT_PAGE_SIZE))
+            page = int(request.query_params.get("page", 1))
+        except ValueError:
+            return Response(
+                {"status": "failed",
+                 "errors": {"page": ["page and limit must be integers"]}},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        offset = (max(page, 1) - 1) * limit
+
+        serializer = CreatorSupporterSerializer(
+            supporters[offset:offset + limit], many=True)
 
-        serializer = CreatorSupporterSerializer(supporters, many=True)
-       
         return Response(
-            {"status": "success", "data": serializer.data},
+            {
+                "status": "success",
+                "count": supporters.count(),
+                "data": serializer.data,
+            },
             status=status.HTTP_200_OK
         )
 
@@ -198,37 +227,24 @@ class WalletListView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Fetch recent CASH_IN transactions
-        transactions = WalletTransaction.objects.filter(
-            wallet=wallet, transaction_type="CASH_IN"
-        ).order_by("-created_at")[:10]
-
-        # Update payment statuses for incomplete payments
-        self._update_payment_statuses(wallet)
-
-        # Calculate totals for completed transactions
-        totals = WalletTransaction.objects.filter(
-            wallet=wallet, status="COMPLETED"
-        ).aggregate(
-            cash_in=Sum("amount", filter=Q(amount__gt=0)),
-            cash_out=Sum("amount",
-                        filter=Q(amount__lt=0) & Q(transaction_type="PAYOUT")),
-            cash_in_costs=Sum("amount",
-                            filter=Q(amount__lt=0) & Q(transaction_type="FEE")),
-        )
+        # Statuses of incomplete payments are refreshed in the background
+        reconciling = self._schedule_reconciliation(wallet)
+
+        # Totals and recent transactions, cached until the next ledger write
+        summary = WalletSummaryService.get_summary(wallet)
 
         # Serialize wallet details
-        serializer = WalletDetailSerializer(wallet)
+        serializer = WalletDetailSerializer(
+            wallet, context={"summary": summary})
         wallet_data = serializer.data
 
         # Add transaction summaries and recent transactions
         wallet_data.update({
-            "cash_in": totals["cash_in"] or 0,
-            "cash_out": abs(totals["cash_out"] or 0),
-            "cash_in_costs": abs(totals["cash_in_costs"] or 0),
-            "recent_transactions": WalletTransactionListSerializer(
-                transactions, many=True
-            ).data,
+            "cash_in": summary["cash_in"],
+            "cash_out": abs(summary["cash_out"]),
+            "cash_in_costs": abs(summary["cash_in_costs"]),
+            "recent_transactions": summary["recent_transactions"],
+            "reconciling": reconciling,
         })
 
         return Response(
@@ -236,45 +252,19 @@ class WalletListView(APIView):
             status=status.HTTP_200_OK
         )
 
-    def _update_payment_statuses(self, wallet):
-        """Helper method to update payment statuses from external provider."""
-        payments = Payment.objects.filter(wallet=wallet)
-
-        if not payments:
-            return
-
-        for payment in payments:
-            skip_statuses = [
-                "pending",
-                "submitted",
-                "accepted",
-                "processing",
-                "in_reconciliation",
-            ]
-            payment_status = payment.status
-
-            if payment_status.lower() != "completed":
-                data, code = pawapay_request(
-                    "GET", f"/v2/deposits/{payment.id}"
-                )
-                if code == 200 and "data" in data:
-                    payment_status = data["data"]["status"].lower()
-
-                    if payment_status not in skip_statuses:
-                        payment.status = payment_status
-                        payment.save()
-
-                    # Process completed payment
-                    if payment_status == "completed" and payment.wallet is not None:
-                        try:
-                            WalletTransactionService.cash_in(
-                                wallet=payment.wallet,
-                                amount=payment.amount,
-                                payment=payment,
-                                reference=payment.reference,
-                            )
-                        except DuplicateTransaction:
-                            pass
+    def _schedule_reconciliation(self, wallet):
+        """
+        Queue background status checks for the wallet's non-final payments.
+        Returns True while any payment is still awaiting its final status.
+        """
+        pending_ids = list(
+            Payment.objects.filter(
+                wallet=wallet, status__in=PENDING_DEPOSIT_STATUSES
+            ).values_list("id", flat=True)[:RECONCILE_BATCH_LIMIT]
+        )
+        schedule_deposit_reconciliation(pending_ids)
+        return bool(pending_ids)
+
     @extend_schema(
             operation_id="update_wallet_payout_interval",
             summary="Update Wallet Payout Interval",
@@ -309,8 +299,8 @@ class WalletListView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        wallet.payout_interval_days = serializer.validated_data["payout_interval_days"]
-        wallet.save()
+        PayoutScheduleService.set_interval(
+            wallet, serializer.validated_data["payout_interval_days"])
 
         return Response(
             {
@@ -344,7 +334,9 @@ class WalletTransactionsView(APIView):
         List transactions for the authenticated creator's wallet.
 
         Returns a paginated list of wallet transactions including tips received,
-        fees, refunds, and payouts. Supports filtering by date, type, and status.
+        fees, refunds, and payouts, newest first. Supports filtering by type
+        and status. Pass the returned `next_cursor` as `cursor` to fetch the
+        next page; `limit` is capped at 100.
 
         Authentication
         --------------
@@ -370,15 +362,33 @@ class WalletTransactionsView(APIView):
         if tx_status:
             queryset = queryset.filter(status=tx_status)
 
-        # Order by creation date (newest first) and apply limit
-        limit = int(request.query_params.get("limit", 10))
-        transactions = queryset.order_by("-created_at")[:limit]
+        try:
+            limit = int(request.query_params.get("limit", DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return Response(
+                {"status": "failed", "errors": {"limit": ["Must be an integer"]}},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        # Newest first, each page starts right after the previous cursor
+        try:
+            transactions, next_cursor = paginate_keyset(
+                queryset, limit=limit,
+                cursor=request.query_params.get("cursor"))
+        except InvalidCursor:
+            return Response(
+                {"status": "failed", "errors": {"cursor": ["Invalid cursor"]}},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         serializer = WalletTransactionListSerializer(transactions, many=True)
         return Response(
             {
                 "status": "success",
-                "count": queryset.count(),
+                "count": WalletSummaryService.get_transaction_count(
+                    wallet, transaction_type=transaction_type, status=tx_status),
+                "next_cursor": next_cursor,
                 "data": serializer.data,
             },
             status=status.HTTP_200_OK
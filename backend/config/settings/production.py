@@ -240,6 +240,12 @@ SPECTACULAR_SETTINGS = {
 PAWAPAY_BASE_URL = env(
     "PAWAPAY_BASE_URL", default="https://api.sandbox.pawapay.io")
 PAWAPAY_API_KEY = env("PAWAPAY_API_KEY", default="")
+# Number of queues deposit callbacks are partitioned over (by depositId)
+PAYMENT_WEBHOOK_PARTITIONS = env.int("PAYMENT_WEBHOOK_PARTITIONS", default=1)
+# Budget of deposit status checks per second, shared by all workers
+PAWAPAY_STATUS_CHECKS_PER_SECOND = env.int("PAWAPAY_STATUS_CHECKS_PER_SECOND", default=50)
+PAWAPAY_ASYNC_DEPOSITS = env.bool("PAWAPAY_ASYNC_DEPOSITS", default=False)
+PAWAPAY_PAYOUTS_ENABLED = env.bool("PAWAPAY_PAYOUTS_ENABLED", default=False)
 
 # Configure Gmail Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -264,6 +270,15 @@ CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 
+# Cache
+# Shared between web and worker processes (task locks, summaries)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': env('REDIS_CACHE_URL', default='redis://localhost:6379/2'),
+    }
+}
+
 # Configure Logging to capture errors and important info in production
 LOGGING = {
     'version': 1,
@@ -4,3 +4,9 @@ from .development import *
 DEBUG = False
 SECRET_KEY = 'test-secret-key'
 ALLOWED_HOSTS = ['*']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
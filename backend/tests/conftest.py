@@ -14,6 +14,14 @@ def pytest_configure():
     django.setup()
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Keep cached state (summaries, dedupe keys, locks) local to a test."""
+    from django.core.cache import cache
+    yield
+    cache.clear()
+
+
 @pytest.fixture
 def api_client():
     """Fixture for DRF API client."""
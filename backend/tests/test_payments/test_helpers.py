@@ -41,3 +41,30 @@ class TestCheckFinalStatus:
         assert WebHook.objects.filter(
             payment=payment, event_type='deposit.completed').exists()
         mock_resend.assert_not_called()
+
+
+@pytest.mark.django_db
+class TestCheckFinalStatuses:
+
+    def test_pending_payments_are_checked_in_one_batch(self, payment_factory, mocker):
+        from decimal import Decimal
+        from apps.payments.helpers import check_final_statuses
+        from apps.wallets.models import WalletTransaction
+        from tests.factories import PaymentFactory
+        pending = payment_factory
+        unknown = PaymentFactory(wallet=pending.wallet)
+        mock_fetch = mocker.patch(
+            'apps.payments.helpers.fetch_deposit_statuses',
+            return_value={
+                str(pending.id): ({'data': {'status': 'COMPLETED'}}, 200),
+                str(unknown.id): ({'status': 'EXTERNAL_ERROR'}, 500),
+            })
+
+        statuses = check_final_statuses([pending, unknown])
+
+        assert statuses == {pending.pk: 'completed', unknown.pk: 'pending'}
+        mock_fetch.assert_called_once_with([pending.id, unknown.id])
+        pending.wallet.refresh_from_db()
+        assert pending.wallet.balance == Decimal('90.00')
+        assert WalletTransaction.objects.filter(
+            payment=pending, transaction_type='CASH_IN').count() == 1
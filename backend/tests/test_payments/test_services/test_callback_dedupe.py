@@ -0,0 +1,39 @@
+import pytest
+from apps.payments.models import PaymentWebhookLog, WebhookEventType
+from apps.payments.services.callback_dedupe import CallbackDedupeService
+
+
+@pytest.mark.django_db
+class TestCallbackDedupeService:
+
+    def test_claim_is_granted_once_per_kind(self):
+        assert CallbackDedupeService.claim("DEDUPE-1")
+        assert not CallbackDedupeService.claim("DEDUPE-1")
+        assert CallbackDedupeService.claim("DEDUPE-1", kind="payout")
+
+    def test_released_id_can_be_claimed_again(self):
+        assert CallbackDedupeService.claim("DEDUPE-2")
+        CallbackDedupeService.release("DEDUPE-2")
+        assert CallbackDedupeService.claim("DEDUPE-2")
+
+    def test_falls_back_to_webhook_log_without_cache(self, mocker):
+        mocker.patch(
+            "apps.payments.services.callback_dedupe.cache.add",
+            side_effect=ConnectionError,
+        )
+        PaymentWebhookLog.objects.create(raw_payload="{}", external_id="DEDUPE-3")
+
+        assert not CallbackDedupeService.claim("DEDUPE-3")
+        assert CallbackDedupeService.claim("DEDUPE-4")
+
+    def test_fallback_only_matches_callbacks_of_the_same_kind(self, mocker):
+        mocker.patch(
+            "apps.payments.services.callback_dedupe.cache.add",
+            side_effect=ConnectionError,
+        )
+        PaymentWebhookLog.objects.create(
+            raw_payload="{}", external_id="DEDUPE-5",
+            event_type=WebhookEventType.PAYOUT_COMPLETED)
+
+        assert not CallbackDedupeService.claim("DEDUPE-5", kind="payout")
+        assert CallbackDedupeService.claim("DEDUPE-5")
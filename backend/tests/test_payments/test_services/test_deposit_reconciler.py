@@ -0,0 +1,105 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.utils import timezone
+from apps.payments.models import Payment
+from apps.payments.services.deposit_reconciler import DepositReconciler
+from apps.wallets.models import WalletTransaction
+from tests.factories import PaymentFactory
+
+
+def provider_statuses(mocker, statuses):
+    """Answer PawaPay status checks from a payment id -> status map"""
+    def respond(deposit_ids):
+        return {
+            str(deposit_id): ({"data": {"status": statuses[str(deposit_id)]}}, 200)
+            for deposit_id in deposit_ids
+        }
+    return mocker.patch(
+        "apps.payments.services.deposit_reconciler.fetch_deposit_statuses",
+        side_effect=respond)
+
+
+def age(payment, delta):
+    Payment.objects.filter(pk=payment.pk).update(
+        created_at=timezone.now() - delta)
+
+
+@pytest.mark.django_db
+class TestDepositReconciler:
+
+    def test_final_statuses_are_applied_and_credited(self, user_factory, mocker):
+        wallet = user_factory.creator_profile.wallet
+        completed = PaymentFactory(wallet=wallet, amount=Decimal("100.00"))
+        failed = PaymentFactory(wallet=wallet, status="accepted")
+        pending = PaymentFactory(wallet=wallet)
+        provider_statuses(mocker, {
+            str(completed.id): "COMPLETED",
+            str(failed.id): "FAILED",
+            str(pending.id): "PROCESSING",
+        })
+
+        result = DepositReconciler.run()
+
+        assert result == {
+            "checked": 3, "finalized": 2, "deferred": 1, "stopped": False}
+        assert Payment.objects.get(pk=completed.pk).status == "completed"
+        assert Payment.objects.get(pk=failed.pk).status == "failed"
+        wallet.refresh_from_db()
+        assert wallet.balance == Decimal("90.00")
+        assert WalletTransaction.objects.filter(
+            payment=completed, transaction_type="CASH_IN",
+            reference=completed.reference).exists()
+
+        pending.refresh_from_db()
+        assert pending.status == "pending"
+        assert pending.status_check_attempts == 1
+        assert pending.next_status_check_at > timezone.now()
+
+    def test_final_status_that_cannot_be_applied_is_backed_off(
+        self, user_factory, mocker
+    ):
+        payment = PaymentFactory(wallet=user_factory.creator_profile.wallet)
+        # Final, but not a transition the table allows from pending
+        provider_statuses(mocker, {str(payment.id): "PAID"})
+
+        result = DepositReconciler.run()
+
+        assert result["finalized"] == 0 and result["deferred"] == 1
+        payment.refresh_from_db()
+        assert payment.status == "pending"
+        assert payment.status_check_attempts == 1
+        assert payment.next_status_check_at > timezone.now()
+
+    def test_backed_off_and_expired_payments_are_skipped(self, user_factory, mocker):
+        wallet = user_factory.creator_profile.wallet
+        backed_off = PaymentFactory(
+            wallet=wallet,
+            next_status_check_at=timezone.now() + timedelta(minutes=5))
+        abandoned = PaymentFactory(wallet=wallet)
+        age(abandoned, timedelta(days=30))
+        old_but_due = PaymentFactory(wallet=wallet)
+        age(old_but_due, timedelta(hours=5))
+        mock_request = provider_statuses(mocker, {str(old_but_due.id): "FAILED"})
+
+        assert DepositReconciler.run()["checked"] == 1
+        mock_request.assert_called_once_with([old_but_due.id])
+
+    def test_run_stops_when_rate_budget_is_exhausted(self, user_factory, mocker):
+        wallet = user_factory.creator_profile.wallet
+        payments = [PaymentFactory(wallet=wallet) for _ in range(3)]
+        provider_statuses(mocker, {str(p.id): "PENDING" for p in payments})
+        mocker.patch(
+            "apps.payments.services.deposit_reconciler.TokenBucket.acquire",
+            side_effect=[True, False])
+
+        result = DepositReconciler.run()
+
+        assert result["checked"] == 1
+        assert result["stopped"] is True
+        assert Payment.objects.filter(status_check_attempts=1).count() == 1
+
+    def test_backoff_grows_exponentially_up_to_a_cap(self):
+        assert DepositReconciler.backoff(1) <= timedelta(minutes=2)
+        assert DepositReconciler.backoff(5) > timedelta(minutes=20)
+        assert DepositReconciler.backoff(30) <= timedelta(hours=6)
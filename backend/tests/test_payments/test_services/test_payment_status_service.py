@@ -0,0 +1,101 @@
+import pytest
+from apps.payments.models import Payment
+from apps.payments.services.payment_status_service import PaymentStatusService
+from tests.factories import PaymentFactory
+
+
+@pytest.mark.django_db
+class TestPaymentStatusService:
+
+    def test_allowed_transition_updates_status_and_version(self, payment_factory):
+        assert PaymentStatusService.transition(payment_factory, "ACCEPTED")
+        assert PaymentStatusService.transition(payment_factory, "completed")
+
+        stored = Payment.objects.get(pk=payment_factory.pk)
+        assert stored.status == payment_factory.status == "completed"
+        assert stored.version == payment_factory.version == 2
+        assert stored.completed_at is not None
+
+    def test_regressions_and_unknown_statuses_are_rejected(self, payment_factory):
+        assert PaymentStatusService.transition(payment_factory, "accepted")
+
+        assert not PaymentStatusService.transition(payment_factory, "pending")
+        assert not PaymentStatusService.transition(payment_factory, "duplicate_ignored")
+        assert PaymentStatusService.transition(payment_factory, "failed")
+        assert not PaymentStatusService.transition(payment_factory, "completed")
+        assert Payment.objects.get(pk=payment_factory.pk).status == "failed"
+
+    def test_stale_version_loses_to_concurrent_update(self, payment_factory):
+        stale = Payment.objects.get(pk=payment_factory.pk)
+        assert PaymentStatusService.transition(payment_factory, "accepted")
+
+        assert not PaymentStatusService.transition(
+            stale, "failed", version=stale.version)
+        assert PaymentStatusService.transition(
+            payment_factory, "failed", version=payment_factory.version)
+
+    def test_retry_from_stored_row_reports_the_version_written(self, payment_factory):
+        stale = Payment.objects.get(pk=payment_factory.pk)
+        assert PaymentStatusService.transition(payment_factory, "accepted")
+        assert PaymentStatusService.transition(payment_factory, "processing")
+
+        assert PaymentStatusService.transition(stale, "completed")
+
+        stored = Payment.objects.get(pk=payment_factory.pk)
+        assert stored.version == stale.version == 3
+        assert PaymentStatusService.transition(stale, "refunded", version=stale.version)
+
+    def test_update_status_records_history(self, payment_factory):
+        assert payment_factory.update_status("completed", {"source": "admin"})
+        assert not payment_factory.update_status("pending")
+
+        stored = Payment.objects.get(pk=payment_factory.pk)
+        assert stored.status == "completed"
+        assert stored.metadata["status_changes"][0]["to"] == "completed"
+
+    def test_bulk_transition_moves_only_allowed_payments(self, payment_factory):
+        wallet = payment_factory.wallet
+        pending = [PaymentFactory(wallet=wallet) for _ in range(3)]
+        final = PaymentFactory(wallet=wallet, status="failed")
+
+        moved = Payment.objects.bulk_update_status({
+            pending[0].pk: "COMPLETED",
+            pending[1].pk: "completed",
+            pending[2].pk: "failed",
+            final.pk: "completed",
+            payment_factory.pk: "pending",
+        })
+
+        assert sorted(moved["completed"]) == sorted([pending[0].pk, pending[1].pk])
+        assert moved["failed"] == [pending[2].pk]
+        assert "pending" not in moved
+        assert Payment.objects.get(pk=final.pk).status == "failed"
+        completed = Payment.objects.get(pk=pending[0].pk)
+        assert completed.version == 1
+        assert completed.completed_at is not None
+
+    def test_bulk_transition_skips_payments_moved_concurrently(
+        self, payment_factory, mocker
+    ):
+        update = PaymentStatusService._update_returning
+
+        def concurrent_update(payment_ids, old_status, changes):
+            # Another updater wins the race after the rows were read
+            PaymentStatusService.transition(
+                Payment.objects.get(pk=payment_factory.pk), "failed")
+            return update(payment_ids, old_status, changes)
+
+        mocker.patch.object(
+            PaymentStatusService, "_update_returning", side_effect=concurrent_update)
+
+        assert Payment.objects.bulk_update_status({payment_factory.pk: "completed"}) == {}
+        assert Payment.objects.get(pk=payment_factory.pk).status == "failed"
+
+    def test_manager_update_status_writes_status_columns(self, payment_factory):
+        Payment.objects.filter(pk=payment_factory.pk).update(
+            provider_data={"kept": True})
+
+        assert Payment.objects.update_status(payment_factory, "accepted")
+        stored = Payment.objects.get(pk=payment_factory.pk)
+        assert stored.status == "accepted"
+        assert stored.provider_data == {"kept": True}
@@ -0,0 +1,40 @@
+from apps.payments.services.provider_health import ProviderHealthService
+
+
+class TestProviderHealthService:
+
+    def test_refresh_caches_deposit_availability(self, mocker):
+        mocker.patch(
+            "apps.payments.services.provider_health.pawapay_request",
+            return_value=([{
+                "country": "ZMB",
+                "providers": [
+                    {"provider": "MTN_MOMO_ZMB", "operationTypes": [
+                        {"operationType": "DEPOSIT", "status": "OPERATIONAL"},
+                        {"operationType": "PAYOUT", "status": "CLOSED"},
+                    ]},
+                    {"provider": "ZAMTEL_ZMB", "operationTypes": [
+                        {"operationType": "DEPOSIT", "status": "CLOSED"},
+                    ]},
+                ],
+            }], 200),
+        )
+
+        assert ProviderHealthService.refresh_availability() == {
+            "MTN_MOMO_ZMB": "OPERATIONAL", "ZAMTEL_ZMB": "CLOSED"}
+        assert ProviderHealthService.is_available("MTN_MOMO_ZMB")
+        assert not ProviderHealthService.is_available("ZAMTEL_ZMB")
+        # Unknown operators are not blocked
+        assert ProviderHealthService.is_available("AIRTEL_OAPI_ZMB")
+
+    def test_failed_refresh_keeps_previous_map(self, mocker):
+        mock_request = mocker.patch(
+            "apps.payments.services.provider_health.pawapay_request",
+            return_value=([{"providers": [{"provider": "ZAMTEL_ZMB",
+                "operationTypes": [{"operationType": "DEPOSIT", "status": "CLOSED"}]}]}], 200),
+        )
+        ProviderHealthService.refresh_availability()
+        mock_request.return_value = ({"status": "EXTERNAL_ERROR"}, 500)
+
+        assert ProviderHealthService.refresh_availability() is None
+        assert not ProviderHealthService.is_available("ZAMTEL_ZMB")
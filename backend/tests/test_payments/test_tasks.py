@@ -1,65 +1,302 @@
 import pytest
 from celery.exceptions import Retry
+from datetime import timedelta
+from django.utils import timezone
+from apps.payments.models import PaymentWebhookLog
 from apps.payments.tasks import (
-    resend_deposit_callback,
+    callback_queue,
+    initiate_deposit,
+    process_deposit_callbacks,
+    reconcile_deposit_status,
+    requeue_stale_callbacks,
+    requeue_stale_initiations,
     resend_pending_deposits,
+    schedule_deposit_reconciliation,
 )
+from apps.wallets.models import WalletTransaction
 from tests.factories import PaymentFactory
 @pytest.mark.django_db
-class TestResendDepositCallbackTask:
+class TestResendPendingDepositsBatchTask:
+
+    def test_resend_pending_deposits_runs_reconciler(self, mocker):
+        mock_run = mocker.patch(
+            "apps.payments.tasks.DepositReconciler.run",
+            return_value={"checked": 0})
+
+        assert resend_pending_deposits.run() == {"checked": 0}
+        mock_run.assert_called_once()
+
+    def test_resend_pending_deposits_never_overlaps(self, mocker):
+        from django.core.cache import cache
+        from apps.payments.tasks import DEPOSIT_RECONCILER_LOCK_KEY
+        mock_run = mocker.patch("apps.payments.tasks.DepositReconciler.run")
+        cache.add(DEPOSIT_RECONCILER_LOCK_KEY, 1)
+
+        assert resend_pending_deposits.run() == "Reconciliation already running"
+        mock_run.assert_not_called()
+
+
+@pytest.mark.django_db
+class TestReconcileDepositStatusTask:
+
+    def test_reconcile_completes_and_credits_wallet(self, payment_factory, mocker):
+        mock_pawapay = mocker.patch("apps.payments.tasks.pawapay_request")
+        payment = payment_factory
+        mock_pawapay.return_value = (
+            {"data": {"depositId": str(payment.id), "status": "COMPLETED"}},
+            200,
+        )
+
+        result = reconcile_deposit_status.run(str(payment.id))
+
+        assert result == "Payment completed"
+        payment.refresh_from_db()
+        assert payment.status == "completed"
+        assert WalletTransaction.objects.filter(
+            payment=payment, transaction_type="CASH_IN").count() == 1
 
-    def test_resend_callback_success(self, payment_factory, mocker):
-        mock_resend = mocker.patch("apps.payments.tasks.resend_callback")
+        # a second run is a no-op once the payment is final
+        assert reconcile_deposit_status.run(str(payment.id)) == "Payment already final"
+        mock_pawapay.assert_called_once()
+
+    def test_reconcile_leaves_pending_payment(self, payment_factory, mocker):
+        mock_pawapay = mocker.patch("apps.payments.tasks.pawapay_request")
         payment = payment_factory
+        mock_pawapay.return_value = ({"data": {"status": "PROCESSING"}}, 200)
+
+        assert reconcile_deposit_status.run(str(payment.id)) == "Payment still pending"
+        payment.refresh_from_db()
+        assert payment.status == "pending"
 
-        mock_resend.return_value = ({"status": "ACCEPTED"}, 200)
+    def test_reconcile_provider_error(self, payment_factory, mocker):
+        mock_pawapay = mocker.patch("apps.payments.tasks.pawapay_request")
+        mock_pawapay.return_value = ({}, 500)
 
-        result = resend_deposit_callback.run(str(payment.id))
+        result = reconcile_deposit_status.run(str(payment_factory.id))
 
-        assert result == "Callback resent"
-        mock_resend.assert_called_once_with(str(payment.id))
+        assert result == "Status unavailable"
+        assert not WalletTransaction.objects.exists()
 
-    def test_resend_callback_retries_on_failure(self, payment_factory, mocker):
-        mock_resend = mocker.patch("apps.payments.tasks.resend_callback")
-        mock_retry = mocker.patch("apps.payments.tasks.resend_deposit_callback.retry")
+    def test_schedule_deduplicates_per_payment(self, payment_factory, mocker):
+        mock_delay = mocker.patch("apps.payments.tasks.reconcile_deposit_status.delay")
         payment = payment_factory
 
-        mock_resend.return_value = ({}, 500)
+        assert schedule_deposit_reconciliation([payment.id]) == 1
+        assert schedule_deposit_reconciliation([payment.id]) == 0
+        mock_delay.assert_called_once_with(str(payment.id))
+
+
+@pytest.mark.django_db
+class TestInitiateDepositTask:
+
+    @pytest.fixture
+    def initiating(self, payment_factory):
+        payment_factory.status = "initiating"
+        payment_factory.save(update_fields=["status"])
+        return payment_factory
+
+    def test_initiation_submits_and_accepts(self, initiating, mocker):
+        mock_pawapay = mocker.patch("apps.payments.tasks.pawapay_request")
+        mock_pawapay.return_value = (
+            {"depositId": str(initiating.id), "status": "ACCEPTED"}, 200)
+
+        assert initiate_deposit.run(str(initiating.id)) == "Payment accepted"
+        payload = mock_pawapay.call_args.kwargs["payload"]
+        assert payload["depositId"] == str(initiating.id)
+
+        # Already submitted: the redelivered task does nothing
+        assert initiate_deposit.run(str(initiating.id)) == "Payment already submitted"
+        mock_pawapay.assert_called_once()
+
+    def test_resubmitted_deposit_is_accepted(self, initiating, mocker):
+        mocker.patch(
+            "apps.payments.tasks.pawapay_request",
+            return_value=({"status": "DUPLICATE_IGNORED"}, 200))
+
+        assert initiate_deposit.run(str(initiating.id)) == "Payment accepted"
+
+    def test_refused_initiation_fails_payment(self, initiating, mocker):
+        mocker.patch(
+            "apps.payments.tasks.pawapay_request",
+            return_value=({"status": "INVALID_INPUT"}, 400))
 
-        # Celery raises Retry exception internally
-        mock_retry.side_effect = Retry()
+        assert initiate_deposit.run(str(initiating.id)) == "Payment failed"
+        initiating.refresh_from_db()
+        assert initiating.status == "failed"
+
+    def test_gateway_errors_are_retried(self, initiating, mocker):
+        mocker.patch(
+            "apps.payments.tasks.pawapay_request", return_value=({}, 503))
+        mock_retry = mocker.patch(
+            "apps.payments.tasks.initiate_deposit.retry", side_effect=Retry())
 
         with pytest.raises(Retry):
-            resend_deposit_callback.run(str(payment.id))
+            initiate_deposit.run(str(initiating.id))
+        mock_retry.assert_called_once_with(countdown=10)
+
+        # Out of retries the payment is left for the stale sweep
+        result = initiate_deposit.apply(
+            args=[str(initiating.id)], retries=5).get()
+        assert result == "Submission deferred"
+        initiating.refresh_from_db()
+        assert initiating.status == "initiating"
+
+    def test_stale_initiations_are_requeued_or_expired(self, initiating, mocker):
+        mock_delay = mocker.patch("apps.payments.tasks.initiate_deposit.delay")
+        expired = PaymentFactory(wallet=initiating.wallet, status="initiating")
+        PaymentFactory(wallet=initiating.wallet, status="initiating")
+        now = timezone.now()
+        type(initiating).objects.filter(pk=initiating.pk).update(
+            created_at=now - timedelta(minutes=15))
+        type(initiating).objects.filter(pk=expired.pk).update(
+            created_at=now - timedelta(hours=2))
+
+        mock_fetch = mocker.patch(
+            "apps.payments.services.deposit_reconciler.fetch_deposit_statuses",
+            return_value={str(expired.pk): ({"status": "NOT_FOUND"}, 200)})
+
+        assert requeue_stale_initiations.run() == 1
+        mock_delay.assert_called_once_with(str(initiating.pk))
+        mock_fetch.assert_called_once_with([expired.pk])
+        expired.refresh_from_db()
+        assert expired.status == "failed"
+
+    def test_expired_initiation_known_to_pawapay_is_not_failed(
+        self, initiating, mocker
+    ):
+        # The submission went through but its reply was lost
+        lost = PaymentFactory(wallet=initiating.wallet, status="initiating")
+        unanswered = PaymentFactory(wallet=initiating.wallet, status="initiating")
+        type(initiating).objects.filter(
+            pk__in=[initiating.pk, lost.pk, unanswered.pk]
+        ).update(created_at=timezone.now() - timedelta(hours=2))
+        mocker.patch(
+            "apps.payments.services.deposit_reconciler.fetch_deposit_statuses",
+            return_value={
+                str(initiating.pk): (
+                    {"status": "FOUND", "data": {"status": "COMPLETED"}}, 200),
+                str(lost.pk): (
+                    {"status": "FOUND", "data": {"status": "ACCEPTED"}}, 200),
+                str(unanswered.pk): ({}, 503),
+            })
 
-        mock_retry.assert_called_once()
+        requeue_stale_initiations.run()
 
-    def test_resend_callback_no_deposit_id(self, mocker):
-        mock_resend = mocker.patch("apps.payments.tasks.resend_callback")
-        
-        result = resend_deposit_callback.run(None)
+        initiating.refresh_from_db()
+        assert initiating.status == "completed"
+        assert WalletTransaction.objects.filter(
+            payment=initiating, transaction_type="CASH_IN").count() == 1
+        lost.refresh_from_db()
+        assert lost.status == "accepted"
+        unanswered.refresh_from_db()
+        assert unanswered.status == "initiating"
+        # Backed off like any reconciled deposit, not looked up every sweep
+        assert unanswered.next_status_check_at > timezone.now()
+
+    def test_expired_initiations_share_the_status_check_budget(
+        self, initiating, mocker
+    ):
+        expired = [initiating] + [
+            PaymentFactory(wallet=initiating.wallet, status="initiating")
+            for _ in range(2)]
+        for age, payment in enumerate(expired):
+            type(initiating).objects.filter(pk=payment.pk).update(
+                created_at=timezone.now() - timedelta(hours=4 - age))
+        mock_fetch = mocker.patch(
+            "apps.payments.services.deposit_reconciler.fetch_deposit_statuses",
+            side_effect=lambda ids: {
+                str(i): ({"status": "NOT_FOUND"}, 200) for i in ids})
+        mocker.patch(
+            "apps.payments.services.deposit_reconciler.TokenBucket.acquire",
+            side_effect=[True, False])
+
+        requeue_stale_initiations.run()
+
+        mock_fetch.assert_called_once_with([expired[0].pk])
+        assert type(initiating).objects.filter(status="failed").count() == 1
+
+
+def store_callback(payment, status, external_id):
+    return PaymentWebhookLog.objects.create(
+        raw_payload="{}",
+        parsed_payload={"depositId": str(payment.id), "status": status},
+        deposit_id=str(payment.id),
+        external_id=external_id,
+    )
 
-        assert result == "No Payment Found"
-        mock_resend.assert_not_called()
 
 @pytest.mark.django_db
-class TestResendPendingDepositsBatchTask:
-    from django.db.models.signals import post_save
-    import factory
+class TestProcessDepositCallbacksTask:
+
+    def test_callbacks_are_applied_in_arrival_order(self, payment_factory):
+        first = store_callback(payment_factory, "ACCEPTED", "ORDER-1")
+        second = store_callback(payment_factory, "COMPLETED", "ORDER-2")
+
+        assert process_deposit_callbacks.run(str(payment_factory.id)) == \
+            "Processed 2 callbacks"
+
+        payment_factory.refresh_from_db()
+        assert payment_factory.status == "completed"
+        first.refresh_from_db()
+        second.refresh_from_db()
+        assert first.status == second.status == "processed"
+        assert second.event_type == "deposit.completed"
+        assert WalletTransaction.objects.filter(
+            payment=payment_factory, transaction_type="CASH_IN",
+            reference="ORDER-2").exists()
+
+    def test_redelivered_callback_is_not_applied_twice(self, payment_factory):
+        store_callback(payment_factory, "COMPLETED", "REPLAY-1")
+        process_deposit_callbacks.run(str(payment_factory.id))
+        replay = store_callback(payment_factory, "COMPLETED", "REPLAY-1")
+
+        assert process_deposit_callbacks.run(str(payment_factory.id)) == \
+            "Processed 0 callbacks"
+
+        replay.refresh_from_db()
+        assert replay.status == "ignored"
+        assert WalletTransaction.objects.filter(
+            payment=payment_factory, transaction_type="CASH_IN").count() == 1
+
+    def test_second_completion_does_not_credit_again(self, payment_factory):
+        store_callback(payment_factory, "COMPLETED", "FIRST-COMPLETION")
+        store_callback(payment_factory, "COMPLETED", "SECOND-COMPLETION")
+
+        process_deposit_callbacks.run(str(payment_factory.id))
+
+        assert WalletTransaction.objects.filter(
+            payment=payment_factory, transaction_type="CASH_IN").count() == 1
+
+    def test_stale_callbacks_are_requeued(self, payment_factory, mocker):
+        mock_enqueue = mocker.patch(
+            "apps.payments.tasks.enqueue_deposit_callbacks")
+        stale = store_callback(payment_factory, "COMPLETED", "STALE-1")
+        PaymentWebhookLog.objects.filter(pk=stale.pk).update(
+            created_at=timezone.now() - timedelta(minutes=10))
+        store_callback(
+            PaymentFactory(wallet=payment_factory.wallet), "COMPLETED", "FRESH-1")
+
+        assert requeue_stale_callbacks.run() == 1
+        mock_enqueue.assert_called_once_with(str(payment_factory.id))
+
+    def test_callback_of_a_dying_worker_stays_received(self, payment_factory, mocker):
+        log = store_callback(payment_factory, "COMPLETED", "WORKER-DIED")
+        mocker.patch(
+            "apps.payments.tasks._apply_deposit_callback", side_effect=SystemExit)
 
-    @factory.django.mute_signals(post_save)
-    def test_resend_pending_deposits_dispatches_tasks(self, mocker):
-        mock_delay = mocker.patch("apps.payments.tasks.resend_deposit_callback.delay")
-        payments = PaymentFactory.create_batch(2)
-        resend_pending_deposits.run()
+        with pytest.raises(SystemExit):
+            process_deposit_callbacks.run(str(payment_factory.id))
 
-        assert mock_delay.call_count == 2
+        log.refresh_from_db()
+        assert log.status == "received"
+        payment_factory.refresh_from_db()
+        assert payment_factory.status == "pending"
 
-        called_ids = {call.args[0] for call in mock_delay.call_args_list}
-        assert payments[0].id in called_ids
-        assert payments[1].id in called_ids
+    def test_callbacks_of_a_deposit_share_a_partition(self, settings):
+        settings.PAYMENT_WEBHOOK_PARTITIONS = 8
+        queue = callback_queue("3f0d7a4e-0000-4000-8000-000000000001")
+        assert queue.startswith("payment-webhooks-")
+        assert callback_queue("3f0d7a4e-0000-4000-8000-000000000001") == queue
 
-    def test_resend_pending_deposits_no_pending(self, mocker):
-        mock_delay = mocker.patch("apps.payments.tasks.resend_deposit_callback.delay")
-        resend_pending_deposits.run()
-        mock_delay.assert_not_called()
\ No newline at end of file
+        settings.PAYMENT_WEBHOOK_PARTITIONS = 1
+        assert callback_queue("3f0d7a4e-0000-4000-8000-000000000001") is None
@@ -1,6 +1,8 @@
 import pytest
 from decimal import Decimal
+from django.core.cache import cache
 from apps.payments.models import Payment
+from apps.payments.services.provider_health import AVAILABILITY_KEY
 from apps.wallets.models import WalletTransaction
 
 
@@ -305,3 +307,161 @@ class TestCashinViews:
         
         mock_request.call_count == 3
         
+
+    def test_deposit_fails_fast_while_circuit_is_open(
+        self, auth_api_client, wallet_factory, mocker
+    ):
+        """Repeated gateway failures open the circuit for that operator"""
+        mock_request = mocker.patch("apps.payments.views.pawapay_request")
+        mock_request.return_value = ({"status": "EXTERNAL_ERROR"}, 500)
+        data = {
+            "patronPhone": "7655555556",
+            "provider": "MTN_MOMO_ZMB",
+            "amount": "10",
+        }
+        url = f"/api/v1/payments/deposits/{wallet_factory.id}/"
+        for _ in range(5):
+            assert auth_api_client.post(url, data, format="json").status_code == 500
+
+        response = auth_api_client.post(url, data, format="json")
+
+        assert response.status_code == 503
+        assert response.json()["error"] == "provider_unavailable"
+        assert response["Retry-After"] == "30"
+        assert mock_request.call_count == 5
+        assert Payment.objects.count() == 5
+
+        # Other operators are unaffected
+        data["provider"] = "AIRTEL_OAPI_ZMB"
+        assert auth_api_client.post(url, data, format="json").status_code == 500
+
+    def test_deposit_to_closed_operator_is_rejected(
+        self, auth_api_client, wallet_factory, mocker
+    ):
+        cache.set(AVAILABILITY_KEY, {"MTN_MOMO_ZMB": "CLOSED"})
+        mock_request = mocker.patch("apps.payments.views.pawapay_request")
+        data = {
+            "patronPhone": "7655555556",
+            "provider": "MTN_MOMO_ZMB",
+            "amount": "10",
+        }
+
+        response = auth_api_client.post(
+            f"/api/v1/payments/deposits/{wallet_factory.id}/", data, format="json")
+
+        assert response.status_code == 503
+        mock_request.assert_not_called()
+        assert not Payment.objects.exists()
+
+    def test_provider_availability_is_served_from_cache(self, auth_api_client):
+        cache.set(AVAILABILITY_KEY, {"MTN_MOMO_ZMB": "OPERATIONAL"})
+
+        response = auth_api_client.get("/api/v1/payments/availability/")
+
+        assert response.status_code == 200
+        assert response.json()["data"] == {"MTN_MOMO_ZMB": "OPERATIONAL"}
+
+    def test_async_deposit_is_queued_for_initiation(
+        self, auth_api_client, wallet_factory, mocker, django_capture_on_commit_callbacks
+    ):
+        mock_request = mocker.patch("apps.payments.views.pawapay_request")
+        mock_delay = mocker.patch("apps.payments.tasks.initiate_deposit.delay")
+        data = {
+            "patronPhone": "7655555556",
+            "provider": "MTN_MOMO_ZMB",
+            "amount": "10",
+        }
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = auth_api_client.post(
+                f"/api/v1/payments/deposits/{wallet_factory.id}/", data,
+                format="json", HTTP_PREFER="respond-async")
+
+        assert response.status_code == 202
+        payment = Payment.objects.get()
+        assert payment.status == "initiating"
+        assert response.json()["data"]["depositId"] == str(payment.id)
+        mock_request.assert_not_called()
+        mock_delay.assert_called_once_with(str(payment.id))
+
+        # Polling does not reach PawaPay before the deposit is submitted
+        status_response = auth_api_client.get(
+            f"/api/v1/payments/status/{payment.id}/")
+        assert status_response.json() == {"status": "initiating"}
+
+    def test_idempotent_retry_replays_original_response(
+        self, auth_api_client, wallet_factory, mocker
+    ):
+        mock_request = mocker.patch("apps.payments.views.pawapay_request")
+        mock_request.return_value = ({"status": "ACCEPTED"}, 200)
+        data = {
+            "patronPhone": "7655555556",
+            "provider": "MTN_MOMO_ZMB",
+            "amount": "10",
+        }
+        url = f"/api/v1/payments/deposits/{wallet_factory.id}/"
+
+        first = auth_api_client.post(
+            url, data, format="json", HTTP_IDEMPOTENCY_KEY="tip-1")
+        retry = auth_api_client.post(
+            url, data, format="json", HTTP_IDEMPOTENCY_KEY="tip-1")
+
+        assert first.status_code == retry.status_code == 201
+        assert retry.json() == first.json()
+        assert retry["Idempotent-Replayed"] == "true"
+        assert Payment.objects.count() == 1
+        mock_request.assert_called_once()
+
+        # The same key with another body is refused
+        data["amount"] = "20"
+        reused = auth_api_client.post(
+            url, data, format="json", HTTP_IDEMPOTENCY_KEY="tip-1")
+        assert reused.status_code == 422
+        assert Payment.objects.count() == 1
+
+    def test_retry_after_server_error_resubmits_the_same_payment(
+        self, auth_api_client, wallet_factory, mocker
+    ):
+        mock_request = mocker.patch("apps.payments.views.pawapay_request")
+        mock_request.side_effect = [
+            ({"status": "EXTERNAL_ERROR"}, 500),
+            ({"status": "ACCEPTED"}, 200),
+        ]
+        data = {
+            "patronPhone": "7655555556",
+            "provider": "MTN_MOMO_ZMB",
+            "amount": "10",
+        }
+        url = f"/api/v1/payments/deposits/{wallet_factory.id}/"
+
+        assert auth_api_client.post(
+            url, data, format="json", HTTP_IDEMPOTENCY_KEY="tip-2").status_code == 500
+        assert auth_api_client.post(
+            url, data, format="json", HTTP_IDEMPOTENCY_KEY="tip-2").status_code == 201
+        assert mock_request.call_count == 2
+        payment = Payment.objects.get()
+        assert payment.status == "accepted"
+        assert {c.kwargs["payload"]["depositId"] for c in mock_request.call_args_list} \
+            == {str(payment.id)}
+
+    def test_provider_unavailable_frees_idempotency_key(
+        self, auth_api_client, wallet_factory, mocker
+    ):
+        mock_request = mocker.patch("apps.payments.views.pawapay_request")
+        mock_request.return_value = ({"status": "ACCEPTED"}, 200)
+        available = mocker.patch(
+            "apps.payments.views.ProviderHealthService.is_available",
+            side_effect=[False, True])
+        data = {
+            "patronPhone": "7655555556",
+            "provider": "MTN_MOMO_ZMB",
+            "amount": "10",
+        }
+        url = f"/api/v1/payments/deposits/{wallet_factory.id}/"
+
+        assert auth_api_client.post(
+            url, data, format="json", HTTP_IDEMPOTENCY_KEY="tip-3").status_code == 503
+        assert auth_api_client.post(
+            url, data, format="json", HTTP_IDEMPOTENCY_KEY="tip-3").status_code == 201
+        assert available.call_count == 2
+        assert Payment.objects.count() == 1
@@ -4,7 +4,8 @@ import uuid
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from decimal import Decimal
-from apps.payments.models import PaymentWebhookLog
+from apps.payments.models import PaymentWebhookLog, WebhookEventType
+from apps.payments.tasks import process_deposit_callbacks, process_payout_callbacks
 from apps.wallets.models import WalletTransaction
 
 User = get_user_model()
@@ -164,6 +165,14 @@ class TestPaymentStatusAPIView:
 @pytest.mark.django_db
 class TestPaymentWebhookView:
 
+    @pytest.fixture(autouse=True)
+    def run_callback_consumer(self, mocker):
+        """Consume queued callbacks inline, as the webhook worker would"""
+        return mocker.patch(
+            "apps.payments.tasks.process_deposit_callbacks.apply_async",
+            side_effect=lambda args, **kwargs: process_deposit_callbacks(*args),
+        )
+
     def test_webhook_credits_wallet_when_payment_is_completed(
         self, api_client, payment_factory
     ):
@@ -344,6 +353,27 @@ class TestPaymentWebhookView:
         payment_factory.refresh_from_db()
         assert payment_factory.status == "completed"
 
+    def test_duplicate_callback_is_rejected_without_a_query(
+        self, api_client, payment_factory, django_assert_num_queries
+    ):
+        payload = {
+            "depositId": str(payment_factory.id),
+            "status": "COMPLETED",
+            "providerTransactionId": "STORM-1",
+        }
+        api_client.post(
+            reverse("payments:webhook"), payload, content_type="application/json"
+        )
+
+        with django_assert_num_queries(0):
+            response = api_client.post(
+                reverse("payments:webhook"),
+                payload,
+                content_type="application/json",
+            )
+        assert "Duplicate callback ignored" in response.content.decode("utf-8")
+        assert PaymentWebhookLog.objects.filter(external_id="STORM-1").count() == 1
+
     def test_webhook_rejects_non_post_request(self, api_client):
         response = api_client.get(reverse("payments:webhook"))
         assert response.status_code == 405 or response.status_code == 400
@@ -397,6 +427,37 @@ class TestPaymentWebhookView:
 
         assert response.status_code == 400
 
+    def test_webhook_handles_callback_with_no_status(self, api_client):
+        """Test callback with missing status"""
+        payload = {
+            "depositId": str(uuid.uuid4()),
+            "providerTransactionId": "NO-STATUS",
+        }
+
+        response = api_client.post(
+            reverse("payments:webhook"),
+            payload,
+            content_type="application/json",
+        )
+
+        assert response.status_code == 400
+
+    def test_webhook_handles_callback_with_malformed_payment_id(self, api_client):
+        """Test callback whose depositId is not a valid id"""
+        payload = {
+            "depositId": "not-a-uuid",
+            "status": "COMPLETED",
+            "providerTransactionId": "MALFORMED",
+        }
+
+        response = api_client.post(
+            reverse("payments:webhook"),
+            payload,
+            content_type="application/json",
+        )
+
+        assert response.status_code == 404
+
     def test_webhook_handles_callback_with_no_related_payment(self, api_client):
         """Test callback when payment doesn't exist"""
         non_existent_id = uuid.uuid4()
@@ -412,7 +473,38 @@ class TestPaymentWebhookView:
             content_type="application/json",
         )
 
-        assert response.status_code == 404
+        # Accepted, then dropped by the consumer
+        assert response.status_code == 200
+        webhook = PaymentWebhookLog.objects.get(external_id="ABC123")
+        assert webhook.status == "ignored"
+        assert webhook.payment is None
+
+    def test_webhook_stores_callback_before_processing(
+        self, api_client, payment_factory, run_callback_consumer
+    ):
+        """The request only stores the callback and queues it by depositId"""
+        run_callback_consumer.side_effect = None
+        payload = {
+            "depositId": str(payment_factory.id),
+            "status": "COMPLETED",
+            "providerTransactionId": "QUEUED-1",
+        }
+
+        response = api_client.post(
+            reverse("payments:webhook"),
+            payload,
+            content_type="application/json",
+        )
+
+        assert response.status_code == 200
+        webhook = PaymentWebhookLog.objects.get(external_id="QUEUED-1")
+        assert webhook.status == "received"
+        assert webhook.deposit_id == str(payment_factory.id)
+        assert json.loads(webhook.raw_payload) == payload
+        payment_factory.refresh_from_db()
+        assert payment_factory.status != "completed"
+        run_callback_consumer.assert_called_once_with(
+            args=[str(payment_factory.id)], queue=None)
 
     def test_webhook_logs_all_fields(self, api_client, payment_factory):
         """Test that webhook logs capture all payload fields"""
@@ -548,3 +640,217 @@ class TestPaymentWebhookView:
         assert "Payment to creator #123" in webhook.parsed_payload.get(
             "customerMessage", ""
         )
+
+
+@pytest.mark.django_db
+class TestPayoutWebhookView:
+
+    @pytest.fixture(autouse=True)
+    def run_callback_consumers(self, mocker):
+        """Consume queued callbacks inline, as the webhook worker would"""
+        mocker.patch(
+            "apps.payments.tasks.process_deposit_callbacks.apply_async",
+            side_effect=lambda args, **kwargs: process_deposit_callbacks(*args),
+        )
+        return mocker.patch(
+            "apps.payments.tasks.process_payout_callbacks.apply_async",
+            side_effect=lambda args, **kwargs: process_payout_callbacks(*args),
+        )
+
+    @pytest.fixture
+    def accepted_payout(self, user_factory):
+        from apps.payouts.models import ProviderPayout
+        from apps.wallets.services.wallet_services import WalletTransactionService
+        wallet = user_factory.creator_profile.wallet
+        WalletTransactionService.cash_in(
+            wallet=wallet, amount=Decimal("100.00"), payment=None,
+            reference="CASHIN-PAYOUT-CALLBACK")
+        payout_tx = WalletTransactionService.payout(
+            wallet=wallet, amount=Decimal("90.00"), correlation_id="PAYOUT-CALLBACK")
+        ProviderPayout.objects.create(
+            payout_tx=payout_tx, status="accepted",
+            provider="MTN_MOMO_ZMB", phone_number="260971234567")
+        return payout_tx
+
+    def post(self, api_client, name, payload):
+        return api_client.post(
+            reverse(f"payments:{name}"), payload, content_type="application/json")
+
+    def test_completed_payout_callback_finalizes_payout(
+        self, api_client, accepted_payout
+    ):
+        payload = {
+            "payoutId": str(accepted_payout.id),
+            "status": "COMPLETED",
+            "providerTransactionId": "PAYOUT-TXN-1",
+            "recipient": {"type": "MMO", "accountDetails": {
+                "phoneNumber": "260971234567", "provider": "MTN_MOMO_ZMB"}},
+        }
+
+        response = self.post(api_client, "payout_webhook", payload)
+
+        assert response.status_code == 200
+        accepted_payout.refresh_from_db()
+        assert accepted_payout.status == "COMPLETED"
+        assert accepted_payout.provider_payout.status == "completed"
+        log = PaymentWebhookLog.objects.get(payout_id=str(accepted_payout.id))
+        assert log.event_type == "payout.completed"
+        assert log.status == "processed"
+        assert log.provider == "MTN_MOMO_ZMB"
+
+        # A resend of the same provider transaction never reaches the queue
+        response = self.post(api_client, "payout_webhook", payload)
+        assert response.data["message"] == "Duplicate callback ignored"
+        assert PaymentWebhookLog.objects.count() == 1
+
+    def test_failed_payout_callback_fails_payout(
+        self, api_client, accepted_payout, run_callback_consumers
+    ):
+        payload = {
+            "payoutId": str(accepted_payout.id),
+            "status": "FAILED",
+            "providerTransactionId": "PAYOUT-TXN-2",
+            "failureReason": {"failureCode": "RECIPIENT_NOT_FOUND"},
+        }
+
+        assert self.post(api_client, "payout_webhook", payload).status_code == 200
+
+        accepted_payout.refresh_from_db()
+        assert accepted_payout.status == "FAILED"
+        assert accepted_payout.provider_payout.failure_reason == "RECIPIENT_NOT_FOUND"
+        assert PaymentWebhookLog.objects.get().event_type == "payout.failed"
+        run_callback_consumers.assert_called_once()
+
+        # A late COMPLETED for the same payout is ignored
+        payload.update(status="COMPLETED", providerTransactionId="PAYOUT-TXN-3")
+        self.post(api_client, "payout_webhook", payload)
+        late = PaymentWebhookLog.objects.get(external_id="PAYOUT-TXN-3")
+        assert late.status == "ignored"
+        accepted_payout.refresh_from_db()
+        assert accepted_payout.status == "FAILED"
+
+    def test_payout_callback_requires_valid_payout_id(self, api_client):
+        assert self.post(api_client, "payout_webhook", {
+            "status": "COMPLETED"}).status_code == 400
+        assert self.post(api_client, "payout_webhook", {
+            "payoutId": "not-a-uuid", "status": "COMPLETED"}).status_code == 404
+
+    def test_callback_of_a_dying_worker_stays_received(self, accepted_payout, mocker):
+        log = PaymentWebhookLog.objects.create(
+            raw_payload="{}",
+            parsed_payload={"payoutId": str(accepted_payout.id), "status": "COMPLETED"},
+            event_type=WebhookEventType.PAYOUT_CALLBACK_RECEIVED,
+            payout_id=str(accepted_payout.id),
+        )
+        mocker.patch(
+            "apps.payments.tasks.PayoutDispatcher.settle", side_effect=SystemExit)
+
+        with pytest.raises(SystemExit):
+            process_payout_callbacks(str(accepted_payout.id))
+
+        log.refresh_from_db()
+        assert log.status == "received"
+
+    def test_completed_refund_callback_refunds_payment(
+        self, api_client, payment_factory
+    ):
+        payment_factory.status = "completed"
+        payment_factory.save()
+        payload = {
+            "refundId": str(uuid.uuid4()),
+            "depositId": str(payment_factory.id),
+            "status": "COMPLETED",
+            "providerTransactionId": "REFUND-TXN-1",
+        }
+
+        assert self.post(api_client, "refund_webhook", payload).status_code == 200
+
+        payment_factory.refresh_from_db()
+        assert payment_factory.status == "refunded"
+        log = PaymentWebhookLog.objects.get()
+        assert log.event_type == "refund.completed"
+        assert log.payment == payment_factory
+
+
+    def test_completed_refund_reverses_the_creator_credit(
+        self, api_client, payment_factory
+    ):
+        from apps.payments.services.platform_stats import PlatformStatsService
+        from apps.wallets.services.reconciliation_service import (
+            LedgerReconciliationService,
+        )
+        from apps.wallets.services.wallet_services import (
+            WalletService,
+            WalletTransactionService,
+        )
+        payment_factory.status = "completed"
+        payment_factory.save()
+        wallet = payment_factory.wallet
+        cashin_tx = WalletTransactionService.cash_in(
+            wallet=wallet, amount=Decimal("100.00"), payment=payment_factory,
+            reference="REFUNDED-TIP")
+        payload = {
+            "refundId": str(uuid.uuid4()),
+            "depositId": str(payment_factory.id),
+            "status": "COMPLETED",
+            "providerTransactionId": "REFUND-TXN-2",
+        }
+
+        assert self.post(api_client, "refund_webhook", payload).status_code == 200
+
+        reversal = WalletTransaction.objects.get(transaction_type="REVERSAL")
+        assert reversal.amount == -cashin_tx.amount
+        assert reversal.related_transaction == cashin_tx
+        wallet.refresh_from_db()
+        assert wallet.balance == Decimal("0.00")
+        assert WalletService.verify_wallet_balance(wallet, full=True) == 0
+        assert PlatformStatsService.totals()["cash_in_amount"] == 0
+        assert not LedgerReconciliationService.orphan_cash_ins().exists()
+
+        # A redelivered refund does not reverse twice
+        payload["providerTransactionId"] = "REFUND-TXN-3"
+        self.post(api_client, "refund_webhook", payload)
+        assert WalletTransaction.objects.filter(
+            transaction_type="REVERSAL").count() == 1
+
+    def test_refund_after_payout_records_the_uncovered_credit(
+        self, api_client, payment_factory
+    ):
+        from apps.wallets.services.reconciliation_service import (
+            LedgerReconciliationService,
+        )
+        from apps.wallets.services.wallet_services import (
+            WalletService,
+            WalletTransactionService,
+        )
+        payment_factory.status = "completed"
+        payment_factory.save()
+        wallet = payment_factory.wallet
+        WalletTransactionService.cash_in(
+            wallet=wallet, amount=Decimal("100.00"), payment=payment_factory,
+            reference="PAID-OUT-TIP")
+        payout_tx = WalletTransactionService.payout(
+            wallet=wallet, amount=Decimal("60.00"), correlation_id="PAID-OUT")
+        WalletTransactionService.finalize_payout(payout_tx=payout_tx, success=True)
+        wallet.refresh_from_db()
+        assert wallet.balance == Decimal("30.00")
+
+        assert self.post(api_client, "refund_webhook", {
+            "refundId": str(uuid.uuid4()),
+            "depositId": str(payment_factory.id),
+            "status": "COMPLETED",
+            "providerTransactionId": "REFUND-AFTER-PAYOUT",
+        }).status_code == 200
+
+        payment_factory.refresh_from_db()
+        assert payment_factory.status == "refunded"
+        assert PaymentWebhookLog.objects.get().status == "processed"
+        reversals = dict(WalletTransaction.objects.filter(
+            transaction_type="REVERSAL").values_list("status", "amount"))
+        assert reversals == {
+            "COMPLETED": Decimal("-30.00"), "PENDING": Decimal("-60.00")}
+        wallet.refresh_from_db()
+        assert wallet.balance == Decimal("0.00")
+        assert WalletService.verify_wallet_balance(wallet, full=True) == 0
+        assert list(LedgerReconciliationService.unrecovered_reversals()) == [
+            "PAID-OUT-TIP-REVERSAL-DUE"]
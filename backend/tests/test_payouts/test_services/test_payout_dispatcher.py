@@ -0,0 +1,167 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.utils import timezone
+from apps.payments.services.payout_dispatcher import PayoutDispatcher
+from apps.payouts.models import ProviderPayout
+from apps.payouts.tasks import dispatch_pending_payouts
+from apps.wallets.services.wallet_services import\
+    WalletTransactionService as WalletTxnService
+from tests.factories import UserFactory
+
+
+def pending_payout(user, reference, verified=True):
+    wallet = user.creator_profile.wallet
+    wallet.payout_account.phone_number = "260971234567"
+    wallet.payout_account.verified = verified
+    wallet.payout_account.save()
+    WalletTxnService.cash_in(
+        wallet=wallet, amount=Decimal("100.00"), payment=None,
+        reference=f"CASHIN-{reference}")
+    return WalletTxnService.payout(
+        wallet=wallet, amount=Decimal("90.00"), correlation_id=reference)
+
+
+def bulk_response(payouts, status="ACCEPTED"):
+    return [{"payoutId": str(tx.id), "status": status} for tx in payouts]
+
+
+@pytest.mark.django_db
+class TestPayoutDispatcher:
+
+    def test_pending_payouts_are_submitted_in_bulk(self, mocker):
+        payouts = [pending_payout(UserFactory(), f"DISPATCH-{i}") for i in range(3)]
+        unverified = pending_payout(UserFactory(), "DISPATCH-UNVERIFIED", verified=False)
+        mock_request = mocker.patch(
+            "apps.payments.services.payout_dispatcher.pawapay_request",
+            return_value=(bulk_response(payouts), 200))
+
+        result = PayoutDispatcher.run()
+
+        assert result["claimed"] == 3 and result["accepted"] == 3
+        mock_request.assert_called_once()
+        method, endpoint = mock_request.call_args.args
+        sent = mock_request.call_args.kwargs["payload"]
+        assert (method, endpoint) == ("POST", "/v2/payouts/bulk")
+        assert {item["payoutId"] for item in sent} == {str(tx.id) for tx in payouts}
+        assert sent[0]["amount"] == "90.00"
+        assert sent[0]["recipient"]["accountDetails"]["phoneNumber"] == "260971234567"
+        assert not ProviderPayout.objects.filter(payout_tx=unverified).exists()
+
+        # Submitted payouts are not sent again
+        assert PayoutDispatcher.run()["claimed"] == 0
+
+    def test_large_runs_are_split_into_bulk_batches(self, mocker, monkeypatch):
+        monkeypatch.setattr(
+            "apps.payments.services.payout_dispatcher.BULK_PAYOUT_SIZE", 2)
+        payouts = [pending_payout(UserFactory(), f"BATCH-{i}") for i in range(3)]
+        mock_request = mocker.patch(
+            "apps.payments.services.payout_dispatcher.pawapay_request",
+            return_value=(bulk_response(payouts), 200))
+
+        assert PayoutDispatcher.run()["accepted"] == 3
+        assert mock_request.call_count == 2
+
+    def test_rejected_payout_is_failed_at_once(self, user_factory, mocker):
+        payout_tx = pending_payout(user_factory, "DISPATCH-REJECTED")
+        mocker.patch(
+            "apps.payments.services.payout_dispatcher.pawapay_request",
+            return_value=([{
+                "payoutId": str(payout_tx.id),
+                "status": "REJECTED",
+                "failureReason": {"failureCode": "PAYER_NOT_FOUND"},
+            }], 200))
+
+        assert PayoutDispatcher.run()["rejected"] == 1
+
+        payout_tx.refresh_from_db()
+        assert payout_tx.status == "FAILED"
+        assert payout_tx.provider_payout.status == "rejected"
+        assert payout_tx.provider_payout.failure_reason == "PAYER_NOT_FOUND"
+
+    def test_refused_batch_is_failed_at_once(self, mocker):
+        payouts = [pending_payout(UserFactory(), f"REFUSED-{i}") for i in range(2)]
+        mocker.patch(
+            "apps.payments.services.payout_dispatcher.pawapay_request",
+            return_value=({
+                "status": "REJECTED",
+                "failureReason": {"failureCode": "INVALID_INPUT"},
+            }, 400))
+
+        assert PayoutDispatcher.run()["rejected"] == 2
+
+        for payout_tx in payouts:
+            payout_tx.refresh_from_db()
+            assert payout_tx.status == "FAILED"
+            assert payout_tx.provider_payout.failure_reason == "INVALID_INPUT"
+
+    def test_rate_limited_batch_is_resent_later(self, user_factory, mocker):
+        payout_tx = pending_payout(user_factory, "RATE-LIMITED")
+        mocker.patch(
+            "apps.payments.services.payout_dispatcher.pawapay_request",
+            return_value=({}, 429))
+
+        assert PayoutDispatcher.run()["unanswered"] == 1
+        payout_tx.refresh_from_db()
+        assert payout_tx.status == "PENDING"
+        assert payout_tx.provider_payout.status == "submitting"
+
+    def test_unanswered_submission_is_resent_later(self, user_factory, mocker):
+        payout_tx = pending_payout(user_factory, "DISPATCH-TIMEOUT")
+        mock_request = mocker.patch(
+            "apps.payments.services.payout_dispatcher.pawapay_request",
+            return_value=({"status": "EXTERNAL_ERROR"}, 500))
+
+        assert PayoutDispatcher.run()["unanswered"] == 1
+        assert PayoutDispatcher.run()["claimed"] == 0
+
+        ProviderPayout.objects.filter(payout_tx=payout_tx).update(
+            updated_at=timezone.now() - timedelta(minutes=11))
+        mock_request.return_value = (bulk_response([payout_tx], "DUPLICATE_IGNORED"), 200)
+
+        assert PayoutDispatcher.run()["accepted"] == 1
+        provider_payout = ProviderPayout.objects.get(payout_tx=payout_tx)
+        assert provider_payout.attempts == 2
+
+    def test_settle_finalizes_payout_once(self, user_factory, mocker):
+        payout_tx = pending_payout(user_factory, "DISPATCH-SETTLE")
+        mocker.patch(
+            "apps.payments.services.payout_dispatcher.pawapay_request",
+            return_value=(bulk_response([payout_tx]), 200))
+        PayoutDispatcher.run()
+
+        assert PayoutDispatcher.settle(payout_tx.id, "COMPLETED", {"status": "COMPLETED"})
+        assert not PayoutDispatcher.settle(payout_tx.id, "FAILED")
+
+        payout_tx.refresh_from_db()
+        assert payout_tx.status == "COMPLETED"
+        wallet = payout_tx.wallet
+        wallet.refresh_from_db()
+        # cashin(100 - 10%) = 90 - payout(90) = 0
+        assert wallet.balance == Decimal("0.00")
+
+    def test_accepted_payouts_without_callback_are_polled(self, user_factory, mocker):
+        payout_tx = pending_payout(user_factory, "DISPATCH-POLL")
+        mock_request = mocker.patch(
+            "apps.payments.services.payout_dispatcher.pawapay_request",
+            return_value=(bulk_response([payout_tx]), 200))
+        PayoutDispatcher.run()
+        ProviderPayout.objects.filter(payout_tx=payout_tx).update(
+            updated_at=timezone.now() - timedelta(hours=1))
+        mock_request.return_value = (
+            {"status": "FOUND", "data": {"payoutId": str(payout_tx.id), "status": "FAILED"}},
+            200)
+
+        assert PayoutDispatcher.poll_accepted() == 1
+        payout_tx.refresh_from_db()
+        assert payout_tx.status == "FAILED"
+
+    def test_dispatch_task_respects_the_kill_switch(self, settings, mocker):
+        mock_run = mocker.patch(
+            "apps.payouts.tasks.PayoutDispatcher.run", return_value={})
+
+        settings.PAWAPAY_PAYOUTS_ENABLED = False
+        assert dispatch_pending_payouts.run() == "Provider payouts disabled"
+        settings.PAWAPAY_PAYOUTS_ENABLED = True
+        assert dispatch_pending_payouts.run() == {}
+        mock_run.assert_called_once()
@@ -0,0 +1,110 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.utils import timezone
+from apps.payments.models import Payment
+from apps.payments.services.platform_stats import STATS_SHARDS, PlatformStatsService
+from apps.payouts.models import DailyPlatformStats
+from apps.wallets.models import WalletTransaction
+from apps.wallets.services.wallet_services import\
+    WalletTransactionService as WalletTxnService
+from tests.factories import PaymentFactory
+
+
+def rebuilt_totals():
+    """Totals after rebuilding today from the source tables."""
+    today = timezone.localdate()
+    PlatformStatsService.rebuild(today, today)
+    return PlatformStatsService.totals()
+
+
+@pytest.mark.django_db
+class TestPlatformStatsService:
+
+    def test_ledger_writes_update_the_rollup(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("100.00"), payment=None,
+            reference="STATS-CASHIN")
+        WalletTxnService.cash_in_many([{
+            "wallet": wallet, "amount": Decimal("50.00"), "payment": None,
+            "reference": "STATS-CASHIN-MANY",
+        }])
+        completed = WalletTxnService.payout(
+            wallet=wallet, amount=Decimal("60.00"), correlation_id="STATS-1")
+        WalletTxnService.finalize_payout(payout_tx=completed, success=True)
+        failed = WalletTxnService.payout(
+            wallet=wallet, amount=Decimal("20.00"), correlation_id="STATS-2")
+        WalletTxnService.finalize_payout(payout_tx=failed, success=False)
+        WalletTxnService.payout(
+            wallet=wallet, amount=Decimal("10.00"), correlation_id="STATS-3")
+
+        totals = PlatformStatsService.totals()
+        assert totals["cash_in_count"] == 2
+        # 10% cash-in fee
+        assert totals["cash_in_amount"] == Decimal("135.00")
+        assert totals["fee_amount"] == Decimal("15.00")
+        assert totals["payout_count"] == 3
+        assert totals["payout_amount"] == Decimal("-90.00")
+        assert totals["payout_pending_count"] == 1
+        assert totals["payout_completed_amount"] == Decimal("-60.00")
+        assert totals["payout_failed_count"] == 1
+        assert totals == rebuilt_totals()
+
+    def test_payment_status_changes_move_buckets(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        completed = PaymentFactory(wallet=wallet, amount=Decimal("100.00"))
+        failed = PaymentFactory(wallet=wallet, amount=Decimal("40.00"))
+        PaymentFactory(wallet=wallet, amount=Decimal("25.00"))
+
+        # A stale copy still moves the payment out of its stored status
+        stale = Payment.objects.get(pk=completed.pk)
+        assert completed.update_status("processing")
+        assert stale.update_status("completed")
+        assert Payment.objects.bulk_update_status({failed.pk: "failed"})
+
+        totals = PlatformStatsService.totals()
+        assert totals["payment_count"] == 3
+        assert totals["payment_pending_count"] == 1
+        assert totals["payment_pending_amount"] == Decimal("25.00")
+        assert totals["payment_completed_count"] == 1
+        assert totals["payment_completed_amount"] == Decimal("100.00")
+        assert totals["payment_failed_amount"] == Decimal("40.00")
+        assert totals == rebuilt_totals()
+
+    def test_compaction_leaves_one_row_per_closed_day(self, user_factory):
+        today = timezone.localdate()
+        old_day = today - timedelta(days=30)
+        PlatformStatsService.add(old_day, {"payment_count": 2})
+        PlatformStatsService.add(old_day, {"payment_count": -1})
+        PaymentFactory(wallet=user_factory.creator_profile.wallet)
+        before = PlatformStatsService.totals()
+
+        result = PlatformStatsService.compact(today=today + timedelta(days=1))
+
+        assert result["rebuilt"] == 1
+        assert DailyPlatformStats.objects.filter(shard__gt=0).count() == 0
+        assert DailyPlatformStats.objects.get(date=old_day).payment_count == 1
+        assert DailyPlatformStats.objects.get(date=today).payment_count == 1
+        assert PlatformStatsService.totals() == before
+
+    def test_rebuild_locks_every_shard_of_the_day(self, mocker):
+        today = timezone.localdate()
+        PlatformStatsService.add(today, {"payment_count": 1})
+        read = WalletTransaction.objects.filter
+        shards_at_read = []
+
+        def filter(*args, **kwargs):
+            # A writer arriving now must find its shard row already locked
+            shards_at_read.append(set(
+                DailyPlatformStats.objects.filter(date=today)
+                .values_list("shard", flat=True)))
+            return read(*args, **kwargs)
+
+        mocker.patch.object(WalletTransaction.objects, "filter", side_effect=filter)
+
+        PlatformStatsService.rebuild(today, today)
+
+        assert shards_at_read == [set(range(STATS_SHARDS + 1))]
+        # The placeholder rows of a day without activity do not outlive it
+        assert list(DailyPlatformStats.objects.values_list("shard", flat=True)) == []
@@ -1,11 +1,24 @@
-from apps.payouts.tasks import auto_payout_wallets
+from apps.payments.services.payout_orchestrator import PayoutOrchestrator
+from apps.payouts.models import PayoutRun
+from apps.payouts.tasks import auto_payout_wallets, eligible_wallet_ids
 from apps.wallets.models import Wallet
 from apps.wallets.services.wallet_services import WalletTransactionService as WalletTxnService
 import pytest
+from datetime import timedelta
 from decimal import Decimal
+from django.utils import timezone
 from tests.factories import UserFactory
 
 
+@pytest.fixture(autouse=True)
+def eager_celery(settings):
+    """Run the payout chord in-process"""
+    from config.celery import app
+    app.conf.task_always_eager = True
+    yield
+    app.conf.task_always_eager = False
+
+
 @pytest.mark.django_db
 class TestPayoutTasks:
 
@@ -69,8 +82,11 @@ class TestPayoutTasks:
             correlation_id="TEST-PAYOUT-PENDING",
         )
 
-        with pytest.raises(Exception, match="A payout is already pending for this wallet"):
-            auto_payout_wallets()
+        # The wallet is skipped instead of aborting the run
+        run = PayoutRun.objects.get(pk=auto_payout_wallets())
+        assert run.status == "completed"
+        assert (run.succeeded, run.skipped, run.failed) == (0, 1, 0)
+        assert wallet.transactions.filter(transaction_type="PAYOUT").count() == 1
 
 
     def test_auto_payout_multiple_wallets(self, admin_user):
@@ -160,4 +176,69 @@ class TestPayoutTasks:
         assert payout_tx_with_balance.amount == Decimal("-90.00")
 
         payout_tx_without_balance = wallet_without_balance.transactions.filter(transaction_type="PAYOUT").first()
-        assert payout_tx_without_balance is None
\ No newline at end of file
+        assert payout_tx_without_balance is None
+
+    def test_payout_run_isolates_failing_wallets(self, admin_user, mocker):
+        wallets = [UserFactory().creator_profile.wallet for _ in range(5)]
+        for wallet in wallets:
+            wallet.is_verified = True
+            wallet.save()
+            WalletTxnService.cash_in(
+                wallet=wallet,
+                amount=Decimal("100.00"),
+                payment=None,
+                reference=f"CASHIN-AUTO-PAYOUT-RUN-{wallet.id}",
+            )
+        broken = min(wallet.pk for wallet in wallets)
+        initiate = PayoutOrchestrator.initiate_payout
+
+        def flaky_initiate(*, wallet, initiated_by):
+            if wallet.pk == broken:
+                raise RuntimeError("provider exploded")
+            return initiate(wallet=wallet, initiated_by=initiated_by)
+
+        mocker.patch.object(
+            PayoutOrchestrator, "initiate_payout", side_effect=flaky_initiate)
+
+        run = PayoutRun.objects.get(pk=auto_payout_wallets(chunk_size=2))
+
+        assert run.status == "completed"
+        assert (run.total_wallets, run.total_chunks, run.chunks_done) == (5, 3, 3)
+        assert (run.succeeded, run.skipped, run.failed) == (4, 0, 1)
+        assert run.finished_at is not None
+        assert Wallet.objects.get(pk=broken).transactions.filter(
+            transaction_type="PAYOUT").count() == 0
+
+    def test_run_without_eligible_wallets_completes(self, admin_user):
+        run = PayoutRun.objects.get(pk=auto_payout_wallets())
+
+        assert run.status == "completed"
+        assert run.total_chunks == 0
+
+    def test_eligible_wallets_are_paged_by_key(self, user_factory):
+        wallets = [UserFactory().creator_profile.wallet for _ in range(3)]
+        # Equal due times exercise the id tie-breaker of the keyset
+        Wallet.objects.filter(pk__in=[w.pk for w in wallets]).update(
+            is_verified=True, balance=Decimal("10.00"),
+            next_payout_at=timezone.now() - timedelta(days=1))
+
+        assert list(eligible_wallet_ids(page_size=2)) == sorted(
+            w.pk for w in wallets)
+
+    def test_wallets_not_yet_due_are_not_paid_out(self, admin_user, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        wallet.is_verified = True
+        wallet.save()
+        WalletTxnService.cash_in(
+            wallet=wallet,
+            amount=Decimal("100.00"),
+            payment=None,
+            reference="CASHIN-AUTO-PAYOUT-NOT-DUE",
+        )
+        Wallet.objects.filter(pk=wallet.pk).update(
+            next_payout_at=timezone.now() + timedelta(days=3))
+
+        run = PayoutRun.objects.get(pk=auto_payout_wallets())
+
+        assert run.total_wallets == 0
+        assert not wallet.transactions.filter(transaction_type="PAYOUT").exists()
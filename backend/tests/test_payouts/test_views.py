@@ -392,6 +392,35 @@ class TestFinaliseWalletPayout:
         )
         assert response.status_code == 404
 
+    @pytest.mark.parametrize("provider_status,finalised", [
+        ("submitting", False),
+        ("accepted", False),
+        ("rejected", True),
+        ("failed", True),
+    ])
+    def test_payout_submitted_to_provider_is_not_finalised(
+        self, provider_status, finalised
+    ):
+        from apps.payouts.models import ProviderPayout
+        client = Client()
+        user = UserFactory(is_staff=True, is_superuser=True)
+        payout_tx = WalletTransactionFactory(
+            wallet=user.creator_profile.wallet,
+            transaction_type="PAYOUT", status="PENDING")
+        ProviderPayout.objects.create(
+            payout_tx=payout_tx, status=provider_status,
+            provider="MTN_MOMO_ZMB", phone_number="260971234567")
+
+        client.force_login(user)
+        url = reverse("payouts:finalise_wallet_payout", args=[payout_tx.id])
+        with patch.object(PayoutOrchestrator, "finalize") as mock_finalize:
+            response = client.post(url)
+
+        assert response.status_code == 302
+        assert mock_finalize.called is finalised
+        if not finalised:
+            assert client.get(url).status_code == 302
+
     def test_finalize_non_pending_payout(self, staff_user, user_factory):
         wallet = user_factory.creator_profile.wallet
         wallet.is_verified = True
@@ -414,3 +443,44 @@ class TestFinaliseWalletPayout:
 
         with pytest.raises(InvalidTransaction, match="Only pending payouts can be finalized"):
             PayoutOrchestrator.finalize(payout_tx=payout_tx, success=True)
+
+
+@pytest.mark.django_db
+class TestDashboardViews:
+    """Tests for the stats and payout_summary views"""
+
+    def test_requires_superuser(self, staff_user):
+        client = Client()
+        client.force_login(staff_user)
+        assert client.get(reverse("payouts:stats")).status_code == 302
+        assert client.get(reverse("payouts:payout_summary")).status_code == 302
+
+    def test_views_read_the_daily_rollup(self, admin_user, user_factory):
+        from apps.payments.services.platform_stats import PlatformStatsService
+        wallet = user_factory.creator_profile.wallet
+        WalletTransactionService.cash_in(
+            wallet=wallet, amount=Decimal("100.00"), payment=None,
+            reference="DASHBOARD-CASHIN")
+        payout_tx = WalletTransactionService.payout(
+            wallet=wallet, amount=Decimal("50.00"), correlation_id="DASHBOARD-1")
+        client = Client()
+        client.force_login(admin_user)
+
+        with patch.object(
+                PlatformStatsService, "totals",
+                wraps=PlatformStatsService.totals) as totals:
+            response = client.get(reverse("payouts:stats"))
+        assert response.status_code == 200
+        assert totals.call_count == 2
+        assert response.context["cash_in_count"] == 1
+        assert response.context["cash_in_total"] == Decimal("90.00")
+        assert response.context["total_fees"] == Decimal("10.00")
+        assert response.context["payout_count"] == 1
+        assert response.context["total_balance"] == Decimal("90.00")
+
+        response = client.get(reverse("payouts:payout_summary"))
+        assert response.status_code == 200
+        assert response.context["pending_count"] == 1
+        assert response.context["pending_total"] == Decimal("-50.00")
+        assert response.context["recent_payouts_count"] == 1
+        assert list(response.context["pending_payouts"]) == [payout_tx]
@@ -0,0 +1,37 @@
+from django.core.cache import cache
+from utils.circuit_breaker import CircuitBreaker
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_threshold_failures(self):
+        breaker = CircuitBreaker("test-open", threshold=3)
+        for _ in range(2):
+            breaker.record(500)
+            assert breaker.allow()
+
+        breaker.record(503)
+        assert not breaker.allow()
+        # Shared by every instance with the same name
+        assert not CircuitBreaker("test-open", threshold=3).allow()
+        assert CircuitBreaker("test-other", threshold=3).allow()
+
+    def test_half_open_lets_one_probe_through(self):
+        breaker = CircuitBreaker("test-probe", threshold=2)
+        breaker.record_failure()
+        breaker.record_failure()
+        # Cooldown over
+        cache.delete(breaker._key("open"))
+
+        assert breaker.allow()
+        assert not breaker.allow()
+
+        breaker.record(200)
+        assert breaker.allow()
+        assert breaker.allow()
+
+    def test_client_errors_do_not_count_as_failures(self):
+        breaker = CircuitBreaker("test-4xx", threshold=1)
+        breaker.record(400)
+        breaker.record(404)
+        assert breaker.allow()
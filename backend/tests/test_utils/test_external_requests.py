@@ -1,4 +1,8 @@
-from utils.external_requests import pawapay_request, requests
+import asyncio
+import httpx
+from utils.external_requests import (
+    CONNECT_TIMEOUT, READ_TIMEOUT, fetch_deposit_statuses, get_session,
+    pawapay_request, pool_stats, requests)
 
 class TestPawapayRequest:
     # ---------------------------------------------------------
@@ -8,12 +12,12 @@ class TestPawapayRequest:
         mock_response = mocker.Mock()
         mock_response.status_code = 200
         mock_response.json.return_value = {"status": "OK"}
-        patch_path = "utils.external_requests.requests.request"
+        patch_path = "utils.external_requests.requests.Session.request"
         mocker.patch(patch_path, return_value=mock_response)
         data, status = pawapay_request("GET", "/deposit/")
         assert status == 200
         assert data == {"status": "OK"}
-        requests.request.assert_called_once()
+        requests.Session.request.assert_called_once()
 
     # ---------------------------------------------------------
     # Test successful non-JSON response (text fallback)
@@ -24,7 +28,7 @@ class TestPawapayRequest:
         mock_response.json.side_effect = ValueError("not json")
         mock_response.text = "raw-response"
         mock_response.status_code = 200
-        patch_path = "utils.external_requests.requests.request"
+        patch_path = "utils.external_requests.requests.Session.request"
         mocker.patch(patch_path, return_value=mock_response)
         data, status = pawapay_request("GET", "/deposit/")
 
@@ -39,7 +43,7 @@ class TestPawapayRequest:
         mock_response = mocker.Mock()
         mock_response.json.side_effect = Exception("Network down")
         
-        patch_path = "utils.external_requests.requests.request"
+        patch_path = "utils.external_requests.requests.Session.request"
         mocker.patch(patch_path, return_value=mock_response)
         payload = {"amount": 100}
         data, status = pawapay_request("POST", "/deposit/", payload=payload)
@@ -57,7 +61,7 @@ class TestPawapayRequest:
         mock_response.status_code = 201
         
         payload = {"amount": 100}
-        patch_path = "utils.external_requests.requests.request"
+        patch_path = "utils.external_requests.requests.Session.request"
         mock_request = mocker.patch(patch_path, return_value=mock_response)
         pawapay_request("POST", "/deposits/", headers=None, payload=payload)
 
@@ -67,7 +71,7 @@ class TestPawapayRequest:
         assert call_args[0] == ("POST", "https://api.sandbox.pawapay.io/deposits/")
         assert "Authorization" in call_args[1]["headers"]
         assert call_args[1]["json"] == payload
-        assert call_args[1]["timeout"] == 10
+        assert call_args[1]["timeout"] == (CONNECT_TIMEOUT, READ_TIMEOUT)
 
     # ---------------------------------------------------------
     # Test non-200 status response with JSON
@@ -77,7 +81,7 @@ class TestPawapayRequest:
         mock_response = mocker.Mock()
         mock_response.json.return_value = {"error": "bad request"}
         mock_response.status_code = 400
-        patch_path = "utils.external_requests.requests.request"
+        patch_path = "utils.external_requests.requests.Session.request"
         mocker.patch(patch_path, return_value=mock_response)
         data, status = pawapay_request("GET", "/deposit/")
 
@@ -91,14 +95,14 @@ class TestPawapayRequest:
     def test_post_without_payload_raises_error(self, mocker):
         """POST requests without payload should raise AttributeError"""
         mock_response = mocker.Mock()
-        patch_path = "utils.external_requests.requests.request"
+        patch_path = "utils.external_requests.requests.Session.request"
         mocker.patch(patch_path, return_value=mock_response)
         data, status = pawapay_request("POST", "/deposit/", payload=None)
 
         assert status == 400
         assert data is not None
-        # Should not call requests.request since it fails before that
-        requests.request.assert_not_called()
+        # Should not call the session since it fails before that
+        requests.Session.request.assert_not_called()
 
     # ---------------------------------------------------------
     # Test GET request with payload (allowed)
@@ -109,7 +113,7 @@ class TestPawapayRequest:
         mock_response = mocker.Mock()
         mock_response.json.return_value = {"data": "retrieved"}
         mock_response.status_code = 200
-        patch_path = "utils.external_requests.requests.request"
+        patch_path = "utils.external_requests.requests.Session.request"
         mocker.patch(patch_path, return_value=mock_response)
 
         payload = {"filter": "active"}
@@ -117,7 +121,7 @@ class TestPawapayRequest:
 
         assert status == 200
         assert data == {"data": "retrieved"}
-        requests.request.assert_called_once()
+        requests.Session.request.assert_called_once()
 
     # ---------------------------------------------------------
     # Test requests.RequestException (network errors)
@@ -131,7 +135,7 @@ class TestPawapayRequest:
         mock_response.json.side_effect = requests.exceptions.ConnectionError(
             "Connection refused"
         )
-        patch_path = "utils.external_requests.requests.request"
+        patch_path = "utils.external_requests.requests.Session.request"
         mocker.patch(patch_path, return_value=mock_response)
         data, status = pawapay_request("GET", "/deposit/")
         assert status == 500
@@ -148,7 +152,7 @@ class TestPawapayRequest:
 
         mock_response.json.side_effect = requests.exceptions.Timeout(
             "Request timed out")
-        patch_path = "utils.external_requests.requests.request"
+        patch_path = "utils.external_requests.requests.Session.request"
         mocker.patch(patch_path, return_value=mock_response)
         data, status = pawapay_request("GET", "/deposit/")
 
@@ -164,7 +168,7 @@ class TestPawapayRequest:
         mock_response = mocker.Mock()
         mock_response.json.return_value = {"error": "Internal Server Error"}
         mock_response.status_code = 500
-        patch_path = "utils.external_requests.requests.request"
+        patch_path = "utils.external_requests.requests.Session.request"
         mocker.patch(patch_path, return_value=mock_response)
 
         data, status = pawapay_request("GET", "/deposit/")
@@ -181,7 +185,7 @@ class TestPawapayRequest:
         mock_response = mocker.Mock()
         mock_response.json.return_value = {"error": "Unauthorized"}
         mock_response.status_code = 401
-        patch_path = "utils.external_requests.requests.request"
+        patch_path = "utils.external_requests.requests.Session.request"
         mocker.patch(patch_path, return_value=mock_response)
 
         data, status = pawapay_request("GET", "/deposit/")
@@ -198,7 +202,7 @@ class TestPawapayRequest:
         mock_response = mocker.Mock()
         mock_response.json.return_value = {"error": "Not Found"}
         mock_response.status_code = 404
-        patch_path = "utils.external_requests.requests.request"
+        patch_path = "utils.external_requests.requests.Session.request"
         mocker.patch(patch_path, return_value=mock_response)
 
         data, status = pawapay_request("GET", "/deposit/")
@@ -216,7 +220,7 @@ class TestPawapayRequest:
         mock_response = mocker.Mock()
         mock_response.json.return_value = {}
         mock_response.status_code = 200
-        patch_path = "utils.external_requests.requests.request"
+        patch_path = "utils.external_requests.requests.Session.request"
         mock_request = mocker.patch(patch_path, return_value=mock_response)
 
         pawapay_request("GET", "/deposit/")
@@ -231,15 +235,15 @@ class TestPawapayRequest:
         assert "Bearer" in  headers["Authorization"]
 
     # ---------------------------------------------------------
-    # Test timeout parameter is always 10
+    # Test connect/read timeouts are always set
     # ---------------------------------------------------------
     
-    def test_timeout_always_10(self, mocker):
-        """Verify timeout is always set to 10 seconds"""
+    def test_timeout_always_set(self, mocker):
+        """Verify connect and read timeouts are always set"""
         mock_response = mocker.Mock()
         mock_response.json.return_value = {}
         mock_response.status_code = 200
-        patch_path = "utils.external_requests.requests.request"
+        patch_path = "utils.external_requests.requests.Session.request"
         mock_request = mocker.patch(patch_path, return_value=mock_response)
 
         for method in ["GET", "POST", "PUT", "DELETE"]:
@@ -248,7 +252,7 @@ class TestPawapayRequest:
             pawapay_request(method, "/deposit/", payload=payload)
 
             call_kwargs = mock_request.call_args[1]
-            assert call_kwargs["timeout"] == 10
+            assert call_kwargs["timeout"] == (CONNECT_TIMEOUT, READ_TIMEOUT)
 
     # ---------------------------------------------------------
     # Test empty JSON response
@@ -259,7 +263,7 @@ class TestPawapayRequest:
         mock_response = mocker.Mock()
         mock_response.json.return_value = {}
         mock_response.status_code = 200
-        patch_path = "utils.external_requests.requests.request"
+        patch_path = "utils.external_requests.requests.Session.request"
         mocker.patch(patch_path, return_value=mock_response)
 
         data, status = pawapay_request("GET", "/deposit/")
@@ -276,7 +280,7 @@ class TestPawapayRequest:
         mock_response = mocker.Mock()
         mock_response.json.return_value = {"success": True}
         mock_response.status_code = 201
-        patch_path = "utils.external_requests.requests.request"
+        patch_path = "utils.external_requests.requests.Session.request"
         mock_request = mocker.patch(patch_path, return_value=mock_response)
 
         # Create a large payload with multiple nested fields
@@ -289,4 +293,82 @@ class TestPawapayRequest:
         assert status == 201
         call_kwargs = mock_request.call_args[1]
         assert call_kwargs["json"] == large_payload
-        assert data is not None
\ No newline at end of file
+        assert data is not None
+    # ---------------------------------------------------------
+    # Test the pooled session
+    # ---------------------------------------------------------
+
+    def test_session_is_pooled_per_process(self):
+        """Requests reuse one keep-alive session with retries on GET only"""
+        session = get_session()
+        assert get_session() is session
+
+        adapter = session.get_adapter("https://api.sandbox.pawapay.io/")
+        assert adapter._pool_maxsize == 20
+        assert adapter.max_retries.total == 2
+        assert adapter.max_retries.allowed_methods == frozenset({"GET"})
+
+    def test_pool_stats_count_requests_and_errors(self, mocker):
+        mock_response = mocker.Mock()
+        mock_response.json.return_value = {}
+        mock_response.status_code = 200
+        mocker.patch(
+            "utils.external_requests.requests.Session.request",
+            side_effect=[mock_response, requests.exceptions.Timeout("slow")],
+        )
+        before = pool_stats()
+
+        pawapay_request("GET", "/deposit/")
+        pawapay_request("GET", "/deposit/")
+
+        after = pool_stats()
+        assert after["requests"] == before["requests"] + 2
+        assert after["errors"] == before["errors"] + 1
+
+
+class TestFetchDepositStatuses:
+
+    def test_lookups_run_concurrently_under_the_limit(self):
+        in_flight, peak = 0, 0
+
+        async def handler(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            deposit_id = request.url.path.rsplit("/", 1)[-1]
+            return httpx.Response(
+                200, json={"data": {"depositId": deposit_id, "status": "COMPLETED"}})
+
+        ids = [f"dep-{i}" for i in range(20)]
+        results = fetch_deposit_statuses(
+            ids, concurrency=5, transport=httpx.MockTransport(handler))
+
+        assert set(results) == set(ids)
+        assert results["dep-3"] == (
+            {"data": {"depositId": "dep-3", "status": "COMPLETED"}}, 200)
+        assert 1 < peak <= 5
+
+    def test_gateway_errors_are_retried_then_reported(self, mocker):
+        mocker.patch("utils.external_requests.asyncio.sleep", mocker.AsyncMock())
+        calls = {"ok": 0, "down": 0}
+
+        def handler(request):
+            deposit_id = request.url.path.rsplit("/", 1)[-1]
+            calls[deposit_id] += 1
+            if deposit_id == "ok" and calls["ok"] > 1:
+                return httpx.Response(200, json={"data": {"status": "FAILED"}})
+            if deposit_id == "down":
+                raise httpx.ConnectError("refused")
+            return httpx.Response(503, json={})
+
+        results = fetch_deposit_statuses(
+            ["ok", "down"], transport=httpx.MockTransport(handler))
+
+        assert results["ok"] == ({"data": {"status": "FAILED"}}, 200)
+        assert results["down"] == ({"status": "EXTERNAL_ERROR"}, 500)
+        assert calls == {"ok": 2, "down": 3}
+
+    def test_no_ids_makes_no_requests(self):
+        assert fetch_deposit_statuses([]) == {}
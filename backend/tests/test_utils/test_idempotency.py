@@ -0,0 +1,119 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from utils import idempotency
+from utils.idempotency import bind_idempotency_key, idempotent
+
+
+def replay_thing(thing_id):
+    return Response({"replayed": thing_id}, status=201)
+
+
+class CountingView(APIView):
+    authentication_classes = []
+    permission_classes = []
+    calls = 0
+
+    @idempotent("test", replay=replay_thing)
+    def post(self, request):
+        CountingView.calls += 1
+        if request.data.get("bind"):
+            bind_idempotency_key(request, "thing-1")
+        if request.data.get("fail"):
+            raise RuntimeError("worker died")
+        if request.data.get("status"):
+            return Response({}, status=request.data["status"])
+        # A second request arriving while this one runs
+        if request.data.get("nested"):
+            nested = CountingView.as_view()(APIRequestFactory().post(
+                "/things/", request.data, format="json",
+                HTTP_IDEMPOTENCY_KEY="key-1"))
+            return Response({"nested": nested.status_code}, status=201)
+        return Response({"calls": CountingView.calls}, status=201)
+
+
+class TestIdempotent:
+
+    def setup_method(self):
+        CountingView.calls = 0
+        cache.clear()
+
+    def post(self, data, key=None):
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        request = APIRequestFactory().post(
+            "/things/", data, format="json", **headers)
+        return CountingView.as_view()(request)
+
+    def test_requests_without_key_always_run(self):
+        self.post({"a": 1})
+        self.post({"a": 1})
+
+        assert CountingView.calls == 2
+
+    def test_concurrent_request_with_same_key_conflicts(self):
+        response = self.post({"nested": True}, key="key-1")
+
+        assert response.data == {"nested": 409}
+        assert CountingView.calls == 1
+
+    def test_overlong_key_is_rejected(self):
+        assert self.post({"a": 1}, key="k" * 256).status_code == 400
+        assert CountingView.calls == 0
+
+    def test_unavailable_before_write_frees_key(self):
+        assert self.post({"status": 503}, key="key-1").status_code == 503
+        assert self.post({"status": 503}, key="key-1").status_code == 503
+
+        assert CountingView.calls == 2
+
+    def test_other_failures_keep_key(self):
+        assert self.post({"status": 500}, key="key-1").status_code == 500
+        with pytest.raises(RuntimeError):
+            self.post({"fail": True}, key="key-2")
+
+        assert self.post({"status": 500}, key="key-1").status_code == 409
+        assert self.post({"fail": True}, key="key-2").status_code == 409
+        assert CountingView.calls == 2
+
+    def test_key_bound_to_resource_is_replayed_from_it(self, mocker):
+        with pytest.raises(RuntimeError):
+            self.post({"bind": True, "fail": True}, key="key-1")
+        # Still within the lock of the dying request
+        assert self.post({"bind": True, "fail": True}, key="key-1").status_code == 409
+
+        mocker.patch.object(
+            idempotency.time, "time",
+            return_value=idempotency.time.time() + idempotency.IDEMPOTENCY_LOCK_TTL + 1)
+        retry = self.post({"bind": True, "fail": True}, key="key-1")
+
+        assert retry.status_code == 201
+        assert retry.data == {"replayed": "thing-1"}
+        assert retry["Idempotent-Replayed"] == "true"
+        assert CountingView.calls == 1
+
+    def test_server_error_after_write_is_replayed_at_once(self):
+        assert self.post({"bind": True, "status": 500}, key="key-1").status_code == 500
+
+        retry = self.post({"bind": True, "status": 500}, key="key-1")
+
+        assert retry.data == {"replayed": "thing-1"}
+        assert CountingView.calls == 1
+
+    def test_key_expiring_during_claim_is_claimed_again(self, mocker):
+        add = cache.add
+        lost = []
+
+        def add_losing_once(*args, **kwargs):
+            # The first claim loses to an entry that expires before get()
+            if not lost:
+                lost.append(True)
+                return False
+            return add(*args, **kwargs)
+
+        mocker.patch.object(cache, "add", side_effect=add_losing_once)
+
+        assert self.post({"a": 1}, key="key-1").status_code == 201
+        assert self.post({"a": 1}, key="key-1")["Idempotent-Replayed"] == "true"
+        assert CountingView.calls == 1
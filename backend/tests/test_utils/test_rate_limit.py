@@ -0,0 +1,21 @@
+from utils.rate_limit import TokenBucket
+
+
+class TestTokenBucket:
+
+    def test_bucket_grants_rate_tokens_per_second(self, mocker):
+        mocker.patch("utils.rate_limit.time.time", return_value=1000.5)
+        bucket = TokenBucket("test-bucket", rate=2)
+
+        assert bucket.take()
+        assert bucket.take()
+        assert not bucket.take()
+        # Buckets with another name have their own budget
+        assert TokenBucket("other-bucket", rate=1).take()
+
+    def test_acquire_gives_up_at_the_timeout(self, mocker):
+        mocker.patch("utils.rate_limit.time.time", return_value=2000.5)
+        bucket = TokenBucket("test-acquire", rate=1)
+
+        assert bucket.acquire(timeout=0.1)
+        assert not bucket.acquire(timeout=0.1)
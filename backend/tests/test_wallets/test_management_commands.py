@@ -0,0 +1,70 @@
+"""
+Tests for wallet management commands.
+"""
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from apps.wallets.models import WalletTransaction
+
+
+@pytest.mark.django_db
+class TestBenchmarkWalletQueriesCommand:
+    """Test benchmark_wallet_queries management command."""
+
+    def test_seed_and_benchmark(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        out = StringIO()
+
+        call_command(
+            'benchmark_wallet_queries',
+            '--seed', '200',
+            '--repeat', '2',
+            '--wallet', str(wallet.id),
+            stdout=out
+        )
+
+        assert WalletTransaction.objects.filter(
+            reference__startswith='BENCH-').count() == 200
+        output = out.getvalue()
+        assert 'Seeded 200 rows' in output
+        assert 'recalculate_wallet_balance' in output
+        assert 'initiate_payout pending check' in output
+
+    def test_cleanup_removes_seeded_rows(self, user_factory):
+        out = StringIO()
+        call_command('benchmark_wallet_queries', '--seed', '50',
+                     '--repeat', '1', stdout=out)
+
+        call_command('benchmark_wallet_queries', '--cleanup', stdout=out)
+
+        assert not WalletTransaction.objects.filter(
+            reference__startswith='BENCH-').exists()
+
+
+@pytest.mark.django_db
+class TestReconcileLedgerCommand:
+    """Test reconcile_ledger management command."""
+
+    def test_reports_and_repairs_balance_drift(self, user_factory):
+        from decimal import Decimal
+        from apps.wallets.models import Wallet
+        from apps.wallets.services.wallet_services import (
+            WalletTransactionService)
+        wallet = user_factory.creator_profile.wallet
+        WalletTransactionService.cash_in(
+            wallet=wallet, amount=Decimal('10.00'), payment=None,
+            reference='CMD-RECON')
+        Wallet.objects.filter(pk=wallet.pk).update(balance=Decimal('99.00'))
+        out = StringIO()
+
+        call_command('reconcile_ledger', '--repair', stdout=out)
+
+        output = out.getvalue()
+        assert 'Balance mismatches: 1' in output
+        assert 'Repaired 1 wallet balances' in output
+        wallet.refresh_from_db()
+        assert wallet.balance == Decimal('9.00')
+
+        out = StringIO()
+        call_command('reconcile_ledger', stdout=out)
+        assert 'Ledger is consistent' in out.getvalue()
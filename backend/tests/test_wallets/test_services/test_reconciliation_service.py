@@ -0,0 +1,89 @@
+import pytest
+from decimal import Decimal
+from apps.payments.services.fee_service import FeeService
+from apps.wallets.models import Wallet, WalletTransaction
+from apps.wallets.services.reconciliation_service import (
+    LedgerReconciliationService as Reconciliation)
+from apps.wallets.services.wallet_services import\
+    WalletTransactionService as WalletTxnService
+from tests.factories import PaymentFactory, UserFactory
+
+
+@pytest.mark.django_db
+class TestLedgerReconciliationService:
+
+    def test_consistent_ledger_has_no_findings(self, user_factory, monkeypatch):
+        monkeypatch.setattr(FeeService, "PAYOUT_FEE_FLAT", Decimal("5.00"))
+        wallet = user_factory.creator_profile.wallet
+        payment = PaymentFactory(wallet=wallet, status="completed")
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("100.00"), payment=payment,
+            reference="RECON-OK")
+        payout_tx = WalletTxnService.payout(
+            wallet=wallet, amount=Decimal("30.00"), correlation_id="RECON-P1")
+        WalletTxnService.finalize_payout(payout_tx=payout_tx, success=False)
+
+        report = Reconciliation.run()
+        assert all(not rows for rows in report.values()), report
+
+    def test_balance_mismatches_are_found_in_every_chunk(self, user_factory):
+        wallets = [user_factory.creator_profile.wallet] + [
+            UserFactory().creator_profile.wallet for _ in range(2)]
+        for i, wallet in enumerate(wallets):
+            WalletTxnService.cash_in(
+                wallet=wallet, amount=Decimal("10.00"), payment=None,
+                reference=f"RECON-CHUNK-{i}")
+        drifted = {wallets[0].pk, wallets[2].pk}
+        Wallet.objects.filter(pk__in=drifted).update(balance=Decimal("50.00"))
+
+        mismatches = list(Reconciliation.balance_mismatches(chunk_size=1))
+
+        assert {row["wallet_id"] for row in mismatches} == drifted
+        assert all(row["drift"] == Decimal("41.00") for row in mismatches)
+
+        assert Reconciliation.repair_balances(mismatches) == 2
+        assert not list(Reconciliation.balance_mismatches())
+
+    def test_fee_linkage_and_reversal_checks(self, user_factory, monkeypatch):
+        monkeypatch.setattr(FeeService, "PAYOUT_FEE_FLAT", Decimal("5.00"))
+        wallet = user_factory.creator_profile.wallet
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("100.00"), payment=None,
+            reference="RECON-FEES")
+        payout_tx = WalletTxnService.payout(
+            wallet=wallet, amount=Decimal("30.00"), correlation_id="RECON-P2")
+        WalletTxnService.finalize_payout(payout_tx=payout_tx, success=False)
+
+        # A fee without its source, and a reversal that over-refunds
+        WalletTransaction.objects.filter(reference="RECON-FEES-FEE").update(
+            related_transaction=None)
+        reversal = WalletTransaction.objects.get(transaction_type="FEE_REVERSAL")
+        WalletTransaction.objects.filter(pk=reversal.pk).update(
+            amount=reversal.amount + 1)
+
+        assert list(Reconciliation.unlinked_fees()) == ["RECON-FEES-FEE"]
+        assert list(Reconciliation.invalid_fee_reversals()) == [reversal.reference]
+
+        WalletTransaction.objects.filter(pk=reversal.pk).delete()
+        assert list(Reconciliation.missing_fee_reversals()) == [
+            reversal.related_transaction.reference]
+
+    def test_payment_credit_checks(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        doubled = PaymentFactory(wallet=wallet, status="completed")
+        for reference in ("RECON-DUP-A", "RECON-DUP-B"):
+            WalletTxnService.cash_in(
+                wallet=wallet, amount=Decimal("10.00"), payment=doubled,
+                reference=reference)
+        pending = PaymentFactory(wallet=wallet, status="pending")
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("10.00"), payment=pending,
+            reference="RECON-ORPHAN")
+        uncredited = PaymentFactory(wallet=wallet, status="completed")
+
+        report = Reconciliation.run()
+
+        assert report["duplicate_credits"] == [
+            {"payment_id": doubled.pk, "credits": 2}]
+        assert report["orphan_cash_ins"] == ["RECON-ORPHAN"]
+        assert report["uncredited_payments"] == [uncredited.pk]
@@ -0,0 +1,136 @@
+import pytest
+from decimal import Decimal
+from datetime import timedelta
+from django.utils import timezone
+from apps.wallets.models import WalletBalanceSnapshot, WalletTransaction
+from apps.wallets.services.snapshot_service import WalletSnapshotService
+from apps.wallets.services.wallet_services import WalletService
+from apps.wallets.services.wallet_services import\
+    WalletTransactionService as WalletTxnService
+
+
+def backdate(wallet, days):
+    """Move every existing transaction of the wallet into the past"""
+    WalletTransaction.objects.filter(wallet=wallet).update(
+        created_at=timezone.now() - timedelta(days=days))
+
+
+@pytest.mark.django_db
+class TestWalletSnapshotService:
+
+    def test_no_snapshot_for_empty_wallet(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        assert WalletSnapshotService.take_snapshot(wallet) is None
+        assert WalletBalanceSnapshot.objects.count() == 0
+
+    def test_recent_rows_are_not_checkpointed(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("20.00"), payment=None,
+            reference="SNAP-RECENT")
+        assert WalletSnapshotService.take_snapshot(wallet) is None
+
+    def test_snapshot_totals_match_full_ledger(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("100.00"), payment=None,
+            reference="SNAP-1")
+        payout_tx = WalletTxnService.payout(
+            wallet=wallet, amount=Decimal("40.00"), correlation_id="SNAP-P")
+        WalletTxnService.finalize_payout(payout_tx=payout_tx, success=True)
+        backdate(wallet, 2)
+
+        snapshot = WalletSnapshotService.take_snapshot(wallet)
+
+        assert snapshot.balance == Decimal("50.00")
+        assert snapshot.cash_in == Decimal("90.00")
+        assert snapshot.cash_out == Decimal("-40.00")
+        assert snapshot.cash_in_costs == Decimal("-10.00")
+        assert snapshot.total_outgoing == Decimal("-40.00")
+        assert snapshot.transaction_count == 3
+        assert WalletSnapshotService.verify_snapshot(snapshot) == {}
+
+    def test_ledger_totals_combine_snapshot_and_tail(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("100.00"), payment=None,
+            reference="SNAP-TAIL-1")
+        backdate(wallet, 2)
+        WalletSnapshotService.take_snapshot(wallet)
+
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("50.00"), payment=None,
+            reference="SNAP-TAIL-2")
+
+        totals = WalletSnapshotService.ledger_totals(wallet)
+        assert totals == WalletSnapshotService.ledger_totals(wallet, full=True)
+        assert totals["balance"] == Decimal("135.00")
+        assert totals["transaction_count"] == 4
+        assert WalletService.verify_wallet_balance(wallet) == 0
+
+    def test_snapshot_stops_at_oldest_pending_payout(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("100.00"), payment=None,
+            reference="SNAP-PENDING-1")
+        backdate(wallet, 3)
+        payout_tx = WalletTxnService.payout(
+            wallet=wallet, amount=Decimal("40.00"), correlation_id="SNAP-PP")
+        WalletTransaction.objects.filter(pk=payout_tx.pk).update(
+            created_at=timezone.now() - timedelta(days=2))
+
+        snapshot = WalletSnapshotService.take_snapshot(wallet)
+        # The pending payout is left out so it can still be finalized
+        assert snapshot.transaction_count == 2
+        assert snapshot.total_outgoing == 0
+
+        WalletTxnService.finalize_payout(payout_tx=payout_tx, success=True)
+        totals = WalletSnapshotService.ledger_totals(wallet)
+        assert totals["balance"] == Decimal("50.00")
+        assert totals["total_outgoing"] == Decimal("-40.00")
+
+    def test_take_snapshot_rolls_forward(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("10.00"), payment=None,
+            reference="SNAP-ROLL-1")
+        backdate(wallet, 5)
+        first = WalletSnapshotService.take_snapshot(wallet)
+        assert WalletSnapshotService.take_snapshot(wallet).pk == first.pk
+
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("20.00"), payment=None,
+            reference="SNAP-ROLL-2")
+        second = WalletSnapshotService.take_snapshot(
+            wallet, now=timezone.now() + timedelta(hours=1))
+
+        assert second.pk != first.pk
+        assert second.balance == Decimal("27.00")
+        assert WalletSnapshotService.verify_snapshot(second) == {}
+
+    def test_verify_snapshot_reports_mismatch(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("10.00"), payment=None,
+            reference="SNAP-BAD")
+        backdate(wallet, 1)
+        snapshot = WalletSnapshotService.take_snapshot(wallet)
+        snapshot.balance = Decimal("1.00")
+        snapshot.save()
+
+        assert WalletSnapshotService.verify_snapshot(snapshot) == {
+            "balance": (Decimal("1.00"), Decimal("9.00"))
+        }
+        # full mode ignores the bad checkpoint
+        assert WalletService.compute_ledger_balance(
+            wallet, full=True) == Decimal("9.00")
+
+    def test_roll_forward_all(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("10.00"), payment=None,
+            reference="SNAP-ALL")
+        backdate(wallet, 1)
+
+        assert WalletSnapshotService.roll_forward_all() == 1
+        assert WalletSnapshotService.roll_forward_all() == 0
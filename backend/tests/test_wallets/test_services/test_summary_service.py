@@ -0,0 +1,58 @@
+import pytest
+from decimal import Decimal
+from datetime import timedelta
+from django.utils import timezone
+from apps.wallets.models import WalletTransaction
+from apps.wallets.services.snapshot_service import WalletSnapshotService
+from apps.wallets.services.summary_service import WalletSummaryService
+from apps.wallets.services.wallet_services import\
+    WalletTransactionService as WalletTxnService
+
+
+@pytest.mark.django_db
+class TestWalletSummaryService:
+
+    def test_summary_is_served_from_cache(
+            self, user_factory, django_assert_num_queries):
+        wallet = user_factory.creator_profile.wallet
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("100.00"), payment=None,
+            reference="SUM-CACHE")
+
+        summary = WalletSummaryService.get_summary(wallet)
+        assert summary["cash_in"] == Decimal("90.00")
+        assert summary["transaction_count"] == 2
+        assert len(summary["recent_transactions"]) == 1
+
+        with django_assert_num_queries(0):
+            assert WalletSummaryService.get_summary(wallet) == summary
+
+    def test_ledger_write_invalidates_summary(
+            self, user_factory, django_capture_on_commit_callbacks):
+        wallet = user_factory.creator_profile.wallet
+        assert WalletSummaryService.get_summary(wallet)["cash_in"] == 0
+
+        with django_capture_on_commit_callbacks(execute=True):
+            WalletTxnService.cash_in(
+                wallet=wallet, amount=Decimal("50.00"), payment=None,
+                reference="SUM-INVALIDATE")
+
+        summary = WalletSummaryService.get_summary(wallet)
+        assert summary["cash_in"] == Decimal("45.00")
+        assert summary["recent_transactions"][0]["reference"] == "SUM-INVALIDATE"
+
+    def test_last_payout_survives_snapshot(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("100.00"), payment=None,
+            reference="SUM-PAYOUT")
+        payout_tx = WalletTxnService.payout(
+            wallet=wallet, amount=Decimal("40.00"), correlation_id="SUM-P")
+        WalletTxnService.finalize_payout(payout_tx=payout_tx, success=True)
+        paid_at = timezone.now() - timedelta(days=2)
+        WalletTransaction.objects.filter(wallet=wallet).update(created_at=paid_at)
+        WalletSnapshotService.take_snapshot(wallet)
+
+        summary = WalletSummaryService.build_summary(wallet)
+        assert summary["last_payout_at"] == paid_at
+        assert summary["total_outgoing"] == Decimal("-40.00")
@@ -0,0 +1,102 @@
+import pytest
+from decimal import Decimal
+from django.db.models import Max
+from apps.wallets.models import SupporterAggregate, WalletTransaction
+from apps.wallets.services.supporter_service import SupporterService
+from apps.wallets.services.wallet_services import\
+    WalletTransactionService as WalletTxnService
+from tests.factories import PaymentFactory
+
+
+def tip(wallet, phone, amount, **kwargs):
+    payment = PaymentFactory(
+        wallet=wallet, amount=Decimal(amount), patron_phone=phone, **kwargs)
+    WalletTxnService.cash_in(
+        wallet=wallet, amount=payment.amount, payment=payment,
+        reference=payment.reference)
+    return payment
+
+
+@pytest.mark.django_db
+class TestSupporterService:
+
+    def test_cash_in_folds_tips_per_supporter(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        tip(wallet, "0970000001", "40.00", patron_message="first")
+        tip(wallet, "0970000001", "60.00", patron_message="second")
+        tip(wallet, "0970000002", "10.00")
+
+        supporter = SupporterAggregate.objects.get(
+            wallet=wallet, patron_key="0970000001")
+        assert supporter.total_amount == Decimal("100.00")
+        assert supporter.tip_count == 2
+        assert supporter.patron_message == "second"
+        assert supporter.first_tip_at < supporter.last_tip_at
+
+        ranked = SupporterService.leaderboard(wallet, sort="total")
+        assert [s.patron_key for s in ranked] == ["0970000001", "0970000002"]
+
+    def test_cash_in_without_payment_is_not_a_supporter(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("10.00"), payment=None,
+            reference="SUPPORTER-NONE")
+        assert not SupporterAggregate.objects.exists()
+
+    def test_rebuild_matches_incremental_aggregates(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        tip(wallet, "0970000001", "40.00")
+        tip(wallet, "0970000001", "60.00")
+        tip(wallet, "0970000002", "10.00")
+        fields = ("patron_key", "total_amount", "tip_count", "patron_name",
+                  "first_tip_at", "last_tip_at")
+        incremental = sorted(
+            SupporterAggregate.objects.filter(wallet=wallet).values_list(*fields))
+
+        assert SupporterService.rebuild(wallet) == 2
+        rebuilt = sorted(
+            SupporterAggregate.objects.filter(wallet=wallet).values_list(*fields))
+        assert rebuilt == incremental
+
+    def test_unknown_sort_is_rejected(self, user_factory):
+        with pytest.raises(ValueError):
+            SupporterService.leaderboard(
+                user_factory.creator_profile.wallet, sort="biggest")
+
+    def test_cash_in_many_folds_tips_per_supporter(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        payments = [
+            PaymentFactory(wallet=wallet, amount=Decimal(amount),
+                           patron_phone=phone)
+            for phone, amount in [("0970000001", "10.00"),
+                                  ("0970000001", "15.00"),
+                                  ("0970000002", "5.00")]
+        ]
+        WalletTxnService.cash_in_many([
+            {"wallet": wallet, "amount": p.amount, "payment": p,
+             "reference": p.reference} for p in payments
+        ])
+
+        supporter = SupporterAggregate.objects.get(
+            wallet=wallet, patron_key="0970000001")
+        assert supporter.total_amount == Decimal("25.00")
+        assert supporter.tip_count == 2
+        assert SupporterAggregate.objects.filter(wallet=wallet).count() == 2
+
+    def test_cash_in_many_keeps_each_supporters_last_tip_time(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        payments = [
+            PaymentFactory(wallet=wallet, amount=Decimal("10.00"), patron_phone=phone)
+            for phone in ["0970000001", "0970000001", "0970000002"]
+        ]
+        WalletTxnService.cash_in_many([
+            {"wallet": wallet, "amount": p.amount, "payment": p,
+             "reference": p.reference} for p in payments
+        ])
+
+        for supporter in SupporterAggregate.objects.filter(wallet=wallet):
+            last_cash_in = WalletTransaction.objects.filter(
+                transaction_type="CASH_IN",
+                payment__patron_phone=supporter.patron_key,
+            ).aggregate(last=Max("created_at"))["last"]
+            assert supporter.last_tip_at == last_cash_in
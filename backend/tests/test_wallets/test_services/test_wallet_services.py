@@ -8,6 +8,7 @@ from apps.wallets.services.wallet_services import\
 from utils.exceptions import (
     InsufficientBalance, DuplicateTransaction,
     InvalidTransaction,WalletNotFound, WalletError)
+from apps.wallets.models import WalletTransaction
 from tests.factories import UserFactory
 
 
@@ -197,6 +198,26 @@ class TestWalletTransactionService:
                 reference="DUP-1",
             )
 
+    def test_duplicate_cash_in_returns_existing_and_keeps_transaction_usable(
+            self, user_factory):
+        from django.db import transaction
+        wallet = user_factory.creator_profile.wallet
+        first = WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("10.00"), payment=None,
+            reference="DUP-2")
+
+        with transaction.atomic():
+            with pytest.raises(DuplicateTransaction) as exc:
+                WalletTxnService.cash_in(
+                    wallet=wallet, amount=Decimal("10.00"), payment=None,
+                    reference="DUP-2")
+            # The conflict only rolled back its savepoint
+            assert WalletTransaction.objects.filter(reference="DUP-2").count() == 1
+
+        assert exc.value.transaction == first
+        wallet.refresh_from_db()
+        assert wallet.balance == Decimal("9.00")
+
     def test_finalize_payout_completes_and_updates_balance(self, user_factory):
         WalletTxnService.cash_in(
             wallet=user_factory.creator_profile.wallet,
@@ -220,6 +241,30 @@ class TestWalletTransactionService:
         payout_tx.refresh_from_db()
         assert payout_tx.status == "COMPLETED"
 
+    def test_completed_payout_schedules_next_payout(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        wallet.is_verified = True
+        wallet.save()
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("50.00"), payment=None,
+            reference="CASHIN-SCHEDULE")
+        payout_tx = WalletTxnService.payout(
+            wallet=wallet, amount=Decimal("30.00"), correlation_id="PAYOUT-SCHEDULE")
+        assert wallet in PayoutScheduleService.due_wallets()
+
+        WalletTxnService.finalize_payout(payout_tx=payout_tx, success=True)
+
+        wallet.refresh_from_db()
+        assert wallet.next_payout_at == payout_tx.created_at + timedelta(days=30)
+        assert wallet not in PayoutScheduleService.due_wallets()
+
+        # A shorter interval counts from the same payout
+        PayoutScheduleService.set_interval(wallet, 7)
+        wallet.refresh_from_db()
+        assert wallet.next_payout_at == payout_tx.created_at + timedelta(days=7)
+        assert wallet in PayoutScheduleService.due_wallets(
+            now=payout_tx.created_at + timedelta(days=8))
+
     def test_finalize_failed_payout_updates_status_but_not_balance(self, user_factory):
         WalletTxnService.cash_in(
             wallet=user_factory.creator_profile.wallet,
@@ -356,6 +401,61 @@ class TestWalletTransactionService:
                 payout_tx=tx, success=True)
 
 
+    def test_cash_in_many_matches_single_cash_ins(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        other = UserFactory().creator_profile.wallet
+        created = WalletTxnService.cash_in_many([
+            {"wallet": wallet, "amount": Decimal("20.00"),
+             "payment": None, "reference": "BULK-1"},
+            {"wallet": wallet, "amount": Decimal("30.00"),
+             "payment": None, "reference": "BULK-2"},
+            {"wallet": other, "amount": Decimal("10.00"),
+             "payment": None, "reference": "BULK-3"},
+        ])
+
+        assert [tx.reference for tx in created] == ["BULK-1", "BULK-2", "BULK-3"]
+        assert wallet.balance == Decimal("45.00")
+        fee = WalletTransaction.objects.get(reference="BULK-1-FEE")
+        assert fee.amount == Decimal("-2.00")
+        assert fee.related_transaction_id == created[0].id
+        for w in (wallet, other):
+            w.refresh_from_db()
+            assert WalletService.verify_wallet_balance(w) == 0
+        assert other.balance == Decimal("9.00")
+
+    def test_cash_in_many_skips_duplicate_references(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("20.00"), payment=None,
+            reference="BULK-DUP-1")
+
+        created = WalletTxnService.cash_in_many([
+            {"wallet": wallet, "amount": Decimal("20.00"),
+             "payment": None, "reference": "BULK-DUP-1"},
+            {"wallet": wallet, "amount": Decimal("50.00"),
+             "payment": None, "reference": "BULK-DUP-2"},
+            {"wallet": wallet, "amount": Decimal("50.00"),
+             "payment": None, "reference": "BULK-DUP-2"},
+        ])
+
+        assert [tx.reference for tx in created] == ["BULK-DUP-2"]
+        wallet.refresh_from_db()
+        assert wallet.balance == Decimal("63.00")
+        assert WalletService.verify_wallet_balance(wallet) == 0
+
+    def test_cash_in_many_rejects_non_positive_amounts(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        with pytest.raises(InvalidTransaction):
+            WalletTxnService.cash_in_many([
+                {"wallet": wallet, "amount": Decimal("10.00"),
+                 "payment": None, "reference": "BULK-OK"},
+                {"wallet": wallet, "amount": Decimal("0.00"),
+                 "payment": None, "reference": "BULK-ZERO"},
+            ])
+        assert not WalletTransaction.objects.filter(
+            reference="BULK-OK").exists()
+
+
 @pytest.mark.django_db
 class TestWalletService:
     def test_get_wallet_for_user(self, user_factory):
@@ -415,4 +515,55 @@ class TestWalletService:
             amount=Decimal('10'), status="COMPLETED")
         with pytest.raises(WalletError):
             WalletService.recalculate_wallet_balance('not-wallet')
-        
\ No newline at end of file
+        
+    def test_apply_balance_delta_updates_balance(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        WalletService.apply_balance_delta(wallet, Decimal("12.50"))
+        WalletService.apply_balance_delta(wallet, Decimal("-2.50"))
+        assert wallet.balance == Decimal("10.00")
+        wallet.refresh_from_db()
+        assert wallet.balance == Decimal("10.00")
+
+    def test_cash_in_does_not_recompute_from_ledger(self, user_factory, wallet_txn_factory):
+        wallet = user_factory.creator_profile.wallet
+        # Row written behind the service's back is not picked up by cash_in
+        wallet_txn_factory(amount=Decimal("100"), status="COMPLETED")
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("20.00"), payment=None,
+            reference="DELTA-1")
+        wallet.refresh_from_db()
+        assert wallet.balance == Decimal("18.00")
+        assert WalletService.verify_wallet_balance(wallet) == Decimal("-100")
+
+        # Repair mode brings it back in line with the ledger
+        WalletService.recalculate_wallet_balance(wallet)
+        assert wallet.balance == Decimal("118.00")
+        assert WalletService.verify_wallet_balance(wallet) == 0
+
+    def test_verify_wallet_balance_consistent_after_money_movements(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("50.00"), payment=None,
+            reference="VERIFY-1")
+        payout_tx = WalletTxnService.payout(
+            wallet=wallet, amount=Decimal("20.00"), correlation_id="VERIFY-P")
+        assert WalletService.verify_wallet_balance(wallet) == 0
+        WalletTxnService.finalize_payout(payout_tx=payout_tx, success=True)
+        assert WalletService.verify_wallet_balance(wallet) == 0
+        assert wallet.balance == Decimal("25.00")
+
+    def test_finalize_payout_applies_delta_once_for_stale_instance(self, user_factory):
+        wallet = user_factory.creator_profile.wallet
+        WalletTxnService.cash_in(
+            wallet=wallet, amount=Decimal("50.00"), payment=None,
+            reference="STALE-1")
+        payout_tx = WalletTxnService.payout(
+            wallet=wallet, amount=Decimal("20.00"), correlation_id="STALE-P")
+        stale_copy = type(payout_tx).objects.get(pk=payout_tx.pk)
+
+        WalletTxnService.finalize_payout(payout_tx=payout_tx, success=True)
+        WalletTxnService.finalize_payout(payout_tx=stale_copy, success=True)
+
+        wallet.refresh_from_db()
+        assert wallet.balance == Decimal("25.00")
+        assert stale_copy.status == "COMPLETED"
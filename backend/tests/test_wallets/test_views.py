@@ -5,6 +5,7 @@ from tests.factories import (
     PaymentFactory,
     WalletTransactionFactory
     )
+from apps.wallets.services.wallet_services import WalletTransactionService
 
 
 @pytest.mark.django_db
@@ -123,6 +124,7 @@ class TestWalletDetailsViews:
             wallet = wallet,
             amount=100,
             patron_name="Supporter 1",
+            patron_phone="0970000001",
             patron_message="Great content!"
         )
 
@@ -130,20 +132,17 @@ class TestWalletDetailsViews:
             wallet = wallet,
             amount=120,
             patron_name="Supporter 2",
+            patron_phone="0970000002",
             patron_message="Keep it up!"
         )
-  
-        WalletTransactionFactory(
-            wallet=wallet,
-            payment=p1,
-            amount=p1.amount
-        )
 
-        WalletTransactionFactory(
-            wallet=wallet,
-            payment=p2,
-            amount=p2.amount
-        )
+        for payment in (p1, p2):
+            WalletTransactionService.cash_in(
+                wallet=wallet,
+                amount=payment.amount,
+                payment=payment,
+                reference=payment.reference,
+            )
 
         auth_api_client.force_authenticate(user=user)
         response = auth_api_client.get("/api/v1/wallets/supporters/")
@@ -152,11 +151,12 @@ class TestWalletDetailsViews:
         data = response.data.get("data")
         assert isinstance(data, list)
         assert len(data) == 2
-        supporter1 = data[0]
+        # Largest total first
+        supporter1 = data[1]
         assert supporter1["patron_name"] == "Supporter 1"
         assert supporter1["patron_message"] == "Great content!"
         assert supporter1["account_type"] == "Supporter"
-        supporter2 = data[1]
+        supporter2 = data[0]
         assert supporter2["patron_name"] == "Supporter 2"
         assert supporter2["patron_message"] == "Keep it up!"
         assert supporter2["account_type"] == "Supporter"
@@ -174,10 +174,11 @@ class TestWalletDetailsViews:
             patron_message="Great content!"
         )
 
-        WalletTransactionFactory(
+        WalletTransactionService.cash_in(
             wallet=wallet,
+            amount=p1.amount,
             payment=p1,
-            amount=p1.amount
+            reference=p1.reference,
         )
 
         auth_api_client.force_authenticate(user=user)
@@ -192,6 +193,36 @@ class TestWalletDetailsViews:
         assert supporter["patron_message"] == "Great content!"
         assert supporter["account_type"] == "Supporter"
 
+    def test_wallet_supporters_are_aggregated_and_sortable(
+            self, auth_api_client, user_factory):
+        """Test repeat supporters are grouped and the list can be sorted"""
+        user = user_factory
+        wallet = user.creator_profile.wallet
+        tips = [("0970000001", 50), ("0970000001", 70), ("0970000002", 100)]
+        for phone, amount in tips:
+            payment = PaymentFactory(
+                wallet=wallet, amount=amount, patron_phone=phone)
+            WalletTransactionService.cash_in(
+                wallet=wallet, amount=payment.amount, payment=payment,
+                reference=payment.reference)
+
+        auth_api_client.force_authenticate(user=user)
+        response = auth_api_client.get("/api/v1/wallets/supporters/")
+        assert response.status_code == 200
+        assert response.data["count"] == 2
+        top = response.data["data"][0]
+        assert top["amount"] == "120.00"
+        assert top["tip_count"] == 2
+
+        response = auth_api_client.get(
+            "/api/v1/wallets/supporters/", {"sort": "recent", "limit": 1})
+        assert len(response.data["data"]) == 1
+        assert response.data["data"][0]["amount"] == "100.00"
+
+        response = auth_api_client.get(
+            "/api/v1/wallets/supporters/", {"sort": "biggest"})
+        assert response.status_code == 400
+
     def test_wallet_has_next_payout_date_and_payout_interval(self, api_client, user_factory):
         """Test that wallet details include next payout date"""
         client = APIClientFactory()
@@ -218,8 +249,8 @@ class TestWalletDetailsViews:
 
     def test_get_user_wallet(self, api_client, user_factory, mocker):
         """Test getting current user's wallet"""
-        mock_pawapay = mocker.patch("apps.wallets.views.pawapay_request")
-        mock_pawapay.return_value = {"status": "completed"}
+        mock_reconcile = mocker.patch(
+            "apps.payments.tasks.reconcile_deposit_status.delay")
         client = APIClientFactory()
         api_client.credentials(HTTP_X_API_KEY=client.api_key)
         api_client.force_authenticate(user=user_factory)
@@ -232,13 +263,16 @@ class TestWalletDetailsViews:
         assert "is_active" in data
         assert "recent_transactions" in data
         assert "cash_in_costs" in data
+        assert data["reconciling"] is False
 
-        # check that pawapay was not called no pending payments
-        mock_pawapay.assert_not_called()
+        # check that nothing was queued, no pending payments
+        mock_reconcile.assert_not_called()
 
     def test_get_user_wallet_with_pending_payment(self, api_client, user_factory, mocker):
-        """Test getting current user's wallet with pending payment"""
-        mock_pawapay = mocker.patch("apps.wallets.views.pawapay_request")
+        """Test the dashboard queues pending payments instead of polling"""
+        mock_pawapay = mocker.patch("apps.payments.tasks.pawapay_request")
+        mock_reconcile = mocker.patch(
+            "apps.payments.tasks.reconcile_deposit_status.delay")
         client = APIClientFactory()
         api_client.credentials(HTTP_X_API_KEY=client.api_key)
         user = user_factory
@@ -246,10 +280,6 @@ class TestWalletDetailsViews:
             wallet=user.creator_profile.wallet,
             status="pending",
         )
-        mock_pawapay.return_value = (
-            {"data": {"depositId": str(payment.id), "status": "COMPLETED"}},
-            200,
-        )
         api_client.force_authenticate(user=user)
         response = api_client.get("/api/v1/wallets/me/")
         assert response.status_code == 200
@@ -259,16 +289,18 @@ class TestWalletDetailsViews:
         assert "balance" in data
         assert "is_active" in data
         assert "currency" in data
+        assert data["reconciling"] is True
 
-        # check that pawapay was called
-        mock_pawapay.assert_called()
-        # check that payment status was updated
+        # the provider is never called from the request
+        mock_pawapay.assert_not_called()
+        mock_reconcile.assert_called_once_with(str(payment.id))
         payment.refresh_from_db()
-        assert payment.status == "completed"
+        assert payment.status == "pending"
 
     def test_get_wallet_with_multiple_pending_payments(self, api_client, user_factory, mocker):
-        """Test getting current user's wallet with multiple pending payments"""
-        mock_pawapay = mocker.patch("apps.wallets.views.pawapay_request")
+        """Test repeated dashboard loads queue each payment only once"""
+        mock_reconcile = mocker.patch(
+            "apps.payments.tasks.reconcile_deposit_status.delay")
         client = APIClientFactory()
         api_client.credentials(HTTP_X_API_KEY=client.api_key)
         user = user_factory
@@ -277,31 +309,16 @@ class TestWalletDetailsViews:
             wallet=user.creator_profile.wallet,
             status="pending",
         )
-        # Mock pawapay to return completed for all payments
-
-        def mock_pawapay_side_effect(method, endpoint, headers=None, payload=None):
-            # deposit_id = payload.get("depositId")
-            return (
-                {"data": {"depositId": "test_id", "status": "COMPLETED"}},
-                200,
-            )
-        mock_pawapay.side_effect = mock_pawapay_side_effect
+        PaymentFactory(wallet=user.creator_profile.wallet, status="completed")
         api_client.force_authenticate(user=user)
-        response = api_client.get("/api/v1/wallets/me/")
-        assert response.status_code == 200
-        data = response.data.get("data")
-        assert data is not None
-        assert "id" in data
-        assert "balance" in data
-        assert "is_active" in data
-        assert "currency" in data
+        for _ in range(2):
+            response = api_client.get("/api/v1/wallets/me/")
+            assert response.status_code == 200
+            assert response.data["data"]["reconciling"] is True
 
-        # check that pawapay was called multiple times
-        assert mock_pawapay.call_count == 3
-        # check that all payment statuses were updated
-        for payment in payments:
-            payment.refresh_from_db()
-            assert payment.status == "completed"
+        assert mock_reconcile.call_count == 3
+        called_ids = {call.args[0] for call in mock_reconcile.call_args_list}
+        assert called_ids == {str(payment.id) for payment in payments}
 
     def test_get_wallet_transactions(self, api_client, wallet_transaction_factory):
         """Test getting current users tips"""
@@ -320,6 +337,45 @@ class TestWalletDetailsViews:
         assert "status" in transaction
         assert "reference" in transaction
 
+    def test_get_wallet_transactions_cursor_pages(self, api_client, user_factory):
+        """Test paging through the transaction history with the cursor"""
+        wallet = user_factory.creator_profile.wallet
+        created = WalletTransactionFactory.create_batch(
+            5, wallet=wallet, transaction_type="CASH_IN", status="COMPLETED")
+        client = APIClientFactory()
+        api_client.credentials(HTTP_X_API_KEY=client.api_key)
+        api_client.force_authenticate(user=user_factory)
+
+        seen, cursor = [], None
+        for _ in range(3):
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = api_client.get("/api/v1/wallets/transactions/", params)
+            assert response.status_code == 200
+            assert response.data["count"] == 5
+            seen += [tx["id"] for tx in response.data["data"]]
+            cursor = response.data["next_cursor"]
+
+        assert cursor is None
+        assert sorted(seen) == sorted(str(tx.id) for tx in created)
+
+    def test_get_wallet_transactions_rejects_bad_params(self, api_client, user_factory):
+        """Test invalid cursor and limit values are rejected"""
+        client = APIClientFactory()
+        api_client.credentials(HTTP_X_API_KEY=client.api_key)
+        api_client.force_authenticate(user=user_factory)
+
+        response = api_client.get(
+            "/api/v1/wallets/transactions/", {"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+        assert "cursor" in response.data["errors"]
+
+        response = api_client.get(
+            "/api/v1/wallets/transactions/", {"limit": "ten"})
+        assert response.status_code == 400
+        assert "limit" in response.data["errors"]
+
     def test_get_wallet_with_no_transactions(self, api_client, user_factory):
         """Test getting current user's wallet with no transactions"""
         client = APIClientFactory()
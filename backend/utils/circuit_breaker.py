@@ -0,0 +1,70 @@
+"""
+Circuit breaker with its state in the cache (Redis in deployed settings),
+so every gunicorn and celery process sees the same circuit and stops
+calling a degraded upstream at the same time.
+"""
+import logging
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` failures within `window` seconds and rejects
+    calls for `cooldown` seconds. After the cooldown a single probe call
+    is let through (half-open); its outcome closes or re-opens the
+    circuit. Cache errors never block calls.
+    """
+
+    def __init__(self, name: str, threshold: int = 5, window: int = 60,
+                 cooldown: int = 30):
+        self.name = name
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+
+    def _key(self, part: str) -> str:
+        return f"circuit:{self.name}:{part}"
+
+    def allow(self) -> bool:
+        """Whether a call may be made now."""
+        try:
+            if cache.get(self._key("open")):
+                return False
+            if (cache.get(self._key("failures")) or 0) >= self.threshold:
+                # Half-open: one probe at a time
+                return cache.add(self._key("probe"), 1, timeout=self.cooldown)
+        except Exception:
+            logger.warning(f"Circuit {self.name} state unavailable")
+        return True
+
+    def record_success(self):
+        try:
+            cache.delete_many([self._key("failures"), self._key("probe")])
+        except Exception:
+            logger.warning(f"Circuit {self.name} state unavailable")
+
+    def record_failure(self):
+        try:
+            key = self._key("failures")
+            cache.add(key, 0, timeout=self.window)
+            try:
+                failures = cache.incr(key)
+            except ValueError:
+                # The window expired between add and incr
+                cache.add(key, 1, timeout=self.window)
+                failures = 1
+            if failures >= self.threshold:
+                cache.set(self._key("open"), 1, timeout=self.cooldown)
+                cache.delete(self._key("probe"))
+                logger.warning(f"Circuit {self.name} opened after {failures} failures")
+        except Exception:
+            logger.warning(f"Circuit {self.name} state unavailable")
+
+    def record(self, status_code: int):
+        """Records the outcome of a call from its HTTP status code."""
+        if status_code >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
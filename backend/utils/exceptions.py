@@ -11,7 +11,10 @@ class InsufficientBalance(WalletError):
 
 
 class DuplicateTransaction(WalletError):
-    pass
+    def __init__(self, message="Transaction already exists", transaction=None):
+        super().__init__(message)
+        # The ledger row that already holds the reference
+        self.transaction = transaction
 
 
 class InvalidTransaction(WalletError):
@@ -1,6 +1,14 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import httpx
 import requests
 import logging
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
@@ -26,30 +34,113 @@ if not logger.handlers:
     logger.addHandler(file_handler)
     logger.setLevel(logging.ERROR)
 
-# class AvailabilityAPIView(APIView):
-#     """Checks Mobile money providers availability"""
-#     permission_classes = [AllowAny, RequireAPIKey]
 
-#     def get(self, request):
-#         data, code = pawapay_request(
-#             "GET", "/availability?country=ZMB&operationType=DEPOSIT"
-#         )
-#         return Response(data, status=code)
+# Fail fast when PawaPay is unreachable, but give slow endpoints time to answer
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+# Hosts with a cached pool, and keep-alive connections kept per host
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 20
+# Idempotent GETs are retried on connection errors and gateway errors
+GET_RETRIES = 2
 
+_session_lock = threading.Lock()
+_sessions = {}
+_metrics = {"requests": 0, "errors": 0, "total_ms": 0.0}
+_metrics_lock = threading.Lock()
 
-# class ActiveConfigAPIView(APIView):
-#     """Gets recommended active configuration"""
-#     permission_classes = [AllowAny, RequireAPIKey]
 
-#     def get(self, request):
-#         data, code = pawapay_request(
-#             "GET", "/active-conf?country=ZMB&operationType=DEPOSIT"
-#         )
-#         return Response(data, status=code)
+def _count(**deltas):
+    """Adds to the request counters; workers may run requests in threads."""
+    with _metrics_lock:
+        for name, value in deltas.items():
+            _metrics[name] += value
+
+
+def _build_session():
+    session = requests.Session()
+    retry = Retry(
+        total=GET_RETRIES,
+        allowed_methods=frozenset({"GET"}),
+        status_forcelist=(502, 503, 504),
+        backoff_factor=0.3,
+        backoff_jitter=0.2,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """
+    Returns the pooled keep-alive session of this process. Sessions are
+    never shared across a fork (gunicorn and celery prefork workers), as
+    the children would otherwise write to the parent's sockets.
+    """
+    pid = os.getpid()
+    session = _sessions.get(pid)
+    if session is None:
+        with _session_lock:
+            session = _sessions.get(pid)
+            if session is None:
+                _sessions.clear()
+                session = _sessions[pid] = _build_session()
+    return session
+
+
+def pool_stats():
+    """
+    Usage of the outbound connection pools of this process.
+    Returns:
+        dict: Request counters and, per host, the connections opened,
+        requests sent and idle keep-alive connections.
+    """
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    stats = {
+        "requests": metrics["requests"],
+        "errors": metrics["errors"],
+        "avg_ms": (
+            metrics["total_ms"] / metrics["requests"]
+            if metrics["requests"] else 0.0
+        ),
+        "pools": {},
+    }
+    session = _sessions.get(os.getpid())
+    if session is None:
+        return stats
+    for adapter in set(session.adapters.values()):
+        for key in adapter.poolmanager.pools.keys():
+            pool = adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            stats["pools"][f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                "idle": pool.pool.qsize() if pool.pool else 0,
+                "maxsize": pool.pool.maxsize if pool.pool else 0,
+            }
+    return stats
+
+
+def _pawapay_headers():
+    return {
+        "Accept": "application/json",
+        "Authorization": f"Bearer {settings.PAWAPAY_API_KEY}",
+        "Content-Type": "application/json",
+    }
+
 
 def pawapay_request(method, endpoint, headers=None, payload=None):
     """
-    Utility function to make requests to PawaPay API.
+    Utility function to make requests to PawaPay API over the pooled
+    keep-alive session.
     Args:
         method: HTTP method as a string (e.g., 'GET', 'POST').
         endpoint: API endpoint string.
@@ -59,32 +150,124 @@ def pawapay_request(method, endpoint, headers=None, payload=None):
         Tuple of ({'data': response_data}, status_code).
     """
     url = f"{settings.PAWAPAY_BASE_URL}{endpoint}"
-    headers = {
-        "Accept": "application/json",
-        "Authorization": f"Bearer {settings.PAWAPAY_API_KEY}",
-        "Content-Type": "application/json",
-    }
+    headers = _pawapay_headers()
+    if method == "POST" and payload is None:
+        return {"status": "BAD_REQUEST"}, 400
+
+    _count(requests=1)
+    started = time.monotonic()
     try:
-        if method == "POST" and payload is None:
-            raise AttributeError("Payload missing")
-        response = requests.request(
-            method, url, headers=headers, json=payload, timeout=10
+        response = get_session().request(
+            method, url, headers=headers, json=payload,
+            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
         )
         try:
             return response.json(), response.status_code
         except ValueError:
             return response.text, response.status_code
-    except AttributeError:
-        return {"status": "BAD_REQUEST"}, 400
     except requests.exceptions.RequestException as e:
+        _count(errors=1)
         logger.error(f"PawaPay Request Error: {e}")
         return {"status": "EXTERNAL_ERROR"}, 500
-    except requests.exceptions.ConnectionError:
-        return {"status": "NETWORK_ERROR"}, 500
-
     except Exception as e:
+        _count(errors=1)
         logger.error(f"Internal Error: {e}")
         return {"status": e}, 500
+    finally:
+        _count(total_ms=(time.monotonic() - started) * 1000)
+
+
+# Status checks in flight at once during a batch lookup
+STATUS_CHECK_CONCURRENCY = 50
+
+
+async def pawapay_request_async(client, method, endpoint, payload=None):
+    """
+    Asyncio counterpart of pawapay_request, sent over a shared
+    httpx.AsyncClient. GETs are retried with jittered backoff like the
+    pooled session does.
+    Args:
+        client: httpx.AsyncClient to send the request with.
+        method: HTTP method as a string (e.g., 'GET', 'POST').
+        endpoint: API endpoint string.
+        payload: Optional dictionary for JSON payload.
+    Returns:
+        Tuple of (response_data, status_code).
+    """
+    if method == "POST" and payload is None:
+        return {"status": "BAD_REQUEST"}, 400
+
+    url = f"{settings.PAWAPAY_BASE_URL}{endpoint}"
+    attempts = GET_RETRIES + 1 if method == "GET" else 1
+    _count(requests=1)
+    started = time.monotonic()
+    try:
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            try:
+                response = await client.request(
+                    method, url, headers=_pawapay_headers(), json=payload)
+            except httpx.TransportError as e:
+                if last_attempt:
+                    _count(errors=1)
+                    logger.error(f"PawaPay Request Error: {e}")
+                    return {"status": "EXTERNAL_ERROR"}, 500
+            else:
+                if response.status_code not in (502, 503, 504) or last_attempt:
+                    try:
+                        return response.json(), response.status_code
+                    except ValueError:
+                        return response.text, response.status_code
+            await asyncio.sleep(0.3 * (2 ** attempt) + random.uniform(0, 0.2))
+    except httpx.HTTPError as e:
+        _count(errors=1)
+        logger.error(f"PawaPay Request Error: {e}")
+        return {"status": "EXTERNAL_ERROR"}, 500
+    finally:
+        _count(total_ms=(time.monotonic() - started) * 1000)
+
+
+async def _fetch_deposit_statuses(deposit_ids, concurrency, transport=None):
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(
+        max_connections=concurrency,
+        max_keepalive_connections=min(concurrency, POOL_MAXSIZE),
+    )
+    timeout = httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+    async with httpx.AsyncClient(
+        limits=limits, timeout=timeout, transport=transport
+    ) as client:
+
+        async def fetch(deposit_id):
+            async with semaphore:
+                return deposit_id, await pawapay_request_async(
+                    client, "GET", f"/v2/deposits/{deposit_id}")
+
+        results = await asyncio.gather(
+            *(fetch(str(deposit_id)) for deposit_id in deposit_ids))
+    return dict(results)
+
+
+def fetch_deposit_statuses(
+    deposit_ids, concurrency=STATUS_CHECK_CONCURRENCY, transport=None
+):
+    """
+    Looks up many deposits at PawaPay concurrently, at most `concurrency`
+    requests in flight. Must be called from synchronous code (views,
+    admin actions, celery tasks).
+    Args:
+        deposit_ids: Ids of the deposits to look up.
+        concurrency: Maximum number of requests in flight.
+        transport: Optional httpx transport (used by tests).
+    Returns:
+        dict: str(deposit id) -> (response data, status code), as returned
+        by pawapay_request.
+    """
+    deposit_ids = list(deposit_ids)
+    if not deposit_ids:
+        return {}
+    return asyncio.run(
+        _fetch_deposit_statuses(deposit_ids, concurrency, transport))
 
 
 def resend_callback(deposit_id):
@@ -0,0 +1,207 @@
+"""
+Idempotency-Key handling for POST endpoints. The first response to a key
+is kept in the cache (Redis in deployed settings) for a day, and a retry
+with the same key is answered from there without running the view again,
+so flaky clients retrying a request never create a second payment.
+
+Once a view has written the resource a key stands for (e.g. the Payment)
+it binds the key to its id with bind_idempotency_key(). From then on a
+retry never runs the view again: if no response was stored (the request
+died, or failed after the write) it is answered by the scope's replay
+function from the stored resource.
+"""
+import functools
+import hashlib
+import json
+import logging
+import time
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Clients retry within minutes; keep responses for a day
+IDEMPOTENCY_TTL = 24 * 60 * 60
+# A request still running after this long is assumed to have died
+IDEMPOTENCY_LOCK_TTL = 60
+# Claims of a key that expires between add() and get()
+IDEMPOTENCY_CLAIM_ATTEMPTS = 3
+IN_PROGRESS = "in_progress"
+DONE = "done"
+
+
+def _cache_key(scope: str, request, key: str) -> str:
+    digest = hashlib.sha256(f"{request.path}:{key}".encode()).hexdigest()
+    return f"idempotency:{scope}:{digest}"
+
+
+def _fingerprint(request) -> str:
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _error(error: str, message: str, code: int, **headers) -> Response:
+    return Response(
+        {"status": "failed", "error": error, "message": message},
+        status=code,
+        headers=headers or None,
+    )
+
+
+def _in_use() -> Response:
+    return _error(
+        "idempotency_key_in_use",
+        "A request with this Idempotency-Key is still being processed",
+        status.HTTP_409_CONFLICT,
+        **{"Retry-After": "1"},
+    )
+
+
+class _Claim:
+    """A key held by the running request."""
+
+    def __init__(self, cache_key: str, fingerprint: str):
+        self.cache_key = cache_key
+        self.fingerprint = fingerprint
+        self.resource = None
+
+    def entry(self, state: str = IN_PROGRESS, locked: bool = True, **fields) -> dict:
+        entry = {
+            "state": state,
+            "fingerprint": self.fingerprint,
+            "locked_until": time.time() + IDEMPOTENCY_LOCK_TTL if locked else 0,
+            **fields,
+        }
+        if self.resource is not None:
+            entry["resource"] = self.resource
+        return entry
+
+    def acquire(self):
+        """
+        Claims the key for IDEMPOTENCY_LOCK_TTL. A key that expires
+        between add() and get() is claimed again.
+        Returns:
+            tuple: (claimed, entry of the request holding the key or None).
+        """
+        for _ in range(IDEMPOTENCY_CLAIM_ATTEMPTS):
+            if cache.add(self.cache_key, self.entry(),
+                         timeout=IDEMPOTENCY_LOCK_TTL):
+                return True, None
+            entry = cache.get(self.cache_key)
+            if entry is not None:
+                return False, entry
+        return False, None
+
+    def bind(self, resource_id):
+        """Keeps the key, bound to the written resource, for IDEMPOTENCY_TTL."""
+        self.resource = str(resource_id)
+        cache.set(self.cache_key, self.entry(), timeout=IDEMPOTENCY_TTL)
+
+    def finish(self, response: Response):
+        if response.status_code < 500:
+            cache.set(
+                self.cache_key,
+                self.entry(DONE, status=response.status_code, data=response.data),
+                timeout=IDEMPOTENCY_TTL,
+            )
+        elif self.resource is not None:
+            # Written but not answered: let retries replay from the resource
+            cache.set(self.cache_key, self.entry(locked=False),
+                      timeout=IDEMPOTENCY_TTL)
+        elif response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+            # Refused before anything was written, the client may retry
+            cache.delete(self.cache_key)
+        # Any other failure keeps the key until IDEMPOTENCY_LOCK_TTL: it is
+        # unknown whether the request wrote anything
+
+
+def bind_idempotency_key(request, resource_id):
+    """
+    Binds the Idempotency-Key of a request to the resource it created,
+    so retries are answered from the resource instead of creating another
+    one. Call it right after the resource is committed; a no-op for
+    requests without the header.
+    Args:
+        request: The request handled by an idempotent() view.
+        resource_id: Id of the created resource, e.g. the Payment id.
+    """
+    claim = getattr(request, "idempotency_claim", None)
+    if claim is None:
+        return
+    try:
+        claim.bind(resource_id)
+    except Exception:
+        logger.warning("Idempotency cache unavailable")
+
+
+def _replayed(response: Response) -> Response:
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(scope: str, replay=None):
+    """
+    Makes an APIView handler honour the Idempotency-Key header.
+
+    Requests without the header run as usual. Non-5xx responses are kept
+    and replayed for later requests with the same key and body. A 503
+    refused before anything was written (e.g. provider unavailable) frees
+    the key so the client can retry; other failures keep it. Cache errors
+    never block requests.
+    Args:
+        scope (str): Namespace of the keys, e.g. "deposits".
+        replay (callable): Builds the response for a key bound to a
+            resource id that has no stored response. Keys of scopes
+            without one are answered with 409 until they expire.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return handler(view, request, *args, **kwargs)
+            if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+                return _error(
+                    "validation_error",
+                    "Idempotency-Key is too long",
+                    status.HTTP_400_BAD_REQUEST,
+                )
+
+            claim = _Claim(_cache_key(scope, request, key), _fingerprint(request))
+            try:
+                claimed, entry = claim.acquire()
+            except Exception:
+                logger.warning("Idempotency cache unavailable")
+                return handler(view, request, *args, **kwargs)
+
+            if not claimed:
+                if entry is None:
+                    return _in_use()
+                if entry["fingerprint"] != claim.fingerprint:
+                    return _error(
+                        "idempotency_key_reused",
+                        "Idempotency-Key was already used with a different request",
+                        status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                if entry["state"] == DONE:
+                    return _replayed(Response(entry["data"], status=entry["status"]))
+                if entry.get("resource") is None or replay is None \
+                        or entry["locked_until"] > time.time():
+                    return _in_use()
+                # The request that wrote the resource never answered
+                claim.bind(entry["resource"])
+                response = _replayed(replay(entry["resource"]))
+            else:
+                request.idempotency_claim = claim
+                response = handler(view, request, *args, **kwargs)
+
+            try:
+                claim.finish(response)
+            except Exception:
+                logger.warning("Idempotency cache unavailable")
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,64 @@
+"""
+Keyset (cursor) pagination over (created_at, id), newest first. Every
+page is an index range scan starting right after the previous page, so
+page 500 costs the same as page 1.
+"""
+import base64
+import uuid
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(obj) -> str:
+    """Opaque cursor pointing right after `obj`."""
+    raw = f"{obj.created_at.isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """
+    Decodes a cursor built by encode_cursor.
+    Returns:
+        Tuple of (created_at, pk)
+    Raises:
+        InvalidCursor: If the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, pk = raw.split("|")
+        created_at = parse_datetime(created_at)
+        pk = uuid.UUID(pk)
+    except (ValueError, UnicodeError):
+        raise InvalidCursor("Invalid cursor")
+    if created_at is None:
+        raise InvalidCursor("Invalid cursor")
+    return created_at, pk
+
+
+def paginate_keyset(queryset, *, limit: int, cursor: str = None):
+    """
+    Returns one page of `queryset` ordered by (-created_at, -id).
+    Args:
+        queryset: The filtered queryset to page through.
+        limit (int): Page size.
+        cursor (str): Cursor returned with the previous page, if any.
+    Returns:
+        Tuple of (items, next_cursor). next_cursor is None on the last page.
+    Raises:
+        InvalidCursor: If the cursor is malformed.
+    """
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+        )
+    # One extra row tells us whether there is a next page
+    items = list(queryset.order_by("-created_at", "-id")[:limit + 1])
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, encode_cursor(items[-1])
@@ -0,0 +1,47 @@
+"""
+Shared rate limiting for outbound provider calls. The bucket lives in the
+cache, so every worker and process draws from the same budget.
+"""
+import time
+from django.core.cache import cache
+
+
+class TokenBucket:
+    """
+    Token bucket holding `rate` tokens, refilled once per second. The
+    refill is modelled as one counter per one-second window, which keeps
+    taking a token to a single atomic cache increment.
+    """
+
+    def __init__(self, name: str, rate: int):
+        self.name = name
+        self.rate = rate
+
+    def _key(self, window: int) -> str:
+        return f"ratelimit:{self.name}:{window}"
+
+    def take(self) -> bool:
+        """Takes a token if one is left in the current second."""
+        key = self._key(int(time.time()))
+        cache.add(key, 0, timeout=2)
+        try:
+            used = cache.incr(key)
+        except ValueError:
+            # The window expired between add and incr
+            cache.add(key, 1, timeout=2)
+            used = 1
+        return used <= self.rate
+
+    def acquire(self, timeout: float) -> bool:
+        """
+        Waits up to `timeout` seconds for a token.
+        Returns:
+            bool: True once a token was taken, False on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while not self.take():
+            wait = 1 - (time.time() % 1)
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+        return True
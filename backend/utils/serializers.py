@@ -105,3 +105,10 @@ class ServerErrorSerializer(ErrorSerializer):
     """500 – Unexpected server error"""
     error = serializers.CharField(default="server_error")
     message = serializers.CharField(default="An unexpected error occurred on the server")
+
+
+class ServiceUnavailableErrorSerializer(ErrorSerializer):
+    """503 – Upstream provider unavailable, retry later"""
+    error = serializers.CharField(default="provider_unavailable")
+    message = serializers.CharField(default="Payment provider unavailable, retry later")
+    retryAfter = serializers.IntegerField()